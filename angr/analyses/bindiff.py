@@ -1,12 +1,22 @@
 
+import os
 import logging
 import math
+import json
 import types
+import sqlite3
+import hashlib
+import multiprocessing
 from collections import deque
 
 import networkx
 from . import Analysis
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 from ..errors import SimEngineError, SimMemoryError
 
 # todo include an explanation of the algorithm
@@ -19,6 +29,9 @@ l = logging.getLogger("angr.analyses.bindiff")
 DIFF_TYPE = "type"
 DIFF_VALUE = "value"
 
+# the BinDiff that worker processes compute function diffs for. it is inherited through fork()
+_bindiff_worker = None
+
 
 # exception for trying find basic block changes
 class UnmatchedStatementsException(Exception):
@@ -53,6 +66,14 @@ def _euclidean_dist(vector_a, vector_b):
     return math.sqrt(dist)
 
 
+# below this many pairs of objects, computing all distances in python is faster than setting up numpy arrays
+_VECTORIZE_MIN_PAIRS = 1024
+# the number of distances to compute at once, which bounds the size of the temporary arrays
+_VECTORIZE_BLOCK_SIZE = 1 << 22
+# attributes must be integers below this, so that squared distances are exact and their square roots are all distinct
+_VECTORIZE_MAX_ATTRIBUTE = 1 << 20
+
+
 def _get_closest_matches(input_attributes, target_attributes):
     """
     :param input_attributes:    First dictionary of objects to attribute tuples.
@@ -60,6 +81,11 @@ def _get_closest_matches(input_attributes, target_attributes):
     :returns:                   A dictionary of objects in the input_attributes to the closest objects in the
                                 target_attributes.
     """
+    if numpy is not None and len(input_attributes) * len(target_attributes) >= _VECTORIZE_MIN_PAIRS:
+        closest_matches = _get_closest_matches_vectorized(input_attributes, target_attributes)
+        if closest_matches is not None:
+            return closest_matches
+
     closest_matches = {}
 
     # for each object in the first set find the objects with the closest target attributes
@@ -78,6 +104,70 @@ def _get_closest_matches(input_attributes, target_attributes):
     return closest_matches
 
 
+def _attribute_array(attributes):
+    """
+    :param attributes:  A list of attribute tuples.
+    :returns:           A 2-dimensional int64 numpy array of the attributes, or None if they are not all integer tuples
+                        of the same length and within the bounds for exact distance computations.
+    """
+    try:
+        array = numpy.array(attributes)
+    except ValueError:
+        return None
+    if array.ndim != 2 or array.dtype.kind not in 'iu' or array.shape[1] == 0:
+        return None
+    if numpy.abs(array).max() >= _VECTORIZE_MAX_ATTRIBUTE:
+        return None
+    return array.astype(numpy.int64)
+
+
+def _get_closest_matches_vectorized(input_attributes, target_attributes):
+    """
+    The same as _get_closest_matches, with the distances computed by numpy. Objects that share the same attributes are
+    only looked at once, and (squared) distances are computed a block of rows at a time.
+
+    :param input_attributes:    First dictionary of objects to attribute tuples.
+    :param target_attributes:   Second dictionary of blocks to attribute tuples.
+    :returns:                   The same dictionary as _get_closest_matches, with the closest objects in the same order,
+                                or None if the attributes cannot be compared exactly with numpy.
+    """
+    input_keys = list(input_attributes)
+    target_keys = list(target_attributes)
+
+    input_array = _attribute_array([ input_attributes[a] for a in input_keys ])
+    target_array = _attribute_array([ target_attributes[b] for b in target_keys ])
+    if input_array is None or target_array is None or input_array.shape[1] != target_array.shape[1]:
+        return None
+
+    unique_inputs, input_inverse = numpy.unique(input_array, axis=0, return_inverse=True)
+    unique_targets, target_inverse = numpy.unique(target_array, axis=0, return_inverse=True)
+    input_inverse = input_inverse.reshape(-1)
+    target_inverse = target_inverse.reshape(-1)
+
+    # the indices of the target objects that share each unique attribute tuple, in ascending order
+    order = numpy.argsort(target_inverse, kind='stable')
+    bounds = numpy.cumsum(numpy.bincount(target_inverse, minlength=len(unique_targets)))[:-1]
+    target_groups = numpy.split(order, bounds)
+
+    # the closest objects of each unique input attribute tuple
+    unique_closest = [ ]
+    rows_per_block = max(1, _VECTORIZE_BLOCK_SIZE // (len(unique_targets) * unique_targets.shape[1]))
+    for start in range(0, len(unique_inputs), rows_per_block):
+        block = unique_inputs[start:start + rows_per_block]
+        diff = block[:, None, :] - unique_targets[None, :, :]
+        dists = numpy.einsum('ijk,ijk->ij', diff, diff)
+        best = dists == dists.min(axis=1)[:, None]
+        for row in best:
+            cols = numpy.flatnonzero(row)
+            if len(cols) == 1:
+                indices = target_groups[cols[0]]
+            else:
+                indices = numpy.sort(numpy.concatenate([ target_groups[c] for c in cols ]))
+            unique_closest.append([ target_keys[i] for i in indices ])
+
+    return { a: list(unique_closest[input_inverse[i]]) for i, a in enumerate(input_keys) }
+
+
 # from http://rosettacode.org/wiki/Levenshtein_distance
 def _levenshtein_distance(s1, s2):
     """
@@ -294,6 +384,9 @@ class NormalizedFunction(object):
         self.merged_blocks = dict()
         self.orig_function = function
 
+        self._normalized_blocks = dict()
+        self._content_hash = None
+
         # find nodes which end in call and combine them
         done = False
         while not done:
@@ -338,19 +431,60 @@ class NormalizedFunction(object):
             if len(call_targets) > 0:
                 self.call_sites[n] = call_targets
 
+    def normalized_block(self, block):
+        """
+        :param block:   A block of the function.
+        :returns:       The NormalizedBlock of the block. It is only computed once.
+        """
+        normalized = self._normalized_blocks.get(block, None)
+        if normalized is None:
+            normalized = NormalizedBlock(block, self)
+            self._normalized_blocks[block] = normalized
+        return normalized
+
+    @property
+    def content_hash(self):
+        """
+        :returns:   A hash of everything about the function that its diffs depend on: the address, size, and bytes of
+                    each block, the edges, the merged blocks, and the call targets.
+        """
+        if self._content_hash is None:
+            h = hashlib.sha256()
+            for node in sorted(self.graph.nodes(), key=lambda n: n.addr):
+                h.update(repr((node.addr, node.size)).encode())
+                if self.project.is_hooked(node.addr):
+                    h.update(type(self.project._sim_procedures[node.addr]).__name__.encode())
+                else:
+                    try:
+                        h.update(self.project.loader.memory.load(node.addr, node.size))
+                    except KeyError:
+                        pass
+                h.update(repr(sorted(s.addr for s in self.graph.successors(node))).encode())
+                h.update(repr([ b.addr for b in self.merged_blocks.get(node, [ ]) ]).encode())
+                h.update(repr(self.call_sites.get(node, None)).encode())
+            self._content_hash = h.digest()
+        return self._content_hash
+
 
 class FunctionDiff(object):
     """
     This class computes the a diff between two functions.
     """
-    def __init__(self, function_a, function_b, bindiff=None):
+    def __init__(self, function_a, function_b, bindiff=None, block_matches=None):
         """
-        :param function_a: The first angr Function object to diff.
-        :param function_b: The second angr Function object.
-        :param bindiff:    An optional Bindiff object. Used for some extra normalization during basic block comparison.
+        :param function_a:      The first angr Function object to diff, or its NormalizedFunction.
+        :param function_b:      The second angr Function object, or its NormalizedFunction.
+        :param bindiff:         An optional Bindiff object. Used for some extra normalization during basic block
+                                comparison.
+        :param block_matches:   Block matches computed before, as a list of pairs of block addresses from
+                                block_match_addrs. If specified, the blocks are not matched again.
         """
-        self._function_a = NormalizedFunction(function_a)
-        self._function_b = NormalizedFunction(function_b)
+        if not isinstance(function_a, NormalizedFunction):
+            function_a = NormalizedFunction(function_a)
+        if not isinstance(function_b, NormalizedFunction):
+            function_b = NormalizedFunction(function_b)
+        self._function_a = function_a
+        self._function_b = function_b
         self._project_a = self._function_a.project
         self._project_b = self._function_b.project
         self._bindiff = bindiff
@@ -362,7 +496,8 @@ class FunctionDiff(object):
         self._unmatched_blocks_from_a = set()
         self._unmatched_blocks_from_b = set()
 
-        self._compute_diff()
+        if block_matches is None or not self._restore_diff(block_matches):
+            self._compute_diff()
 
     @property
     def probably_identical(self):
@@ -410,8 +545,8 @@ class FunctionDiff(object):
                     not self.blocks_probably_identical(block_a, block_b, check_constants=True):
                 differing_blocks.append((block_a, block_b))
         for block_a, block_b in differing_blocks:
-            ba = NormalizedBlock(block_a, self._function_a)
-            bb = NormalizedBlock(block_b, self._function_b)
+            ba = self._function_a.normalized_block(block_a)
+            bb = self._function_b.normalized_block(block_b)
             diffs[(block_a, block_b)] = FunctionDiff._block_diff_constants(ba, bb)
         return diffs
 
@@ -419,6 +554,13 @@ class FunctionDiff(object):
     def block_matches(self):
         return self._block_matches
 
+    @property
+    def block_match_addrs(self):
+        """
+        :returns: The block matches as a sorted list of pairs of block addresses, which can be pickled.
+        """
+        return sorted((a.addr, b.addr) for a, b in self._block_matches)
+
     @property
     def unmatched_blocks(self):
         return self._unmatched_blocks_from_a, self._unmatched_blocks_from_b
@@ -448,12 +590,12 @@ class FunctionDiff(object):
                 return 0.0
 
         try:
-            block_a = NormalizedBlock(block_a, self._function_a)
+            block_a = self._function_a.normalized_block(block_a)
         except (SimMemoryError, SimEngineError):
             block_a = None
 
         try:
-            block_b = NormalizedBlock(block_b, self._function_b)
+            block_b = self._function_b.normalized_block(block_b)
         except (SimMemoryError, SimEngineError):
             block_b = None
 
@@ -503,12 +645,12 @@ class FunctionDiff(object):
             return self._project_a._sim_procedures[block_a] == self._project_b._sim_procedures[block_b]
 
         try:
-            block_a = NormalizedBlock(block_a, self._function_a)
+            block_a = self._function_a.normalized_block(block_a)
         except (SimMemoryError, SimEngineError):
             block_a = None
 
         try:
-            block_b = NormalizedBlock(block_b, self._function_b)
+            block_b = self._function_b.normalized_block(block_b)
         except (SimMemoryError, SimEngineError):
             block_b = None
 
@@ -712,6 +854,28 @@ class FunctionDiff(object):
         self._unmatched_blocks_from_a = set(x for x in self._function_a.graph.nodes() if x not in matched_a)
         self._unmatched_blocks_from_b = set(x for x in self._function_b.graph.nodes() if x not in matched_b)
 
+    def _restore_diff(self, block_match_addrs):
+        """
+        Take block matches that were computed before instead of computing the diff.
+
+        :param list block_match_addrs:  A list of pairs of block addresses.
+        :returns:                       False if the matches do not fit the functions.
+        """
+        nodes_a = { n.addr: n for n in self._function_a.graph.nodes() }
+        nodes_b = { n.addr: n for n in self._function_b.graph.nodes() }
+        if any(x not in nodes_a or y not in nodes_b for x, y in block_match_addrs):
+            return False
+
+        self.attributes_a = self._compute_block_attributes(self._function_a)
+        self.attributes_b = self._compute_block_attributes(self._function_b)
+
+        self._block_matches = set((nodes_a[x], nodes_b[y]) for x, y in block_match_addrs)
+        matched_a = set(x for x, _ in self._block_matches)
+        matched_b = set(y for _, y in self._block_matches)
+        self._unmatched_blocks_from_a = set(x for x in self._function_a.graph.nodes() if x not in matched_a)
+        self._unmatched_blocks_from_b = set(x for x in self._function_b.graph.nodes() if x not in matched_b)
+        return True
+
     @staticmethod
     def _get_ordered_successors(project, block, succ):
         try:
@@ -833,13 +997,124 @@ class FunctionDiff(object):
         return acceptable_differences
 
 
+class FunctionDiffCache(object):
+    """
+    An on-disk cache of the block matches of function diffs, backed by an sqlite database.
+
+    Entries are keyed by the content hashes of both normalized functions, so diffing a new build against a fixed
+    baseline only computes the diffs of functions that changed. Like the persistent lift cache, the database may be
+    shared by concurrent processes, and a lookup or a store that fails is treated as a miss. The block matches are
+    stored as JSON, so loading an entry of a tampered or foreign database never executes any code.
+    """
+
+    # bump this whenever the block matching algorithm changes
+    FORMAT_VERSION = 2
+
+    def __init__(self, path, timeout=5.0):
+        """
+        :param str path:        Path to the database file. It is created if it does not exist.
+        :param float timeout:   How many seconds to wait for a lock held by another process before giving up.
+        """
+        self.path = path
+        self.timeout = timeout
+
+        self._conn = None
+        self._pid = None
+
+    def _connection(self):
+        # sqlite connections must not be shared across fork()
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS diffs (key BLOB PRIMARY KEY, block_matches BLOB NOT NULL)")
+            self._conn = conn
+            self._pid = os.getpid()
+        return self._conn
+
+    @classmethod
+    def key(cls, function_a, function_b):
+        """
+        Compute the cache key of the diff of two functions.
+
+        :param NormalizedFunction function_a:   The first function.
+        :param NormalizedFunction function_b:   The second function.
+        :return:                                The key, as a bytes object.
+        """
+        h = hashlib.sha256(function_a.content_hash + function_b.content_hash)
+        # constants are compared relative to the .bss sections of both binaries
+        bss = [ ]
+        for project in (function_a.project, function_b.project):
+            section = project.loader.main_object.sections_map.get(".bss", None)
+            bss.append(section.min_addr if section is not None else None)
+        h.update(repr((cls.FORMAT_VERSION, bss)).encode())
+        return h.digest()
+
+    def get(self, key):
+        """
+        Look up the block matches of a function diff.
+
+        :param bytes key:   The cache key.
+        :return:            A list of pairs of block addresses, or None if the diff is not in the cache.
+        :rtype:             list
+        """
+        try:
+            row = self._connection().execute("SELECT block_matches FROM diffs WHERE key = ?", (key,)).fetchone()
+        except sqlite3.Error as ex:
+            l.debug("Failed to look up a diff in the diff cache %s: %s", self.path, ex)
+            return None
+        if row is None:
+            return None
+
+        try:
+            block_matches = [ (a, b) for a, b in json.loads(bytes(row[0]).decode()) ]
+            if not all(type(a) is int and type(b) is int for a, b in block_matches):
+                raise ValueError("block addresses must be integers")
+        except (ValueError, TypeError, UnicodeDecodeError):
+            l.warning("Corrupted entry in the diff cache %s.", self.path)
+            return None
+        return block_matches
+
+    def put(self, key, block_matches):
+        """
+        Store the block matches of a function diff.
+
+        :param bytes key:           The cache key.
+        :param list block_matches:  A list of pairs of block addresses.
+        """
+        try:
+            self._connection().execute("INSERT OR REPLACE INTO diffs (key, block_matches) VALUES (?, ?)",
+                                       (key, json.dumps(block_matches).encode()))
+        except sqlite3.Error as ex:
+            l.debug("Failed to store a diff in the diff cache %s: %s", self.path, ex)
+
+
+def _worker_function_diff(pair):
+    """
+    Compute the diff of a pair of functions in a worker process.
+
+    :param tuple pair:  The addresses of the functions.
+    :return:            A tuple of the pair and the block matches as pairs of addresses, or None if the diff failed.
+    :rtype:             tuple
+    """
+    try:
+        return pair, _bindiff_worker.get_function_diff(*pair).block_match_addrs
+    except (SimMemoryError, SimEngineError) as ex:
+        l.debug("Failed to diff functions %#x and %#x in a worker process: %s", pair[0], pair[1], ex)
+        return pair, None
+
+
 class BinDiff(Analysis):
     """
     This class computes the a diff between two binaries represented by angr Projects
     """
-    def __init__(self, other_project, enable_advanced_backward_slicing=False, cfg_a=None, cfg_b=None):
+    def __init__(self, other_project, enable_advanced_backward_slicing=False, cfg_a=None, cfg_b=None, workers=None,
+                 diff_cache=None):
         """
         :param other_project: The second project to diff
+        :param workers:       Number of forked worker processes to diff functions in while functions are matched. By
+                              default, function diffs are computed in the current process when they are needed.
+        :param diff_cache:    A FunctionDiffCache, or the path of its database, to remember function diffs across runs.
         """
         l.debug("Computing cfg's")
 
@@ -868,6 +1143,14 @@ class BinDiff(Analysis):
         self._attributes_a = dict()
         self._attributes_a = dict()
 
+        self._workers = workers
+        if isinstance(diff_cache, str):
+            diff_cache = FunctionDiffCache(diff_cache)
+        self._diff_cache = diff_cache
+        # normalized functions are shared by all function diffs and the function attributes
+        self._normalized_functions_a = dict()
+        self._normalized_functions_b = dict()
+
         self._function_diffs = dict()
         self.function_matches = set()
         self._unmatched_functions_from_a = set()
@@ -967,17 +1250,84 @@ class BinDiff(Analysis):
         """
         pair = (function_addr_a, function_addr_b)
         if pair not in self._function_diffs:
-            function_a = self.cfg_a.kb.functions.function(function_addr_a)
-            function_b = self.cfg_b.kb.functions.function(function_addr_b)
-            self._function_diffs[pair] = FunctionDiff(function_a, function_b, self)
+            self._function_diffs[pair] = self._make_function_diff(function_addr_a, function_addr_b)
         return self._function_diffs[pair]
 
+    def _make_function_diff(self, function_addr_a, function_addr_b, block_matches=None):
+        """
+        Create the FunctionDiff of two functions, taking the block matches from the diff cache if possible.
+
+        :param block_matches:   Block matches that were computed already, as pairs of block addresses.
+        :returns:               The FunctionDiff.
+        """
+        function_a = self._normalized_function(self.cfg_a, self._normalized_functions_a, function_addr_a)
+        function_b = self._normalized_function(self.cfg_b, self._normalized_functions_b, function_addr_b)
+
+        key = None
+        if self._diff_cache is not None:
+            key = FunctionDiffCache.key(function_a, function_b)
+            if block_matches is None:
+                block_matches = self._diff_cache.get(key)
+                if block_matches is not None:
+                    # this is a hit, so there is nothing to store
+                    key = None
+
+        diff = FunctionDiff(function_a, function_b, self, block_matches=block_matches)
+        if key is not None:
+            self._diff_cache.put(key, diff.block_match_addrs)
+        return diff
+
+    @staticmethod
+    def _normalized_function(cfg, normalized_functions, function_addr):
+        normalized = normalized_functions.get(function_addr, None)
+        if normalized is None:
+            normalized = NormalizedFunction(cfg.kb.functions.function(function_addr))
+            normalized_functions[function_addr] = normalized
+        return normalized
+
+    def _compute_function_diffs_in_workers(self, pool, pairs):
+        """
+        Compute the diffs of pairs of functions in a pool of forked worker processes. Worker processes inherit the
+        analysis, so only the addresses of the functions and of the matched blocks are sent between processes. Diffs
+        that were computed already, or that are in the diff cache, are not computed again.
+
+        :param pool:        The pool of worker processes.
+        :param set pairs:   Pairs of function addresses.
+        """
+
+        to_diff = [ ]
+        for pair in sorted(pairs):
+            if pair in self._function_diffs:
+                continue
+            # _compute_diff() does not diff these
+            if not self.project.loader.main_object.contains_addr(pair[0]) or \
+                    not self._p2.loader.main_object.contains_addr(pair[1]):
+                continue
+            if self.cfg_a.kb.functions.function(pair[0]).startpoint is None or \
+                    self.cfg_b.kb.functions.function(pair[1]).startpoint is None:
+                continue
+            if self._diff_cache is not None:
+                function_a = self._normalized_function(self.cfg_a, self._normalized_functions_a, pair[0])
+                function_b = self._normalized_function(self.cfg_b, self._normalized_functions_b, pair[1])
+                if self._diff_cache.get(FunctionDiffCache.key(function_a, function_b)) is not None:
+                    continue
+            to_diff.append(pair)
+
+        for pair, block_matches in pool.imap_unordered(_worker_function_diff, to_diff):
+            if block_matches is not None:
+                self._function_diffs[pair] = self._make_function_diff(pair[0], pair[1], block_matches=block_matches)
+
     @staticmethod
-    def _compute_function_attributes(cfg):
+    def _compute_function_attributes(cfg, normalized_functions=None):
         """
-        :param cfg: An angr CFG object
+        :param cfg:                     An angr CFG object
+        :param normalized_functions:    A dict of function addresses to NormalizedFunctions, to take normalized
+                                        functions from and to put them in.
         :returns:    a dictionary of function addresses to tuples of attributes
         """
+        if normalized_functions is None:
+            normalized_functions = dict()
+
         # the attributes we use are the number of basic blocks, number of edges, and number of subfunction calls
         attributes = dict()
         all_funcs = set(cfg.kb.callgraph.nodes())
@@ -986,7 +1336,7 @@ class BinDiff(Analysis):
             if cfg.kb.functions.function(function_addr) is None or cfg.kb.functions.function(function_addr).is_syscall:
                 continue
             if cfg.kb.functions.function(function_addr) is not None:
-                normalized_funtion = NormalizedFunction(cfg.kb.functions.function(function_addr))
+                normalized_funtion = BinDiff._normalized_function(cfg, normalized_functions, function_addr)
                 number_of_basic_blocks = len(normalized_funtion.graph.nodes())
                 number_of_edges = len(normalized_funtion.graph.edges())
             else:
@@ -1073,9 +1423,11 @@ class BinDiff(Analysis):
         return name_matches
 
     def _compute_diff(self):
+        global _bindiff_worker  # pylint:disable=global-statement
+
         # get the attributes for all functions
-        self.attributes_a = self._compute_function_attributes(self.cfg_a)
-        self.attributes_b = self._compute_function_attributes(self.cfg_b)
+        self.attributes_a = self._compute_function_attributes(self.cfg_a, self._normalized_functions_a)
+        self.attributes_b = self._compute_function_attributes(self.cfg_b, self._normalized_functions_b)
 
         # get the initial matches
         initial_matches = self._get_plt_matches()
@@ -1100,8 +1452,58 @@ class BinDiff(Analysis):
         callgraph_a_nodes = set(self.cfg_a.kb.callgraph.nodes())
         callgraph_b_nodes = set(self.cfg_b.kb.callgraph.nodes())
 
+        pool = None
+        if self._workers is not None and self._workers > 1 and 'fork' in multiprocessing.get_all_start_methods():
+            # worker processes inherit the function attributes and the normalized functions
+            _bindiff_worker = self
+            pool = multiprocessing.get_context('fork').Pool(processes=self._workers)
+
+        try:
+            self._match_functions(to_process, processed_matches, matched_a, matched_b, callgraph_a_nodes,
+                                  callgraph_b_nodes, pool)
+            if pool is not None:
+                pool.close()
+        finally:
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+                _bindiff_worker = None
+
+        # reformat matches into a set of pairs
+        self.function_matches = set()
+        for x,y in matched_a.items():
+            # only keep if the pair is in the binary ranges
+            if self.project.loader.main_object.contains_addr(x) and self._p2.loader.main_object.contains_addr(y):
+                self.function_matches.add((x, y))
+
+        # get the unmatched functions
+        self._unmatched_functions_from_a = set(x for x in self.attributes_a.keys() if x not in matched_a)
+        self._unmatched_functions_from_b = set(x for x in self.attributes_b.keys() if x not in matched_b)
+
+        # remove unneeded function diffs
+        for (x, y) in dict(self._function_diffs):
+            if (x, y) not in self.function_matches:
+                del self._function_diffs[(x, y)]
+
+    def _match_functions(self, to_process, processed_matches, matched_a, matched_b, callgraph_a_nodes,
+                         callgraph_b_nodes, pool=None):
+        """
+        Find new function matches from the calls and the call sites of matched functions, until no more are found.
+
+        :param pool:    A pool of worker processes to diff the functions of each round of matches in, or None.
+        """
+
+        # matches whose functions were sent to the worker processes
+        prefetched = set()
+
         # while queue is not empty
         while to_process:
+            if pool is not None and to_process[-1] not in prefetched:
+                # the call sites of every queued match are compared, so diff all of them in the worker processes
+                pairs = set(to_process) - prefetched
+                prefetched |= pairs
+                self._compute_function_diffs_in_workers(pool, pairs)
+
             (func_a, func_b) = to_process.pop()
             l.debug("Processing (%#x, %#x)", func_a, func_b)
 
@@ -1151,22 +1553,6 @@ class BinDiff(Analysis):
                         matched_b[y] = x
                         to_process.appendleft((x, y))
 
-        # reformat matches into a set of pairs
-        self.function_matches = set()
-        for x,y in matched_a.items():
-            # only keep if the pair is in the binary ranges
-            if self.project.loader.main_object.contains_addr(x) and self._p2.loader.main_object.contains_addr(y):
-                self.function_matches.add((x, y))
-
-        # get the unmatched functions
-        self._unmatched_functions_from_a = set(x for x in self.attributes_a.keys() if x not in matched_a)
-        self._unmatched_functions_from_b = set(x for x in self.attributes_b.keys() if x not in matched_b)
-
-        # remove unneeded function diffs
-        for (x, y) in dict(self._function_diffs):
-            if (x, y) not in self.function_matches:
-                del self._function_diffs[(x, y)]
-
     @staticmethod
     def _get_function_matches(attributes_a, attributes_b, filter_set_a=None, filter_set_b=None):
         """
@@ -2178,9 +2178,24 @@ class CFGBase(Analysis):
         :return:        A set of resolved indirect jump targets (ints).
         """
 
-        resolved = False
-        resolved_by = None
-        targets = None
+        resolved_by, targets = self._resolve_one_indirect_jump(jump)
+
+        if resolved_by is not None:
+            self._indirect_jump_resolved(jump, jump.addr, resolved_by, targets)
+        else:
+            self._indirect_jump_unresolved(jump)
+
+        return set() if targets is None else set(targets)
+
+    def _resolve_one_indirect_jump(self, jump):
+        """
+        Run all indirect jump resolvers on a given indirect jump, without updating the CFG.
+
+        :param IndirectJump jump:  The IndirectJump instance.
+        :return:        A tuple of the resolver that resolves the indirect jump and a list of resolved targets, or
+                        (None, None) if the indirect jump cannot be resolved.
+        :rtype:         tuple
+        """
 
         block = self._lift(jump.addr, opt_level=1)
 
@@ -2192,12 +2207,6 @@ class CFGBase(Analysis):
 
             resolved, targets = resolver.resolve(self, jump.addr, jump.func_addr, block, jump.jumpkind)
             if resolved:
-                resolved_by = resolver
-                break
+                return resolver, targets
 
-        if resolved:
-            self._indirect_jump_resolved(jump, jump.addr, resolved_by, targets)
-        else:
-            self._indirect_jump_unresolved(jump)
-
-        return set() if targets is None else set(targets)
+        return None, None
@@ -1805,9 +1805,8 @@ class CFGEmulated(ForwardAnalysis, CFGBase):    # pylint: disable=abstract-metho
 
         if self._base_graph is not None:
             # remove all existing jobs that has the same block ID
-            if next((en for en in self.jobs if en.block_id == pw.block_id), None):
-                # TODO: this is very hackish. Reimplement this logic later
-                self._job_info_queue = [entry for entry in self._job_info_queue if entry.job.block_id != pw.block_id]
+            # TODO: this is very hackish. Reimplement this logic later
+            self._job_info_queue.remove_if(lambda entry: entry.job.block_id == pw.block_id)
 
         # register the job
         self._register_analysis_job(pw.func_addr, pw)
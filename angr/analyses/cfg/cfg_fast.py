@@ -1,6 +1,9 @@
+import bisect
 import itertools
 import logging
 import math
+import multiprocessing
+import pickle
 import re
 import string
 from collections import defaultdict
@@ -27,6 +30,140 @@ VEX_IRSB_MAX_SIZE = 400
 l = logging.getLogger("angr.analyses.cfg.cfg_fast")
 
 
+#
+# Parallel lifting
+#
+
+# the context of a lifting worker process: the project, the sorted list of regions to scan, and the IR optimization level
+_prelift_worker_context = None
+
+# maximum number of blocks a lifting worker lifts for each function, so that a worker does not wander into huge areas
+# that the main process will never reach
+PRELIFT_MAX_BLOCKS_PER_FUNCTION = 2000
+
+
+def _prelift_worker_init(project, regions, opt_level):
+    global _prelift_worker_context  # pylint:disable=global-statement
+    _prelift_worker_context = (project, regions, opt_level)
+
+
+def _prelift_block(project, addr, opt_level):
+    """
+    Lift a block in a lifting worker process, the same way CFGFast._generate_cfgnode() does, except that only section
+    boundaries limit the block size.
+
+    :return:    A tuple of (IRSB, bytes), or None if the block cannot be decoded.
+    """
+
+    real_addr = addr & (~1) if project.arch.name in ('ARMHF', 'ARMEL') else addr
+
+    distance = VEX_IRSB_MAX_SIZE
+    section = project.loader.find_section_containing(addr)
+    if section is not None:
+        if not section.is_executable:
+            return None
+        distance = min(section.vaddr + section.memsize - real_addr, VEX_IRSB_MAX_SIZE)
+
+    try:
+        lifted_block = project.factory.block(addr, size=distance, opt_level=opt_level, collect_data_refs=True)
+        irsb = lifted_block.vex_nostmt
+    except (SimTranslationError, SimMemoryError, SimEngineError):
+        return None
+
+    if irsb.size == 0 or irsb.jumpkind == 'Ijk_NoDecode':
+        # CFGFast handles decoding failures (and switches ARM modes) by itself
+        return None
+    return irsb, lifted_block.bytes[:irsb.size]
+
+
+def _prelift_functions(func_addrs):
+    """
+    Lift all blocks that are reachable through direct jumps and call fall-throughs from each of the given function
+    starts. Data references are collected during lifting.
+
+    :param list func_addrs: Addresses of functions.
+    :return:                A pickled dict mapping block addresses to (IRSB, bytes) tuples, or None if the blocks cannot
+                            be pickled.
+    :rtype:                 bytes
+    """
+
+    project, regions, opt_level = _prelift_worker_context
+    region_starts = [ start for start, _ in regions ]
+
+    blocks = { }
+    for func_addr in func_addrs:
+        stack = [ func_addr ]
+        lifted = 0
+        while stack and lifted < PRELIFT_MAX_BLOCKS_PER_FUNCTION:
+            addr = stack.pop()
+            if addr in blocks:
+                continue
+            pos = bisect.bisect_right(region_starts, addr) - 1
+            if pos < 0 or addr >= regions[pos][1]:
+                continue
+            if project.is_hooked(addr):
+                continue
+
+            r = _prelift_block(project, addr, opt_level)
+            if r is None:
+                continue
+            blocks[addr] = r
+            lifted += 1
+
+            irsb = r[0]
+            for _, _, exit_stmt in irsb.exit_statements:
+                if exit_stmt.jumpkind == 'Ijk_Boring':
+                    stack.append(exit_stmt.dst.value)
+            if irsb.jumpkind == 'Ijk_Call':
+                stack.append(addr + irsb.size)
+            elif irsb.jumpkind == 'Ijk_Boring' and isinstance(irsb.next, pyvex.IRExpr.Const):
+                stack.append(irsb.next.con.value)
+
+    try:
+        return pickle.dumps(blocks, pickle.HIGHEST_PROTOCOL)
+    except (pickle.PicklingError, TypeError, AttributeError):
+        l.warning("Failed to serialize blocks lifted in a worker process.", exc_info=True)
+        return None
+
+
+#
+# Batched indirect jump resolution
+#
+
+# the CFG that forked an indirect jump resolution worker process
+_indirect_jump_worker_cfg = None
+
+
+def _resolve_indirect_jump_group(args):
+    """
+    Resolve all indirect jumps of a function in an indirect jump resolution worker process.
+
+    :param tuple args:  A tuple of the function address and a list of addresses of the indirect jumps.
+    :return:            A list of tuples of (jump address, index of the resolver or None, targets, the jump table fields
+                        of the IndirectJump instance, the bookkeeping of every resolver).
+    :rtype:             list
+    """
+
+    cfg = _indirect_jump_worker_cfg
+    func_addr, jump_addrs = args
+
+    results = [ ]
+    for jump, resolved_by, targets in cfg._resolve_indirect_jump_group(func_addr,
+                                                                        [ cfg.indirect_jumps[a] for a in jump_addrs ]):
+        # resolvers keep bookkeeping on unresolved jumps as well
+        resolver_data = [ resolver.export_resolution(jump.addr) for resolver in cfg.indirect_jump_resolvers ]
+        if resolved_by is None:
+            results.append((jump.addr, None, None, None, resolver_data))
+            continue
+        results.append((jump.addr,
+                        cfg.indirect_jump_resolvers.index(resolved_by),
+                        list(targets),
+                        (jump.jumptable, jump.jumptable_addr, jump.jumptable_entries),
+                        resolver_data,
+                        ))
+    return results
+
+
 class Segment:
     """
     Representing a memory block. This is not the "Segment" in ELF memory model
@@ -437,6 +574,36 @@ class SegmentList:
 
         # self._debug_check()
 
+    def release(self, address, size):
+        """
+        Exclude a block, specified by (address, size), from this segment list. Segments that partially overlap with the
+        block are shrunk or split.
+
+        :param int address:     The starting address of the block.
+        :param int size:        Size of the block.
+        :return: None
+        """
+
+        if size is None or size <= 0:
+            return
+
+        end = address + size
+        idx = self._search(address)
+
+        new_segments = [ ]
+        i = idx
+        while i < len(self._list) and self._list[i].start < end:
+            segment = self._list[i]
+            if segment.start < address:
+                new_segments.append(Segment(segment.start, address, segment.sort))
+            if segment.end > end:
+                new_segments.append(Segment(end, segment.end, segment.sort))
+            self._bytes_occupied -= segment.size
+            i += 1
+
+        self._bytes_occupied += sum(seg.size for seg in new_segments)
+        self._list[idx:i] = new_segments
+
     def copy(self):
         """
         Make a copy of the SegmentList.
@@ -842,6 +1009,8 @@ class CFGFast(ForwardAnalysis, CFGBase):    # pylint: disable=abstract-method
                  exclude_sparse_regions=True,
                  skip_specific_regions=True,
                  heuristic_plt_resolving=None,
+                 workers=None,
+                 batch_indirect_jumps=False,
                  start=None,  # deprecated
                  end=None,  # deprecated
                  **extra_arch_options
@@ -877,6 +1046,14 @@ class CFGFast(ForwardAnalysis, CFGBase):    # pylint: disable=abstract-method
                                              default indirect jump resolvers specific to this architecture and binary
                                              types will be loaded.
         :param base_state:              A state to use as a backer for all memory loads
+        :param int workers:             Number of worker processes that lift blocks and collect data references ahead of
+                                        the scanning, partitioned by the function starts that are known before scanning
+                                        begins. By default everything is done in the current process. Not supported
+                                        together with `base_state`.
+        :param bool batch_indirect_jumps: Defer the resolution of indirect jumps until scanning cannot find any new code,
+                                          and then resolve them function by function, so that resolvers can share work
+                                          among the jumps of a function. With `workers`, functions are resolved in
+                                          parallel in forked worker processes.
         :param int start:               (Deprecated) The beginning address of CFG recovery.
         :param int end:                 (Deprecated) The end address of CFG recovery.
         :param CFGArchOptions arch_options: Architecture-specific options.
@@ -974,6 +1151,9 @@ class CFGFast(ForwardAnalysis, CFGBase):    # pylint: disable=abstract-method
 
         self._data_type_guessing_handlers = [ ] if data_type_guessing_handlers is None else data_type_guessing_handlers
 
+        self._workers = workers
+        self._batch_indirect_jumps = batch_indirect_jumps
+
         l.debug("CFG recovery covers %d regions:", len(self._regions))
         for start_addr in self._regions:
             l.debug("... %#x - %#x", start_addr, self._regions[start_addr])
@@ -1009,8 +1189,18 @@ class CFGFast(ForwardAnalysis, CFGBase):    # pylint: disable=abstract-method
 
         self._graph = None
 
+        # Parallel lifting
+        self._prelift_pool = None
+        self._prelift_results = None
+        self._prelifted_blocks = { }
+
         # Start working!
-        self._analyze()
+        try:
+            self._analyze()
+        finally:
+            # the lifting workers are normally shut down in _post_analysis(), which is never reached if the analysis
+            # raises
+            self._stop_prelifting()
 
     #
     # Utils
@@ -1364,6 +1554,12 @@ class CFGFast(ForwardAnalysis, CFGBase):    # pylint: disable=abstract-method
             # make function_prologue_addrs a set for faster lookups
             self._function_prologue_addrs = set(self._function_prologue_addrs)
 
+        if self._workers is not None and self._workers > 1:
+            func_addrs = set(starting_points)
+            if self._use_function_prologues:
+                func_addrs |= self._function_prologue_addrs
+            self._start_prelifting(func_addrs)
+
     def _pre_job_handling(self, job):  # pylint:disable=arguments-differ
         """
         Some pre job-processing tasks, like update progress bar.
@@ -1479,7 +1675,9 @@ class CFGFast(ForwardAnalysis, CFGBase):    # pylint: disable=abstract-method
                 self._register_analysis_job(prolog_addr, job)
                 return
 
-        # Try to see if there is any indirect jump left to be resolved
+        # Try to see if there is any indirect jump left to be resolved. in batch mode, all of them are resolved at once.
+        # either way, this must happen before the complete scan, which would otherwise take the targets of jump tables
+        # for function starts
         if self._resolve_indirect_jumps and self._indirect_jumps_to_resolve:
             self._process_unresolved_indirect_jumps()
 
@@ -1493,9 +1691,12 @@ class CFGFast(ForwardAnalysis, CFGBase):    # pylint: disable=abstract-method
                 job = CFGJob(addr, addr, "Ijk_Boring", last_addr=None, job_type=CFGJob.JOB_TYPE_COMPLETE_SCANNING)
                 self._insert_job(job)
                 self._register_analysis_job(addr, job)
+                return
 
     def _post_analysis(self):
 
+        self._stop_prelifting()
+
         self._make_completed_functions()
 
         if self._normalize:
@@ -1581,6 +1782,129 @@ class CFGFast(ForwardAnalysis, CFGBase):    # pylint: disable=abstract-method
 
         self._finish_progress()
 
+    # Incremental updates
+
+    def update(self, changed_ranges):
+        """
+        Update the CFG after the code in some memory ranges is patched, or after some addresses are hooked or unhooked,
+        without recovering the entire CFG again.
+
+        All blocks that overlap with a changed range are removed, along with all other blocks of the functions they
+        belong to. Those functions are scanned again from their beginnings, and removed blocks are scanned again from
+        every edge that comes from a block that is kept. In the end, functions are rebuilt from the updated graph.
+
+        :param iterable changed_ranges: A list of (start, end) tuples of changed memory ranges, where `end` is exclusive.
+                                        An integer stands for a single address, e.g. an address that is (un)hooked.
+        :return:                        None
+        """
+
+        ranges = sorted((r, r + 1) if isinstance(r, int) else (r[0], r[1]) for r in changed_ranges)
+        if not ranges:
+            return
+
+        def _overlaps(node):
+            start = self._real_address(self.project.arch, node.addr)
+            end = start + max(node.size, 1)  # nodes of SimProcedures have a size of 0
+            return any(start_ < end and start < end_ for start_, end_ in ranges)
+
+        changed_nodes = [ n for n in self.graph.nodes() if _overlaps(n) ]
+        affected_funcs = set(n.function_address for n in changed_nodes if n.function_address is not None)
+
+        removed_block_addrs = set(n.addr for n in changed_nodes)
+        for func_addr in affected_funcs:
+            if func_addr in self.kb.functions:
+                removed_block_addrs |= self.kb.functions[func_addr].block_addrs_set
+        removed_nodes = set(n for n in self.graph.nodes()
+                            if n.addr in removed_block_addrs or n.function_address in affected_funcs)
+        # functions that begin with a removed block are removed, too
+        affected_funcs |= set(n.addr for n in removed_nodes if n.addr in self.kb.functions)
+
+        # edges that come from blocks that are kept
+        frontier = [ (src, dst, data) for dst in removed_nodes for src, _, data in self.graph.in_edges(dst, data=True)
+                     if src not in removed_nodes
+                     ]
+
+        l.debug("Updating the CFG: %d blocks of %d functions are removed.", len(removed_nodes), len(affected_funcs))
+
+        # invalidate everything we know about the removed blocks and functions
+        released = list(ranges)
+        for node in removed_nodes:
+            self._remove_node(node)
+            nodes = self._nodes_by_addr.get(node.addr, None)
+            if nodes is not None:
+                if node in nodes:
+                    nodes.remove(node)
+                if not nodes:
+                    del self._nodes_by_addr[node.addr]
+
+            real_addr = self._real_address(self.project.arch, node.addr)
+            self._traced_addresses.discard(real_addr)
+            self._traced_addresses.discard(node.addr)
+            released.append((real_addr, real_addr + node.size))
+
+            self.indirect_jumps.pop(node.addr, None)
+            self.jump_tables.pop(node.addr, None)
+
+        for start, end in released:
+            self._seg_list.release(start, end - start)
+
+        self._indirect_jumps_to_resolve = set(ij for ij in self._indirect_jumps_to_resolve
+                                              if ij.addr not in removed_block_addrs)
+
+        for func_addr in affected_funcs:
+            if func_addr in self.kb.functions:
+                del self.kb.functions[func_addr]
+            self._function_exits.pop(func_addr, None)
+            self._updated_nonreturning_functions.discard(func_addr)
+        for func_addr in list(self._function_returns):
+            returns = set(fr for fr in self._function_returns[func_addr]
+                          if fr.call_site_addr not in removed_block_addrs and fr.caller_func_addr not in affected_funcs)
+            if returns:
+                self._function_returns[func_addr] = returns
+            else:
+                del self._function_returns[func_addr]
+
+        # forget the data references made by removed blocks. they are collected again when the blocks are scanned
+        for addr in list(self._memory_data):
+            data = self._memory_data[addr]
+            if any(start <= addr < end for start, end in ranges):
+                del self._memory_data[addr]
+                continue
+            data.refs = set(ref for ref in data.refs if ref[0] not in removed_block_addrs)
+            if data.irsb_addr in removed_block_addrs:
+                if not data.refs:
+                    del self._memory_data[addr]
+                    continue
+                data.irsb_addr, data.stmt_idx, data.insn_addr = min(data.refs)
+                data.irsb, data.stmt = None, None
+        for insn_addr in list(self.insn_addr_to_memory_data):
+            if self.insn_addr_to_memory_data[insn_addr].address not in self._memory_data or \
+                    any(start <= insn_addr < end for start, end in released):
+                del self.insn_addr_to_memory_data[insn_addr]
+
+        # scan again from the beginning of each affected function, and from all edges going into removed blocks
+        for func_addr in sorted(affected_funcs):
+            job = CFGJob(func_addr, func_addr, 'Ijk_Boring')
+            self._insert_job(job)
+            self._register_analysis_job(func_addr, job)
+
+        for src, dst, data in frontier:
+            jumpkind = data.get('jumpkind', 'Ijk_Boring')
+            func_addr = dst.addr if jumpkind == 'Ijk_Call' or src.function_address is None else src.function_address
+            job = CFGJob(dst.addr, func_addr, jumpkind, src_node=src, src_ins_addr=data.get('ins_addr', None),
+                         src_stmt_idx=data.get('stmt_idx', None))
+            self._insert_job(job)
+            self._register_analysis_job(func_addr, job)
+
+        if self._force_complete_scan and self._next_addr is not None:
+            # released bytes that are not reached from any job are picked up by the complete scanning
+            self._next_addr = min(self._next_addr, min(start for start, _ in released) - 1)
+
+        self._normalized = False
+
+        self._analysis_core_baremetal()
+        self._post_analysis()
+
     # Methods to get start points for scanning
 
     def _func_addrs_from_symbols(self):
@@ -1621,6 +1945,201 @@ class CFGFast(ForwardAnalysis, CFGBase):    # pylint: disable=abstract-method
         l.info("Found %d functions with prologue scanning.", len(unassured_functions))
         return unassured_functions
 
+    # Parallel lifting
+
+    def _start_prelifting(self, func_addrs):
+        """
+        Partition the given functions among a pool of worker processes, which lift the blocks of those functions and
+        collect their data references in parallel. Lifted blocks are picked up by _generate_cfgnode() when scanning
+        reaches them, and the CFG and the functions are still built in the current process, in the same order as
+        without workers.
+
+        :param iterable func_addrs: Addresses of functions that are known before scanning starts.
+        :return:                    None
+        """
+
+        if self._base_state is not None:
+            l.warning("Lifting in worker processes is not supported with a base state. All blocks will be lifted in "
+                      "the current process.")
+            return
+
+        func_addrs = sorted(func_addrs)
+        if not func_addrs:
+            return
+
+        # small chunks, so that blocks near the start of the scanning arrive early
+        chunk_size = max(1, min(64, len(func_addrs) // (self._workers * 4)))
+        chunks = [ func_addrs[i:i + chunk_size] for i in range(0, len(func_addrs), chunk_size) ]
+
+        self._prelift_pool = multiprocessing.Pool(processes=self._workers,
+                                                  initializer=_prelift_worker_init,
+                                                  initargs=(self.project, list(self._regions.items()),
+                                                            self._iropt_level),
+                                                  )
+        self._prelift_results = self._prelift_pool.imap_unordered(_prelift_functions, chunks)
+
+    def _stop_prelifting(self):
+        """
+        Shut down the lifting worker processes, and drop all lifted blocks that are not used.
+
+        :return: None
+        """
+
+        if self._prelift_pool is not None:
+            self._prelift_pool.terminate()
+            self._prelift_pool.join()
+            self._prelift_pool = None
+        self._prelift_results = None
+        self._prelifted_blocks = { }
+
+    def _collect_prelifted_blocks(self):
+        """
+        Take all blocks that the lifting worker processes have finished so far, without waiting for the rest.
+
+        :return: None
+        """
+
+        while True:
+            try:
+                data = self._prelift_results.next(timeout=0)
+            except multiprocessing.TimeoutError:
+                return
+            except StopIteration:
+                # all workers are done
+                self._prelift_pool.close()
+                self._prelift_pool.join()
+                self._prelift_pool = None
+                self._prelift_results = None
+                return
+
+            if data is None:
+                continue
+            for addr, (irsb, irsb_string) in pickle.loads(data).items():
+                if addr in self._nodes or addr in self._prelifted_blocks:
+                    continue
+                irsb.arch = self.project.arch
+                self._prelifted_blocks[addr] = (irsb, irsb_string)
+
+    def _pop_prelifted_block(self, addr, max_size):
+        """
+        Get the block at `addr` if a lifting worker process has lifted it already. A block lifted by a worker is only
+        used if it is no larger than `max_size`, in which case lifting it in the current process with a maximum size of
+        `max_size` would yield the very same block.
+
+        :param int addr:        Address of the block.
+        :param int max_size:    Maximum size of the block.
+        :return:                A tuple of (IRSB, bytes), or (None, None) if the block must be lifted here.
+        :rtype:                 tuple
+        """
+
+        if self._prelift_results is not None:
+            self._collect_prelifted_blocks()
+
+        r = self._prelifted_blocks.pop(addr, None)
+        if r is None or r[0].size > max_size:
+            return None, None
+        return r
+
+    # Batched indirect jump resolution
+
+    def _process_unresolved_indirect_jumps(self):
+        """
+        Resolve all unresolved indirect jumps found in previous scanning. In batch mode, indirect jumps are grouped by
+        function, and the targets of all resolved jumps are added as new jobs once all jumps are resolved.
+
+        :return:    A set of concrete indirect jump targets (ints).
+        :rtype:     set
+        """
+
+        if not self._batch_indirect_jumps:
+            return super(CFGFast, self)._process_unresolved_indirect_jumps()
+
+        groups = defaultdict(list)
+        for jump in self._indirect_jumps_to_resolve:  # type: IndirectJump
+            groups[jump.func_addr].append(jump)
+        self._indirect_jumps_to_resolve.clear()
+
+        l.info("%d indirect jumps in %d functions to resolve.", sum(len(v) for v in groups.values()), len(groups))
+
+        if self._workers is not None and self._workers > 1 and len(groups) > 1 and \
+                'fork' in multiprocessing.get_all_start_methods():
+            results = self._resolve_indirect_jump_groups_in_workers(groups)
+        else:
+            results = [ ]
+            for func_addr in sorted(groups):
+                results.extend(self._resolve_indirect_jump_group(func_addr, groups[func_addr]))
+
+        all_targets = set()
+        for jump, resolved_by, targets in results:
+            if resolved_by is not None:
+                self._indirect_jump_resolved(jump, jump.addr, resolved_by, targets)
+                all_targets |= set(targets)
+            else:
+                self._indirect_jump_unresolved(jump)
+
+        return all_targets
+
+    def _resolve_indirect_jump_group(self, func_addr, jumps):
+        """
+        Resolve all indirect jumps of a function, without updating the CFG.
+
+        :param int func_addr:   Address of the function.
+        :param list jumps:      A list of IndirectJump instances of the function.
+        :return:                A list of tuples of (IndirectJump, the resolver or None, targets).
+        :rtype:                 list
+        """
+
+        for resolver in self.indirect_jump_resolvers:
+            resolver.enter_function(self, func_addr)
+
+        results = [ ]
+        try:
+            for jump in sorted(jumps, key=lambda j: j.addr):
+                resolved_by, targets = self._resolve_one_indirect_jump(jump)
+                results.append((jump, resolved_by, targets))
+        finally:
+            for resolver in self.indirect_jump_resolvers:
+                resolver.leave_function()
+
+        return results
+
+    def _resolve_indirect_jump_groups_in_workers(self, groups):
+        """
+        Resolve indirect jumps function by function in a pool of forked worker processes. Worker processes inherit the
+        CFG recovered so far, so nothing but the resolved targets are sent between processes.
+
+        :param dict groups: A dict of function addresses to lists of IndirectJump instances.
+        :return:            A list of tuples of (IndirectJump, the resolver or None, targets).
+        :rtype:             list
+        """
+
+        global _indirect_jump_worker_cfg  # pylint:disable=global-statement
+
+        tasks = [ (func_addr, [ j.addr for j in groups[func_addr] ]) for func_addr in sorted(groups) ]
+
+        results = [ ]
+        _indirect_jump_worker_cfg = self
+        pool = multiprocessing.get_context('fork').Pool(processes=min(self._workers, len(tasks)))
+        try:
+            for group_results in pool.imap(_resolve_indirect_jump_group, tasks):
+                for addr, resolver_idx, targets, jumptable_fields, resolver_data in group_results:
+                    jump = self.indirect_jumps[addr]
+                    for resolver, data in zip(self.indirect_jump_resolvers, resolver_data):
+                        resolver.import_resolution(addr, data)
+                    if resolver_idx is None:
+                        results.append((jump, None, None))
+                        continue
+                    resolved_by = self.indirect_jump_resolvers[resolver_idx]
+                    jump.jumptable, jump.jumptable_addr, jump.jumptable_entries = jumptable_fields
+                    results.append((jump, resolved_by, targets))
+            pool.close()
+        finally:
+            pool.terminate()
+            pool.join()
+            _indirect_jump_worker_cfg = None
+
+        return results
+
     # Basic block scanning
 
     def _scan_block(self, cfg_job):
@@ -3515,14 +4034,14 @@ class CFGFast(ForwardAnalysis, CFGBase):    # pylint: disable=abstract-method
 
             # Let's try to create the pyvex IRSB directly, since it's much faster
             nodecode = False
-            irsb = None
-            irsb_string = None
-            try:
-                lifted_block = self._lift(addr, size=distance, opt_level=self._iropt_level, collect_data_refs=True)
-                irsb = lifted_block.vex_nostmt
-                irsb_string = lifted_block.bytes[:irsb.size]
-            except SimTranslationError:
-                nodecode = True
+            irsb, irsb_string = self._pop_prelifted_block(addr, distance)
+            if irsb is None:
+                try:
+                    lifted_block = self._lift(addr, size=distance, opt_level=self._iropt_level, collect_data_refs=True)
+                    irsb = lifted_block.vex_nostmt
+                    irsb_string = lifted_block.bytes[:irsb.size]
+                except SimTranslationError:
+                    nodecode = True
 
             if (nodecode or irsb.size == 0 or irsb.jumpkind == 'Ijk_NoDecode') and \
                     is_arm_arch and \
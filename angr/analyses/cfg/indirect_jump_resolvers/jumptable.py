@@ -11,6 +11,7 @@ from .... import sim_options as o
 from .... import BP, BP_BEFORE
 from ....exploration_techniques import Slicecutor
 from .resolver import IndirectJumpResolver
+from .jumptable_fast import resolve_jump_table
 
 
 l = logging.getLogger("angr.analyses.cfg.indirect_jump_resolvers.jumptable")
@@ -28,16 +29,41 @@ class JumpTableResolver(IndirectJumpResolver):
         - The final jump target comes from the memory.
         - The final jump target must be directly read out of the memory, without any further modification or altering.
 
+    Common jump table idioms are first resolved by interpreting the jump block and its predecessors concretely (see
+    jumptable_fast.py). Only the jumps that this fast path cannot resolve go through backward slicing and symbolic
+    execution.
     """
-    def __init__(self, project):
+    def __init__(self, project, use_fast_path=True):
         super(JumpTableResolver, self).__init__(project, timeless=False)
 
         self._bss_regions = None
         # the maximum number of resolved targets. Will be initialized from CFG.
         self._max_targets = None
+        self._use_fast_path = use_fast_path
+
+        # indirect jump address -> 'fast', 'slicing', or None if the jump is not resolved
+        self.resolution_paths = { }
+
+        # per-function caches that are only alive between enter_function() and leave_function()
+        self._vex_cache = None
+        self._state_template = None
 
         self._find_bss_region()
 
+    @property
+    def stats(self):
+        """
+        Count the jumps resolved by each path.
+
+        :return:    A dict of 'fast', 'slicing' and 'unresolved' to the number of jumps.
+        :rtype:     dict
+        """
+
+        stats = {'fast': 0, 'slicing': 0, 'unresolved': 0}
+        for path in self.resolution_paths.values():
+            stats[path if path is not None else 'unresolved'] += 1
+        return stats
+
     def filter(self, cfg, addr, func_addr, block, jumpkind):
         # TODO:
 
@@ -59,9 +85,110 @@ class JumpTableResolver(IndirectJumpResolver):
         :rtype: tuple
         """
 
-        project = self.project  # short-hand
         self._max_targets = cfg._indirect_jump_target_limit
 
+        if self._use_fast_path:
+            r = self._resolve_fast(cfg, addr, block)
+            if r is not None:
+                self.resolution_paths[addr] = 'fast'
+                return True, r
+
+        resolved, targets = self._resolve_slicing(cfg, addr)
+        self.resolution_paths[addr] = 'slicing' if resolved else None
+        return resolved, targets
+
+    def enter_function(self, cfg, func_addr):
+        # jumps of the same function share most of their slices
+        self._vex_cache = { }
+        self._state_template = None
+
+    def leave_function(self):
+        self._vex_cache = None
+        self._state_template = None
+
+    def export_resolution(self, addr):
+        # None if this resolver did not see the jump at all, since a path of None means the jump is unresolved
+        if addr not in self.resolution_paths:
+            return None
+        return (self.resolution_paths[addr], )
+
+    def import_resolution(self, addr, data):
+        if data is not None:
+            self.resolution_paths[addr] = data[0]
+
+    #
+    # Private methods
+    #
+
+    def _lift_vex(self, block_addr):
+        """
+        Lift a block, reusing blocks lifted for other indirect jumps of the same function if possible.
+
+        :param int block_addr:  Address of the block.
+        :return:                The IRSB.
+        :rtype:                 pyvex.IRSB
+        """
+
+        if self._vex_cache is not None and block_addr in self._vex_cache:
+            return self._vex_cache[block_addr]
+        irsb = self.project.factory.block(block_addr, backup_state=self.base_state).vex
+        if self._vex_cache is not None:
+            self._vex_cache[block_addr] = irsb
+        return irsb
+
+    def _resolve_fast(self, cfg, addr, block):
+        """
+        Resolve a jump table without slicing or symbolic execution.
+
+        :param cfg:         A CFG instance.
+        :param int addr:    IRSB address.
+        :param block:       The block ending with the indirect jump.
+        :return:            A list of resolved targets, or None if the jump cannot be resolved this way.
+        :rtype:             list
+        """
+
+        r = resolve_jump_table(self.project, cfg, addr, block, self._max_targets)
+        if r is None:
+            return None
+        table_addr, targets = r
+
+        if not all(self._is_target_valid(cfg, t) for t in targets):
+            l.debug("Fast path resolved invalid targets for the indirect jump at %#x.", addr)
+            return None
+
+        l.info("Resolved %d targets from %#x without slicing.", len(targets), addr)
+        self._record_jump_table(cfg, addr, table_addr, targets)
+        return targets
+
+    def _record_jump_table(self, cfg, addr, table_addr, jump_table):
+        """
+        Write the resolved jump table to the IndirectJump object in CFG.
+        """
+
+        ij = cfg.indirect_jumps[addr]
+        if len(jump_table) > 1:
+            # It can be considered a jump table only if there are more than one jump target
+            ij.jumptable = True
+            ij.jumptable_addr = table_addr
+            ij.resolved_targets = set(jump_table)
+            ij.jumptable_entries = jump_table
+        else:
+            ij.jumptable = False
+            ij.resolved_targets = set(jump_table)
+
+    def _resolve_slicing(self, cfg, addr):
+        """
+        Resolve a jump table by backward slicing and executing the slice.
+
+        :param cfg:         A CFG instance.
+        :param int addr:    IRSB address.
+        :return:            A bool indicating whether the indirect jump is resolved successfully, and a list of resolved
+                            targets.
+        :rtype:             tuple
+        """
+
+        project = self.project  # short-hand
+
         # Perform a backward slicing from the jump target
         b = Blade(cfg.graph, addr, -1,
             cfg=cfg, project=project,
@@ -79,7 +206,7 @@ class JumpTableResolver(IndirectJumpResolver):
             if len(preds) != 1:
                 return False, None
             block_addr, stmt_idx = stmt_loc = preds[0]
-            block = project.factory.block(block_addr, backup_state=self.base_state).vex
+            block = self._lift_vex(block_addr)
             stmt = block.statements[stmt_idx]
             if isinstance(stmt, (pyvex.IRStmt.WrTmp, pyvex.IRStmt.Put)):
                 if isinstance(stmt.data, (pyvex.IRExpr.Get, pyvex.IRExpr.RdTmp)):
@@ -210,26 +337,12 @@ class JumpTableResolver(IndirectJumpResolver):
 
                 l.info("Resolved %d targets from %#x.", len(all_targets), addr)
 
-                # write to the IndirectJump object in CFG
-                ij = cfg.indirect_jumps[addr]
-                if total_cases > 1:
-                    # It can be considered a jump table only if there are more than one jump target
-                    ij.jumptable = True
-                    ij.jumptable_addr = state.solver.min(jump_addr)
-                    ij.resolved_targets = set(jump_table)
-                    ij.jumptable_entries = jump_table
-                else:
-                    ij.jumptable = False
-                    ij.resolved_targets = set(jump_table)
+                self._record_jump_table(cfg, addr, min_jump_target, jump_table)
 
                 return True, all_targets
 
         return False, None
 
-    #
-    # Private methods
-    #
-
     def _find_bss_region(self):
 
         self._bss_regions = [ ]
@@ -302,7 +415,7 @@ class JumpTableResolver(IndirectJumpResolver):
 
         for addr in sorted(stmts.keys()):
             stmt_ids = stmts[addr]
-            irsb = self.project.factory.block(addr, backup_state=self.base_state).vex
+            irsb = self._lift_vex(addr)
 
             print("  ####")
             print("  #### Block %#x" % addr)
@@ -325,6 +438,11 @@ class JumpTableResolver(IndirectJumpResolver):
 
     def _initial_state(self, src_irsb):
 
+        if self._state_template is not None:
+            state = self._state_template.copy()
+            state.regs.ip = src_irsb
+            return state
+
         state = self.project.factory.blank_state(
             addr=src_irsb,
             mode='static',
@@ -339,6 +457,10 @@ class JumpTableResolver(IndirectJumpResolver):
                            } | o.refs
         )
 
+        if self._vex_cache is not None:
+            # resolving a batch of jumps of the same function
+            self._state_template = state.copy()
+
         return state
 
     @staticmethod
@@ -0,0 +1,539 @@
+import re
+import logging
+
+from ....engines.light import SimEngineLightVEX
+
+l = logging.getLogger("angr.analyses.cfg.indirect_jump_resolvers.jumptable_fast")
+
+
+class UnsupportedCodeError(Exception):
+    """
+    Raised when the blocks contain code that the fast jump table engine cannot reason about.
+    """
+    pass
+
+
+class IndexValue(object):
+    """
+    An unknown value, scaled and offset: coef * var + offset. `var` identifies where the unknown value comes from, so
+    that a bounds check on one copy of the value also bounds the other copies.
+    """
+
+    __slots__ = ('var', 'coef', 'offset', )
+
+    def __init__(self, var, coef=1, offset=0):
+        self.var = var
+        self.coef = coef
+        self.offset = offset
+
+    def __repr__(self):
+        return "<IndexValue %d * %s %+d>" % (self.coef, self.var, self.offset)
+
+
+class Comparison(object):
+    """
+    The result of comparing two values, as used by exit guards.
+    """
+
+    __slots__ = ('op', 'signed', 'lhs', 'rhs', )
+
+    def __init__(self, op, signed, lhs, rhs):
+        self.op = op  # 'LT', 'LE', 'EQ' or 'NE'
+        self.signed = signed
+        self.lhs = lhs
+        self.rhs = rhs
+
+    def negate(self):
+        if self.op == 'LT':
+            # not (a < b) <=> b <= a
+            return Comparison('LE', self.signed, self.rhs, self.lhs)
+        if self.op == 'LE':
+            return Comparison('LT', self.signed, self.rhs, self.lhs)
+        return Comparison('NE' if self.op == 'EQ' else 'EQ', self.signed, self.lhs, self.rhs)
+
+    def __repr__(self):
+        return "<Comparison %s %s%s %s>" % (self.lhs, self.op, 'S' if self.signed else 'U', self.rhs)
+
+
+class JumpTableState(object):
+    """
+    The abstract state of the fast jump table engine. Values are ints, tuples of ints (the ordered entries read out of a
+    table), IndexValue instances, or Comparison instances.
+    """
+
+    def __init__(self, arch, target):
+        self.arch = arch
+        # the address of the block holding the indirect jump
+        self.target = target
+
+        # register offset -> (size, value)
+        self.registers = { }
+        # memory address (an int, or a tuple describing an unknown address) -> value
+        self.memory = { }
+        # var -> (lower bound, upper bound), as unsigned integers. Either bound may be None.
+        self.bounds = { }
+
+        # guards of all exits met so far, and the state at the exit to the target, if any
+        self.exit_guards = [ ]
+        self.exit_to_target = None
+
+        # address of the first jump table entry that is read
+        self.table_addr = None
+
+    def copy(self):
+        s = JumpTableState(self.arch, self.target)
+        s.registers = dict(self.registers)
+        s.memory = dict(self.memory)
+        s.bounds = dict(self.bounds)
+        s.exit_guards = list(self.exit_guards)
+        s.table_addr = self.table_addr
+        return s
+
+    def constrain(self, cond):
+        """
+        Bound the index a condition is checking, assuming the condition holds.
+
+        :param cond:    A Comparison instance. Anything else is ignored.
+        :return:        True if a bound was added, False otherwise.
+        :rtype:         bool
+        """
+
+        if not isinstance(cond, Comparison) or cond.signed or cond.op not in ('LT', 'LE'):
+            # signed comparisons do not give us a lower bound
+            return False
+
+        lhs, rhs = cond.lhs, cond.rhs
+        if isinstance(lhs, IndexValue) and type(rhs) is int:
+            # index < N or index <= N
+            v, lo, hi = lhs, 0, rhs - 1 if cond.op == 'LT' else rhs
+        elif type(lhs) is int and isinstance(rhs, IndexValue):
+            # N < index or N <= index
+            v, lo, hi = rhs, lhs + 1 if cond.op == 'LT' else lhs, None
+        else:
+            return False
+
+        if v.coef != 1 or hi is not None and hi < 0:
+            return False
+
+        # bounds are on the var itself
+        lo -= v.offset
+        if hi is not None:
+            hi -= v.offset
+        old_lo, old_hi = self.bounds.get(v.var, (None, None))
+        if old_lo is not None:
+            lo = max(lo, old_lo)
+        if old_hi is not None:
+            hi = old_hi if hi is None else min(hi, old_hi)
+        self.bounds[v.var] = (lo, hi)
+        return True
+
+    def index_range(self, v):
+        """
+        Get the range of an index value.
+
+        :param IndexValue v:    The value.
+        :return:                The range of `v.var`, or None if it is not bounded.
+        :rtype:                 range
+        """
+
+        lo, hi = self.bounds.get(v.var, (None, None))
+        if hi is None:
+            return None
+        return range(max(lo, 0) if lo is not None else 0, hi + 1)
+
+
+class SimEngineJumpTableVEX(SimEngineLightVEX):
+    """
+    A lightweight engine that resolves common jump table idioms. It interprets the VEX statements of a few blocks over a
+    small domain of concrete values, bounded index values and jump table entries, without any solver.
+    """
+
+    _binop_re = re.compile(r"^Iop_(Add|Sub|Mul|Shl|Shr|Sar|And|Or|Xor|CmpEQ|CmpNE|CmpLT|CmpLE)(\d+)([US]?)$")
+    _conversion_re = re.compile(r"^Iop_(\d+)([US]?)to(\d+)$")
+    _loadg_cvt_re = re.compile(r"^ILGop_(?:Ident(\d+)|(\d+)([US])to(\d+))$")
+
+    def __init__(self, project, max_entries):
+        super(SimEngineJumpTableVEX, self).__init__()
+        self.project = project
+        self.max_entries = max_entries
+
+    def process(self, state, *args, **kwargs):
+        """
+        Interpret a block.
+
+        :param JumpTableState state:    The state to update.
+        :return:                        The value of the next address of the block.
+        """
+
+        self._process(state, None, block=kwargs.pop('block', None))
+        return self._expr(self.block.vex.next)
+
+    #
+    # Helpers
+    #
+
+    def _mask(self, v, bits):
+        if type(v) is int:
+            return v & ((1 << bits) - 1)
+        if type(v) is tuple:
+            return tuple(e & ((1 << bits) - 1) for e in v)
+        return v
+
+    def _load(self, addr, size, endness):
+        """
+        Load from an address, which may be an int or an index value.
+
+        :param addr:        The address.
+        :param int size:    Number of bytes to load.
+        :param str endness: Endianness of the load.
+        :return:            An int, a tuple of table entries, or an index value.
+        """
+
+        if type(addr) is int:
+            if addr in self.state.memory:
+                return self.state.memory[addr]
+            try:
+                data = self.project.loader.memory.load(addr, size)
+            except KeyError:
+                data = None
+            if data is None or len(data) != size:
+                return IndexValue(('mem', addr))
+            return int.from_bytes(data, 'little' if endness == 'Iend_LE' else 'big')
+
+        if isinstance(addr, IndexValue):
+            key = ('mem', addr.var, addr.coef, addr.offset)
+            if key in self.state.memory:
+                return self.state.memory[key]
+
+            indices = self.state.index_range(addr)
+            if indices is None:
+                # an unknown value, e.g. a local variable that is loaded again after being bounds-checked
+                return IndexValue(key)
+            if len(indices) > self.max_entries:
+                raise UnsupportedCodeError("Too many jump table entries.")
+
+            self.state.table_addr = (addr.coef * indices[0] + addr.offset) & ((1 << self.arch.bits) - 1)
+            entries = [ ]
+            for i in indices:
+                a = (addr.coef * i + addr.offset) & ((1 << self.arch.bits) - 1)
+                try:
+                    data = self.project.loader.memory.load(a, size)
+                except KeyError:
+                    data = None
+                if data is None or len(data) != size:
+                    raise UnsupportedCodeError("Jump table entry %#x is not mapped." % a)
+                entries.append(int.from_bytes(data, 'little' if endness == 'Iend_LE' else 'big'))
+            return tuple(entries)
+
+        return None
+
+    @staticmethod
+    def _signed(v, bits):
+        v &= (1 << bits) - 1
+        return v - (1 << bits) if v >> (bits - 1) else v
+
+    def _convert(self, v, from_bits, signed, to_bits):
+        if isinstance(v, (IndexValue, Comparison)):
+            # indices are small and non-negative, and booleans are booleans
+            return v
+        if type(v) is int:
+            v = self._signed(v, from_bits) if signed else v & ((1 << from_bits) - 1)
+            return v & ((1 << to_bits) - 1)
+        if type(v) is tuple:
+            return tuple(self._convert(e, from_bits, signed, to_bits) for e in v)
+        return None
+
+    @staticmethod
+    def _arith(op, a, b):  # pylint:disable=too-many-return-statements
+        """
+        Apply an arithmetic operation to two values, if the domain supports it.
+        """
+
+        ta, tb = type(a), type(b)
+        if ta is int and tb is int:
+            if op == 'Add':
+                return a + b
+            if op == 'Sub':
+                return a - b
+            if op == 'Mul':
+                return a * b
+            if op == 'Shl':
+                return a << b
+            if op == 'Shr':
+                return a >> b
+            if op == 'And':
+                return a & b
+            if op == 'Or':
+                return a | b
+            if op == 'Xor':
+                return a ^ b
+            return None
+
+        if ta is IndexValue and tb is int:
+            if op == 'Add':
+                return IndexValue(a.var, a.coef, a.offset + b)
+            if op == 'Sub':
+                return IndexValue(a.var, a.coef, a.offset - b)
+            if op == 'Mul':
+                return IndexValue(a.var, a.coef * b, a.offset * b)
+            if op == 'Shl':
+                return IndexValue(a.var, a.coef << b, a.offset << b)
+            return None
+        if ta is int and tb is IndexValue:
+            if op == 'Add':
+                return IndexValue(b.var, b.coef, b.offset + a)
+            if op == 'Mul':
+                return IndexValue(b.var, b.coef * a, b.offset * a)
+            return None
+
+        if ta is tuple and tb is int:
+            return tuple(SimEngineJumpTableVEX._arith(op, e, b) for e in a)
+        if ta is int and tb is tuple and op in ('Add', 'Mul', 'And', 'Or', 'Xor'):
+            return tuple(SimEngineJumpTableVEX._arith(op, e, a) for e in b)
+
+        return None
+
+    #
+    # Statement handlers
+    #
+
+    def _handle_Stmt(self, stmt):
+        handler = "_handle_%s" % type(stmt).__name__
+        if hasattr(self, handler):
+            getattr(self, handler)(stmt)
+        elif type(stmt).__name__ not in ('IMark', 'AbiHint', 'NoOp', 'MBE'):
+            raise UnsupportedCodeError("Unsupported statement type %s." % type(stmt).__name__)
+
+    def _handle_WrTmp(self, stmt):
+        data = self._expr(stmt.data)
+        if data is None:
+            # an unknown value, which may still be checked and used as an index
+            data = IndexValue(('tmp', self.block.addr, stmt.tmp))
+        self.tmps[stmt.tmp] = data
+
+    def _handle_Put(self, stmt):
+        size = stmt.data.result_size(self.tyenv) // self.arch.byte_width
+        data = self._expr(stmt.data)
+        if data is None:
+            data = IndexValue(('reg', self.block.addr, self.stmt_idx))
+
+        # forget all overlapping registers
+        for offset, (s, _) in list(self.state.registers.items()):
+            if offset < stmt.offset + size and stmt.offset < offset + s:
+                del self.state.registers[offset]
+        self.state.registers[stmt.offset] = (size, data)
+
+    def _handle_Store(self, stmt):
+        addr = self._expr(stmt.addr)
+        data = self._expr(stmt.data)
+        if type(addr) is int:
+            key = addr
+        elif isinstance(addr, IndexValue):
+            key = ('mem', addr.var, addr.coef, addr.offset)
+        else:
+            # we do not know what this store may overwrite
+            raise UnsupportedCodeError("Store to an unknown address.")
+        self.state.memory[key] = data
+
+    def _handle_StoreG(self, stmt):
+        raise UnsupportedCodeError("Guarded stores are not supported.")
+
+    def _handle_LoadG(self, stmt):
+        m = self._loadg_cvt_re.match(stmt.cvt)
+        if m is None:
+            raise UnsupportedCodeError("Unsupported LoadG conversion %s." % stmt.cvt)
+
+        guard = self._expr(stmt.guard)
+        if isinstance(guard, Comparison):
+            # e.g. ldrls pc, [pc, r3, lsl #2] only loads a target when the index is in bounds
+            self.state.constrain(guard)
+
+        addr = self._expr(stmt.addr)
+        if m.group(1) is not None:
+            bits = int(m.group(1))
+            data = self._load(addr, bits // self.arch.byte_width, stmt.end)
+        else:
+            from_bits, signed, to_bits = int(m.group(2)), m.group(3) == 'S', int(m.group(4))
+            data = self._convert(self._load(addr, from_bits // self.arch.byte_width, stmt.end), from_bits, signed,
+                                 to_bits)
+        if data is None:
+            data = IndexValue(('tmp', self.block.addr, stmt.dst))
+        self.tmps[stmt.dst] = data
+
+    def _handle_Exit(self, stmt):
+        guard = self._expr(stmt.guard)
+        if stmt.dst.value == self.state.target:
+            s = self.state.copy()
+            s.constrain(guard)
+            self.state.exit_to_target = s
+        self.state.exit_guards.append(guard)
+
+    #
+    # Expression handlers
+    #
+
+    def _handle_Get(self, expr):
+        size = expr.result_size(self.tyenv) // self.arch.byte_width
+        if expr.offset in self.state.registers:
+            s, v = self.state.registers[expr.offset]
+            if size <= s:
+                return self._mask(v, size * self.arch.byte_width) if size < s else v
+            return None
+        for offset, (s, _) in self.state.registers.items():
+            if offset < expr.offset + size and expr.offset < offset + s:
+                # partially overwritten
+                return None
+        return IndexValue(('reg', expr.offset))
+
+    def _handle_Load(self, expr):
+        addr = self._expr(expr.addr)
+        size = expr.result_size(self.tyenv) // self.arch.byte_width
+        return self._load(addr, size, expr.end)
+
+    def _handle_ITE(self, expr):
+        cond = self._expr(expr.cond)
+        iftrue = self._expr(expr.iftrue)
+        iffalse = self._expr(expr.iffalse)
+        if type(cond) is int:
+            return iftrue if cond else iffalse
+        # t44 = ITE(t43, t16, 0x0000c844): the table entries, or the default target that the CFG already knows about
+        if type(iftrue) is tuple and type(iffalse) is not tuple:
+            return iftrue
+        if type(iffalse) is tuple and type(iftrue) is not tuple:
+            return iffalse
+        return None
+
+    def _handle_CCall(self, expr):
+        return None
+
+    def _handle_Unop(self, expr):
+        if expr.op == 'Iop_Not1':
+            v = self._expr(expr.args[0])
+            if isinstance(v, Comparison):
+                return v.negate()
+            if type(v) is int:
+                return v ^ 1
+            return None
+
+        m = self._conversion_re.match(expr.op)
+        if m is None:
+            return None
+        from_bits, signed, to_bits = int(m.group(1)), m.group(2) == 'S', int(m.group(3))
+        return self._convert(self._expr(expr.args[0]), from_bits, signed, to_bits)
+
+    def _handle_Binop(self, expr):
+        m = self._binop_re.match(expr.op)
+        if m is None:
+            return None
+        op, bits, signedness = m.group(1), int(m.group(2)), m.group(3)
+
+        a = self._expr(expr.args[0])
+        b = self._expr(expr.args[1])
+        if a is None or b is None:
+            return None
+
+        if op.startswith('Cmp'):
+            signed = signedness == 'S'
+            if type(a) is int and type(b) is int:
+                if signed:
+                    a, b = self._signed(a, bits), self._signed(b, bits)
+                return int({'EQ': a == b, 'NE': a != b, 'LT': a < b, 'LE': a <= b}[op[3:]])
+            return Comparison(op[3:], signed, a, b)
+
+        if op == 'Sar':
+            if type(a) is int and type(b) is int:
+                return self._mask(self._signed(a, bits) >> b, bits)
+            return None
+
+        if isinstance(a, Comparison) or isinstance(b, Comparison):
+            return None
+        r = self._arith(op, a, b)
+        if type(r) is tuple and None in r:
+            return None
+        return self._mask(r, expr.result_size(self.tyenv))
+
+
+def resolve_jump_table(project, cfg, addr, block, max_entries):
+    """
+    Try to resolve a jump table by interpreting the block of the indirect jump, together with the block holding its
+    bounds check if the check happens before.
+
+    When the bounds check is not in the block itself, it is looked for in every predecessor of the block. All of them
+    must lead to the same table with the same bound, since the block may be reached through any of them.
+
+    :param project:         The project.
+    :param cfg:             The CFG analysis.
+    :param int addr:        Address of the block ending with the indirect jump.
+    :param block:           The block ending with the indirect jump.
+    :param int max_entries: The maximum number of jump table entries.
+    :return:                A tuple of the jump table address and the list of its entries, or None if the fast path
+                            fails.
+    :rtype:                 tuple
+    """
+
+    engine = SimEngineJumpTableVEX(project, max_entries)
+
+    # the bounds check may be in the block itself (e.g. ldrls pc, [...] on ARM)
+    resolved = _resolve_jump_table_from(engine, project, cfg, addr, block, None)
+    if resolved is not None:
+        return resolved
+
+    node = cfg.get_any_node(addr)
+    predecessors = list(cfg.graph.predecessors(node)) if node is not None else [ ]
+    if not predecessors:
+        return None
+
+    for pred in predecessors:
+        r = _resolve_jump_table_from(engine, project, cfg, addr, block, pred)
+        if r is None:
+            return None
+        if resolved is not None and r != resolved:
+            l.debug("Fast path failed on jump table at %#x: predecessors disagree on the table.", addr)
+            return None
+        resolved = r
+
+    return resolved
+
+
+def _resolve_jump_table_from(engine, project, cfg, addr, block, pred):
+    """
+    Resolve a jump table by interpreting the block of the indirect jump, after one of its predecessors.
+
+    :param pred:    The predecessor CFGNode, or None to interpret the block alone.
+    :return:        A tuple of the jump table address and the list of its entries, or None if it fails.
+    :rtype:         tuple
+    """
+
+    state = JumpTableState(project.arch, addr)
+    try:
+        if pred is not None:
+            if pred.size is None or pred.size == 0:
+                return None
+            pred_block = cfg._lift(pred.addr, size=pred.size, opt_level=1)
+            next_addr = engine.process(state, block=pred_block)
+            if state.exit_to_target is not None:
+                state = state.exit_to_target
+            elif next_addr == addr:
+                # falling through: none of the exits was taken
+                for guard in state.exit_guards:
+                    if isinstance(guard, Comparison):
+                        state.constrain(guard.negate())
+            else:
+                # e.g. a call returning to this block
+                return None
+            state.exit_guards = [ ]
+            state.exit_to_target = None
+            state.table_addr = None
+
+        targets = engine.process(state, block=block)
+    except UnsupportedCodeError as ex:
+        l.debug("Fast path failed on jump table at %#x: %s", addr, ex)
+        return None
+    except (KeyError, TypeError, ValueError):
+        l.debug("Fast path failed on jump table at %#x.", addr, exc_info=True)
+        return None
+
+    if type(targets) is not tuple or not targets:
+        return None
+
+    return state.table_addr, list(targets)
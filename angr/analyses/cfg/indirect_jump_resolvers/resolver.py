@@ -41,6 +41,54 @@ class IndirectJumpResolver(object):
 
         raise NotImplementedError()
 
+    #
+    # Batch resolution
+    #
+
+    def enter_function(self, cfg, func_addr):
+        """
+        Called before all indirect jumps of a function are resolved together. Resolvers may set up per-function caches
+        here.
+
+        :param cfg:             The CFG analysis object.
+        :param int func_addr:   Address of the function.
+        :return:                None
+        """
+
+        pass
+
+    def leave_function(self):
+        """
+        Called after all indirect jumps of a function are resolved. Resolvers should drop their per-function caches here.
+
+        :return:    None
+        """
+
+        pass
+
+    def export_resolution(self, addr):  # pylint:disable=unused-argument,no-self-use
+        """
+        Get the bookkeeping of this resolver on an indirect jump that a worker process tried to resolve, so that it can
+        be sent back to the resolver in the main process. This is called on every resolver, whether the jump is resolved
+        or not, and whether this resolver was tried on the jump or not.
+
+        :param int addr:    Basic block address of the indirect jump.
+        :return:            Any picklable object.
+        """
+
+        return None
+
+    def import_resolution(self, addr, data):
+        """
+        Take the bookkeeping returned by export_resolution() in a worker process.
+
+        :param int addr:    Basic block address of the indirect jump.
+        :param data:        The object returned by export_resolution().
+        :return:            None
+        """
+
+        pass
+
     def _is_target_valid(self, cfg, target):  # pylint:disable=no-self-use
         """
         Check if the resolved target is valid.
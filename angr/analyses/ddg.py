@@ -1,5 +1,5 @@
 import logging
-from collections import defaultdict
+from collections import defaultdict, deque
 
 import networkx
 import pyvex
@@ -95,18 +95,28 @@ class DDGJob(object):
 class LiveDefinitions(object):
     """
     A collection of live definitions with some handy interfaces for definition killing and lookups.
+
+    Collections are copy-on-write: branches share their maps with the collection they were branched from until either
+    of them is modified, and the sets of code locations stored in the maps are immutable, so they can be shared freely.
     """
+
+    __slots__ = ('_memory_map', '_register_map', '_defs', '_owned', )
+
+    # indices into _owned
+    _MEMORY, _REGISTER, _DEFS = 0, 1, 2
+
     def __init__(self):
         """
         Constructor.
         """
 
-        # byte-to-byte mappings
-        # TODO: make it copy-on-write in order to save memory.
-        # TODO: options are either cooldict.COWDict or a modified version of simuvex.SimPagedMemory
-        self._memory_map = defaultdict(set)
-        self._register_map = defaultdict(set)
-        self._defs = defaultdict(set)
+        # byte-to-byte mappings. all values are frozensets of code locations
+        self._memory_map = { }
+        self._register_map = { }
+        self._defs = { }
+
+        # whether each of the maps above is private to this collection
+        self._owned = [ True, True, True ]
 
     #
     # Overridden methods
@@ -121,33 +131,31 @@ class LiveDefinitions(object):
 
     def branch(self):
         """
-        Create a branch of the current live definition collection.
+        Create a branch of the current live definition collection. This is cheap: maps are only copied when they are
+        modified, by either collection.
 
         :return: A new LiveDefinition instance.
         :rtype: angr.analyses.ddg.LiveDefinitions
         """
 
         ld = LiveDefinitions()
-        ld._memory_map = self._memory_map.copy()
-        ld._register_map = self._register_map.copy()
-        ld._defs = self._defs.copy()
+        ld._memory_map = self._memory_map
+        ld._register_map = self._register_map
+        ld._defs = self._defs
+        ld._owned = [ False, False, False ]
+        self._owned = [ False, False, False ]
 
         return ld
 
     def copy(self):
         """
-        Make a hard copy of `self`.
+        Make a copy of `self`. Since the collections are copy-on-write, this is the same as branch().
 
         :return: A new LiveDefinition instance.
         :rtype: angr.analyses.ddg.LiveDefinitions
         """
 
-        ld = LiveDefinitions()
-        ld._memory_map = self._memory_map.copy()
-        ld._register_map = self._register_map.copy()
-        ld._defs = self._defs.copy()
-
-        return ld
+        return self.branch()
 
     def add_def(self, variable, location, size_threshold=32):
         """
@@ -168,25 +176,13 @@ class LiveDefinitions(object):
                 return new_defs_added
 
             size = min(variable.size, size_threshold)
-            offset = variable.reg
-            while offset < variable.reg + size:
-                if location not in self._register_map[offset]:
-                    new_defs_added = True
-                self._register_map[offset].add(location)
-                offset += 1
-
-            self._defs[variable].add(location)
+            new_defs_added = self._add_locations(self._REGISTER, variable.reg, size, location)
+            self._add_var_def(variable, location)
 
         elif isinstance(variable, SimMemoryVariable):
             size = min(variable.size, size_threshold)
-            offset = variable.addr
-            while offset < variable.addr + size:
-                if location not in self._memory_map[offset]:
-                    new_defs_added = True
-                self._memory_map[offset].add(location)
-                offset += 1
-
-            self._defs[variable].add(location)
+            new_defs_added = self._add_locations(self._MEMORY, variable.addr, size, location)
+            self._add_var_def(variable, location)
 
         else:
             l.error('Unsupported variable type "%s".', type(variable))
@@ -227,21 +223,21 @@ class LiveDefinitions(object):
                 return None
 
             size = min(variable.size, size_threshold)
-            offset = variable.reg
-            while offset < variable.reg + size:
-                self._register_map[offset] = { location }
-                offset += 1
+            locs = frozenset((location, ))
+            register_map = self._writable(self._REGISTER)
+            for offset in range(variable.reg, variable.reg + size):
+                register_map[offset] = locs
 
-            self._defs[variable] = { location }
+            self._writable(self._DEFS)[variable] = locs
 
         elif isinstance(variable, SimMemoryVariable):
             size = min(variable.size, size_threshold)
-            offset = variable.addr
-            while offset < variable.addr + size:
-                self._memory_map[offset] = { location }
-                offset += 1
+            locs = frozenset((location, ))
+            memory_map = self._writable(self._MEMORY)
+            for offset in range(variable.addr, variable.addr + size):
+                memory_map[offset] = locs
 
-            self._defs[variable] = { location }
+            self._writable(self._DEFS)[variable] = locs
 
         else:
             l.error('Unsupported variable type "%s".', type(variable))
@@ -306,6 +302,59 @@ class LiveDefinitions(object):
 
         return self._defs.keys()
 
+    #
+    # Private methods
+    #
+
+    def _writable(self, which):
+        """
+        Get one of the maps for modification, copying it first if it is shared with other collections.
+
+        :param int which: _MEMORY, _REGISTER, or _DEFS.
+        :return: The map.
+        :rtype: dict
+        """
+
+        if which == self._MEMORY:
+            if not self._owned[which]:
+                self._memory_map = dict(self._memory_map)
+                self._owned[which] = True
+            return self._memory_map
+        elif which == self._REGISTER:
+            if not self._owned[which]:
+                self._register_map = dict(self._register_map)
+                self._owned[which] = True
+            return self._register_map
+        else:
+            if not self._owned[which]:
+                self._defs = dict(self._defs)
+                self._owned[which] = True
+            return self._defs
+
+    def _add_locations(self, which, start, size, location):
+        """
+        Add a code location to a range of offsets in the memory map or the register map.
+
+        :return: True if the location was new for any of the offsets, False otherwise.
+        :rtype: bool
+        """
+
+        m = self._memory_map if which == self._MEMORY else self._register_map
+        new_defs_added = False
+        for offset in range(start, start + size):
+            locs = m.get(offset, None)
+            if locs is None or location not in locs:
+                if not new_defs_added:
+                    m = self._writable(which)
+                    new_defs_added = True
+                m[offset] = locs | { location } if locs is not None else frozenset((location, ))
+        return new_defs_added
+
+    def _add_var_def(self, variable, location):
+        locs = self._defs.get(variable, None)
+        if locs is None or location not in locs:
+            self._writable(self._DEFS)[variable] = locs | { location } if locs is not None else frozenset((location, ))
+
 
 class DDGViewItem(object):
     def __init__(self, ddg, variable, simplified=False):
@@ -672,7 +721,7 @@ class DDG(Analysis):
             Well, they cannot be tracked under fastpath mode (which is the mode we are generating the CTF) anyways.
         """
 
-        worklist = []
+        worklist = deque()
         worklist_set = set()
 
         # Initialize the worklist
@@ -694,10 +743,9 @@ class DDG(Analysis):
 
         while worklist:
             # Pop out a node
-            ddg_job = worklist[0]
+            ddg_job = worklist.popleft()
             l.debug("Processing %s.", ddg_job)
             node, call_depth = ddg_job.cfg_node, ddg_job.call_depth
-            worklist = worklist[ 1 : ]
             worklist_set.remove(node)
 
             # Grab all final states. There are usually more than one (one state for each successor), and we gotta
@@ -803,7 +851,7 @@ class DDG(Analysis):
         """
 
         # Make a copy of live_defs
-        self._live_defs = live_defs.copy()
+        self._live_defs = live_defs.branch()
 
         action_list = list(state.history.recent_actions)
 
@@ -1398,7 +1446,7 @@ class DDG(Analysis):
         Append a CFGNode and its successors into the work-list, and respect the call-depth limit
 
         :param node_wrapper:    The NodeWrapper instance to insert.
-        :param worklist:        The work-list, which is a list.
+        :param worklist:        The work-list, which is a deque.
         :param worklist_set:    A set of all CFGNodes that are inside the work-list, just for the sake of fast look-up.
                                 It will be updated as well.
         :returns:               A set of newly-inserted CFGNodes (not NodeWrapper instances).
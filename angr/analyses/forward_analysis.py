@@ -1,3 +1,6 @@
+import heapq
+from collections import defaultdict
+
 import networkx
 
 from claripy.utils.orderedset import OrderedSet
@@ -352,6 +355,216 @@ class JobInfo(object):
         self.jobs.append((job, job_type))
 
 
+class JobInfoQueue(object):
+    """
+    The queue of pending JobInfo instances of a ForwardAnalysis.
+
+    This is an indexed priority queue: a binary heap, plus a map from job keys to heap entries so that a queued JobInfo
+    can be found and removed without scanning the queue. Removed entries are only marked as dead, and are dropped from
+    the heap when they reach its top, or when dead entries make up the larger part of the heap.
+
+    When sorting is enabled, JobInfo instances are ordered by their sorting keys, and among equal sorting keys the most
+    recently inserted one comes first. Otherwise the queue is first-in first-out.
+    """
+
+    __slots__ = ('_heap', '_entries', '_sorting_key', '_counter', '_live', )
+
+    def __init__(self, sorting_key=None):
+        """
+        :param sorting_key: A function that takes a JobInfo instance and returns its sorting key, or None if the queue
+                            should be first-in first-out.
+        """
+        self._heap = [ ]
+        # job key -> live heap entries of JobInfo instances with that key
+        self._entries = { }
+        self._sorting_key = sorting_key
+        self._counter = 0
+        self._live = 0
+
+    def __len__(self):
+        return self._live
+
+    def __bool__(self):
+        return self._live > 0
+
+    __nonzero__ = __bool__
+
+    def __contains__(self, job_info):
+        return job_info.key in self._entries
+
+    def __iter__(self):
+        """
+        Iterate through all JobInfo instances in the order they will be popped. This sorts the queue.
+        """
+        for entry in sorted(self._heap):
+            if entry[2] is not None:
+                yield entry[2]
+
+    def __getitem__(self, pos):
+        if pos < 0 or pos >= self._live:
+            raise IndexError()
+        if pos == 0:
+            self._drop_dead()
+            return self._heap[0][2]
+        return heapq.nsmallest(pos + 1, (entry for entry in self._heap if entry[2] is not None))[pos][2]
+
+    def append(self, job_info):
+        """
+        Insert a JobInfo instance.
+
+        :param JobInfo job_info:    The JobInfo instance to insert.
+        :return:                    None
+        """
+        self._counter += 1
+        if self._sorting_key is None:
+            entry = [ 0, self._counter, job_info ]
+        else:
+            entry = [ self._sorting_key(job_info), -self._counter, job_info ]
+        heapq.heappush(self._heap, entry)
+        self._live += 1
+
+        if job_info.key in self._entries:
+            self._entries[job_info.key].append(entry)
+        else:
+            self._entries[job_info.key] = [ entry ]
+
+    def pop(self):
+        """
+        Remove and return the first JobInfo instance.
+
+        :return:    The JobInfo instance.
+        :rtype:     JobInfo
+        """
+        if not self._live:
+            raise IndexError("pop from an empty job queue")
+        self._drop_dead()
+        entry = heapq.heappop(self._heap)
+        self._discard(entry)
+        return entry[2]
+
+    def remove(self, job_info):
+        """
+        Remove the first queued JobInfo instance that has the same key as the given one.
+
+        :param JobInfo job_info:    The JobInfo instance to remove.
+        :return:                    None
+        """
+        entries = self._entries.get(job_info.key, None)
+        if not entries:
+            raise ValueError("%s is not in the job queue" % job_info)
+        entry = min(entries) if len(entries) > 1 else entries[0]
+        self._discard(entry)
+        entry[2] = None
+        self._compact()
+
+    def remove_if(self, predicate):
+        """
+        Remove all JobInfo instances that satisfy a predicate.
+
+        :param predicate:   A function that takes a JobInfo instance and returns True if it should be removed.
+        :return:            The number of removed JobInfo instances.
+        :rtype:             int
+        """
+        removed = 0
+        for entry in self._heap:
+            if entry[2] is not None and predicate(entry[2]):
+                self._discard(entry)
+                entry[2] = None
+                removed += 1
+        if removed:
+            self._compact()
+        return removed
+
+    def _discard(self, entry):
+        key = entry[2].key
+        entries = self._entries[key]
+        if len(entries) == 1:
+            del self._entries[key]
+        else:
+            entries.remove(entry)
+        self._live -= 1
+
+    def _drop_dead(self):
+        heap = self._heap
+        while heap[0][2] is None:
+            heapq.heappop(heap)
+
+    def _compact(self):
+        if len(self._heap) > 2 * self._live + 64:
+            self._heap = [ entry for entry in self._heap if entry[2] is not None ]
+            heapq.heapify(self._heap)
+
+
+class JobInfoList(object):
+    """
+    The queue of pending JobInfo instances of a ForwardAnalysis whose job sorting keys change during the analysis.
+
+    JobInfo instances are kept in a list. A new JobInfo instance is inserted before the first queued one whose sorting
+    key, as computed at that moment, is not smaller than its own. Queued JobInfo instances are not reordered when their
+    sorting keys change, so a JobInfoQueue, which computes the sorting key of a JobInfo instance only once, would not
+    pop them in the same order.
+    """
+
+    __slots__ = ('_list', '_keys', '_sorting_key', )
+
+    def __init__(self, sorting_key):
+        """
+        :param sorting_key: A function that takes a JobInfo instance and returns its current sorting key.
+        """
+        self._list = [ ]
+        # job key -> number of queued JobInfo instances with that key
+        self._keys = defaultdict(int)
+        self._sorting_key = sorting_key
+
+    def __len__(self):
+        return len(self._list)
+
+    def __bool__(self):
+        return bool(self._list)
+
+    __nonzero__ = __bool__
+
+    def __contains__(self, job_info):
+        return job_info.key in self._keys
+
+    def __iter__(self):
+        return iter(self._list)
+
+    def __getitem__(self, pos):
+        return self._list[pos]
+
+    def append(self, job_info):
+        ForwardAnalysis._binary_insert(self._list, job_info, self._sorting_key)
+        self._keys[job_info.key] += 1
+
+    def pop(self):
+        if not self._list:
+            raise IndexError("pop from an empty job queue")
+        job_info = self._list.pop(0)
+        self._discard(job_info.key)
+        return job_info
+
+    def remove(self, job_info):
+        self._list.remove(job_info)
+        self._discard(job_info.key)
+
+    def remove_if(self, predicate):
+        kept = [ ]
+        for job_info in self._list:
+            if predicate(job_info):
+                self._discard(job_info.key)
+            else:
+                kept.append(job_info)
+        removed = len(self._list) - len(kept)
+        self._list = kept
+        return removed
+
+    def _discard(self, key):
+        self._keys[key] -= 1
+        if not self._keys[key]:
+            del self._keys[key]
+
+
 class ForwardAnalysis(object):
     """
     This is my very first attempt to build a static forward analysis framework that can serve as the base of multiple
@@ -373,7 +586,7 @@ class ForwardAnalysis(object):
     """
 
     def __init__(self, order_jobs=False, allow_merging=False, allow_widening=False, status_callback=None,
-                 graph_visitor=None
+                 graph_visitor=None, dynamic_job_keys=False
                  ):
         """
         Constructor
@@ -383,6 +596,8 @@ class ForwardAnalysis(object):
         :param bool allow_widening: If job widening is allowed.
         :param graph_visitor:       A graph visitor to provide successors.
         :type graph_visitor:        GraphVisitor or None
+        :param bool dynamic_job_keys: If the sorting key of a job may change while the job is queued. Such jobs are
+                                    kept in a list and sorted by their keys at insertion time.
         :return: None
         """
 
@@ -400,7 +615,12 @@ class ForwardAnalysis(object):
         self._should_abort = False
 
         # All remaining jobs
-        self._job_info_queue = [ ]
+        if order_jobs and dynamic_job_keys:
+            self._job_info_queue = JobInfoList(lambda job_info: self._job_sorting_key(job_info.job))
+        else:
+            self._job_info_queue = JobInfoQueue(
+                sorting_key=(lambda job_info: self._job_sorting_key(job_info.job)) if order_jobs else None
+            )
 
         # A map between job key to job. Jobs with the same key will be merged by calling _merge_jobs()
         self._job_map = { }
@@ -665,14 +885,14 @@ class ForwardAnalysis(object):
                 continue
             except AngrSkipJobNotice:
                 # consume and skip this job
-                self._job_info_queue = self._job_info_queue[1:]
+                self._job_info_queue.pop()
                 self._job_map.pop(self._job_key(job_info.job), None)
                 continue
 
             # remove the job info from the map
             self._job_map.pop(self._job_key(job_info.job), None)
 
-            self._job_info_queue = self._job_info_queue[1:]
+            self._job_info_queue.pop()
 
             self._process_job_and_get_successors(job_info)
 
@@ -760,11 +980,7 @@ class ForwardAnalysis(object):
             job_info = JobInfo(key, job)
             self._job_map[key] = job_info
 
-        if self._order_jobs:
-            self._binary_insert(self._job_info_queue, job_info, lambda elem: self._job_sorting_key(elem.job))
-
-        else:
-            self._job_info_queue.append(job_info)
+        self._job_info_queue.append(job_info)
 
     def _peek_job(self, pos):
         """
@@ -775,10 +991,7 @@ class ForwardAnalysis(object):
         :return:        The job
         """
 
-        if pos < len(self._job_info_queue):
-            return self._job_info_queue[pos].job
-
-        raise IndexError()
+        return self._job_info_queue[pos].job
 
     #
     # Utils
@@ -1,7 +1,9 @@
 
 from collections import defaultdict
 from itertools import chain
+import multiprocessing
 import logging
+import random
 
 from networkx import NetworkXError
 
@@ -10,6 +12,7 @@ from cle.backends.cgc import CGC
 from .errors import IdentifierException
 from .functions import Functions
 from .runner import Runner
+from .verdict_cache import VerdictCache
 from .. import Analysis
 from ... import options
 from ...errors import AngrError, SimSegfaultError, SimEngineError, SimMemoryError, SimError
@@ -19,6 +22,24 @@ l = logging.getLogger("identifier.identify")
 
 NUM_TESTS = 5
 
+# the Identifier that worker processes test functions with. it is inherited through fork()
+_identifier_worker = None
+
+
+def _identify_func_in_worker(func_addr):
+    """
+    Test a function against all candidates in a worker process.
+
+    :param int func_addr:   Address of the function.
+    :return:                A tuple of the function address, the match (a Func instance or None), and a list of the
+                            (cache key, verdict) pairs of all tests that were run.
+    :rtype:                 tuple
+    """
+    idfer = _identifier_worker
+    new_verdicts = [ ]
+    match = idfer._identify_func(idfer._cfg.functions[func_addr], new_verdicts)  # pylint:disable=protected-access
+    return func_addr, match, new_verdicts
+
 
 class FuncInfo(object):
     def __init__(self):
@@ -40,7 +61,17 @@ class Identifier(Analysis):
 
     _special_case_funcs = ["free"]
 
-    def __init__(self, cfg=None, require_predecessors=True, only_find=None):
+    def __init__(self, cfg=None, require_predecessors=True, only_find=None, workers=None, verdict_cache=None):
+        """
+        :param cfg:                     The CFG to use. A CFGFast is generated if it is not specified.
+        :param bool require_predecessors:   Skip functions that are never called.
+        :param only_find:               Only look for the candidate functions with these names.
+        :param int workers:             Number of forked worker processes to test functions in. By default, all tests
+                                        run in the current process.
+        :param verdict_cache:           A VerdictCache, or the path of its database, to remember the results of tests
+                                        across runs.
+        """
+
         # self.project = project
         if not isinstance(self.project.loader.main_object, CGC):
             l.critical("The identifier currently works only on CGC binaries. Results may be completely unexpected.")
@@ -54,6 +85,13 @@ class Identifier(Analysis):
         # only find if in this set
         self.only_find = only_find
 
+        self._workers = workers
+        if isinstance(verdict_cache, str):
+            verdict_cache = VerdictCache(verdict_cache)
+        self._verdict_cache = verdict_cache
+        self._function_hashes = { }
+        self._data_hash = None
+
         # reg list
         a = self.project.arch
         self._sp_reg = a.register_names[a.sp_offset]
@@ -117,10 +155,19 @@ class Identifier(Analysis):
             l.warning("Too large")
             return
 
+        if self._workers is not None and self._workers > 1 and 'fork' in multiprocessing.get_all_start_methods():
+            identified = self._identify_funcs_in_workers([ f for f in self._cfg.functions.values()
+                                                           if self._candidates(f) ])
+        else:
+            identified = None
+
         for f in self._cfg.functions.values():
             if f.is_syscall:
                 continue
-            match = self.identify_func(f)
+            if identified is not None and f.addr in identified:
+                match = identified[f.addr]
+            else:
+                match = self.identify_func(f)
             if match is not None:
                 match_func = match
                 match_name = match_func.get_name()
@@ -215,13 +262,29 @@ class Identifier(Analysis):
 
     def identify_func(self, function):
         l.debug("function at %#x", function.addr)
+        new_verdicts = [ ]
+        match = self._identify_func(function, new_verdicts)
+        if self._verdict_cache is not None:
+            for key, verdict in new_verdicts:
+                self._verdict_cache.put(key, verdict)
+        return match
+
+    def _candidates(self, function):
+        """
+        Find the candidate functions that a function may be, using only cheap structural checks.
+
+        :param function:    The function of the binary.
+        :return:            A list of Func instances to test the function against, in order.
+        :rtype:             list
+        """
+
         if function.is_syscall:
-            return None
+            return [ ]
 
         func_info = self.get_func_info(function)
         if func_info is None:
             l.debug("func_info is none")
-            return None
+            return [ ]
 
         l.debug("num args %d", len(func_info.stack_args))
 
@@ -230,6 +293,7 @@ class Identifier(Analysis):
         except NetworkXError:
             calls_other_funcs = False
 
+        candidates = [ ]
         for name, f in Functions.items():
             # check if we should be finding it
             if self.only_find is not None and name not in self.only_find:
@@ -239,18 +303,72 @@ class Identifier(Analysis):
 
             # generate an object of the class
             f = f()
-            # test it
             if f.num_args() != len(func_info.stack_args) or f.var_args() != func_info.var_args:
                 continue
             if calls_other_funcs and not f.can_call_other_funcs():
                 continue
+            candidates.append(f)
+
+        return candidates
+
+    def _function_hash(self, function):
+        func_hash = self._function_hashes.get(function.addr, None)
+        if func_hash is None:
+            if self._data_hash is None:
+                self._data_hash = VerdictCache.data_hash(self.project)
+            func_hash = VerdictCache.function_hash(self.project, self._cfg.functions, function.addr,
+                                                   data_hash=self._data_hash)
+            self._function_hashes[function.addr] = func_hash
+        return func_hash
+
+    def _identify_func(self, function, new_verdicts):
+        """
+        Test a function against its candidates, and stop at the first match.
+
+        :param function:            The function of the binary.
+        :param list new_verdicts:   A list to append the (cache key, verdict) pairs of the tests that were run to.
+        :return:                    The matching Func instance, or None.
+        """
+
+        if function.is_syscall:
+            return None
 
+        for f in self._candidates(function):
+            name = type(f).__name__
+
+            key = None
+            if self._verdict_cache is not None:
+                key = VerdictCache.key(self._function_hash(function), name)
+                cached, verdict = self._verdict_cache.get(key)
+                if cached:
+                    l.debug("cached verdict for %s", name)
+                    if verdict is None:
+                        continue
+                    return verdict
+
+            # test it
             l.debug("testing: %s", name)
-            if not self.check_tests(function, f):
+            if key is None:
+                matched, _ = self._check_tests(function, f)
+            else:
+                # random test inputs are derived from the key, so that a verdict is the same in every run
+                random_state = random.getstate()
+                random.seed(key)
+                try:
+                    matched, clean = self._check_tests(function, f)
+                finally:
+                    random.setstate(random_state)
+                if clean:
+                    new_verdicts.append((key, f if matched else None))
+            if not matched:
                 continue
             # match!
             return f
 
+        func_info = self.get_func_info(function)
+        if func_info is None:
+            return None
+
         if len(func_info.stack_args) == 2 and func_info.var_args and len(function.graph.nodes()) < 5:
             match = Functions["fdprintf"]()
             l.warning("%#x assuming fd printf for var_args func with 2 args although we don't really know", function.addr)
@@ -258,23 +376,74 @@ class Identifier(Analysis):
 
         return None
 
+    def _identify_funcs_in_workers(self, functions):
+        """
+        Test functions in a pool of forked worker processes. Worker processes inherit the identifier, so only the
+        addresses of the functions and the verdicts are sent between processes.
+
+        :param list functions:  The functions of the binary to test.
+        :return:                A dict of function addresses to the matching Func instances, or None.
+        :rtype:                 dict
+        """
+
+        global _identifier_worker  # pylint:disable=global-statement
+
+        matches = { }
+        if not functions:
+            return matches
+
+        # prepare the state that all tests start from before forking, so that workers do not each prepare their own
+        self._runner.prepare_base_state()
+        if self._verdict_cache is not None:
+            for f in functions:
+                self._function_hash(f)
+
+        _identifier_worker = self
+        pool = multiprocessing.get_context('fork').Pool(processes=min(self._workers, len(functions)))
+        try:
+            for func_addr, match, new_verdicts in pool.imap_unordered(_identify_func_in_worker,
+                                                                       [ f.addr for f in functions ]):
+                matches[func_addr] = match
+                if self._verdict_cache is not None:
+                    for key, verdict in new_verdicts:
+                        self._verdict_cache.put(key, verdict)
+            pool.close()
+        finally:
+            pool.terminate()
+            pool.join()
+            _identifier_worker = None
+
+        return matches
+
     def check_tests(self, cfg_func, match_func):
+        return self._check_tests(cfg_func, match_func)[0]
+
+    def _check_tests(self, cfg_func, match_func):
+        """
+        Test a function against a candidate function.
+
+        :return:    A tuple of whether the function matches, and whether the verdict is clean. A verdict is not clean if
+                    a test raised an error, which includes solver timeouts, or did not complete. Only clean verdicts
+                    may be cached.
+        :rtype:     tuple
+        """
+        errors = self._runner.errors
         try:
             if not match_func.pre_test(cfg_func, self._runner):
-                return False
+                return False, self._runner.errors == errors
             for _ in range(NUM_TESTS):
                 test_data = match_func.gen_input_output_pair()
                 if test_data is not None and not self._runner.test(cfg_func, test_data):
-                    return False
-            return True
+                    return False, self._runner.errors == errors
+            return True, self._runner.errors == errors
         except SimSegfaultError:
-            return False
+            return False, self._runner.errors == errors
         except SimError as e:
             l.warning("SimError %s", e)
-            return False
+            return False, False
         except AngrError as e:
             l.warning("AngrError %s", e)
-            return False
+            return False, False
 
     def map_callsites(self):
         callsites = dict()
@@ -35,6 +35,20 @@ class Runner(object):
         self.project = project
         self.cfg = cfg
         self.base_state = None
+        # the number of test runs that did not complete. results that depend on them are not reproducible
+        self.errors = 0
+
+        # snapshots of the base state with everything but the test data set up, keyed by concrete_rand. each test
+        # starts from a copy of one of them
+        self._prepared_states = { }
+
+    def prepare_base_state(self):
+        """
+        Get the state that tests start from ready, by executing the binary until it receives input. This is done
+        automatically before the first test.
+        """
+        if self.base_state is None:
+            self.base_state = self._get_recv_state()
 
     def _get_recv_state(self):
         try:
@@ -106,11 +120,14 @@ class Runner(object):
         # FIXME fdwait should do something concrete...
 
         if initial_state is None:
-            if self.base_state is None:
-                self.base_state = self._get_recv_state()
-            entry_state = self.base_state.copy()
+            prepared = self._prepared_states.get(concrete_rand, None)
+            if prepared is None:
+                self.prepare_base_state()
+                prepared = self._prepare_state(self.base_state, concrete_rand)
+                self._prepared_states[concrete_rand] = prepared
+            entry_state = prepared.copy()
         else:
-            entry_state = initial_state.copy()
+            entry_state = self._prepare_state(initial_state, concrete_rand)
 
         stdin = SimFile('stdin', content=test_data.preloaded_stdin)
         stdout = SimFile('stdout')
@@ -118,6 +135,17 @@ class Runner(object):
         fd = {0: SimFileDescriptor(stdin, 0), 1: SimFileDescriptor(stdout, 0), 2: SimFileDescriptor(stderr, 0)}
         entry_state.register_plugin('posix', SimSystemPosix(stdin=stdin, stdout=stdout, stderr=stderr, fd=fd))
 
+        # solver timeout
+        entry_state.solver._solver.timeout = 500
+
+        return entry_state
+
+    def _prepare_state(self, state, concrete_rand):
+        """
+        Copy a state and set up everything that does not depend on the test data.
+        """
+
+        entry_state = state.copy()
         entry_state.options.add(so.STRICT_PAGE_ACCESS)
 
         # make sure unicorn will run
@@ -150,9 +178,6 @@ class Runner(object):
                 action=self.syscall_hook_concrete_rand
             )
 
-        # solver timeout
-        entry_state.solver._solver.timeout = 500
-
         return entry_state
 
     @staticmethod
@@ -248,9 +273,11 @@ class Runner(object):
             result_state = call.result_state
         except AngrCallableMultistateError as e:
             l.info("multistate error: %s", e)
+            self.errors += 1
             return False
         except AngrCallableError as e:
             l.info("other callable error: %s", e)
+            self.errors += 1
             return False
 
         # check matches
@@ -346,9 +373,11 @@ class Runner(object):
             result_state = call.result_state
         except AngrCallableMultistateError as e:
             l.info("multistate error: %s", e)
+            self.errors += 1
             return None
         except AngrCallableError as e:
             l.info("other callable error: %s", e)
+            self.errors += 1
             return None
 
         return result_state
@@ -0,0 +1,190 @@
+
+import io
+import os
+import pickle
+import sqlite3
+import hashlib
+
+from .functions import Functions
+
+import logging
+l = logging.getLogger("identifier.verdict_cache")
+
+
+class _VerdictUnpickler(pickle.Unpickler):
+    """
+    Unpickle a stored verdict, which only consists of plain data. No class may be loaded, so a tampered entry cannot
+    make us call arbitrary functions.
+    """
+
+    _allowed_builtins = frozenset(('set', 'frozenset', 'bytearray', 'complex'))
+
+    def find_class(self, module, name):
+        if module == 'builtins' and name in self._allowed_builtins:
+            return super(_VerdictUnpickler, self).find_class(module, name)
+        raise pickle.UnpicklingError("%s.%s is not allowed in the verdict cache" % (module, name))
+
+
+class VerdictCache(object):
+    """
+    An on-disk cache of the verdicts of the Identifier, backed by an sqlite database.
+
+    A verdict is the outcome of testing a function of the binary against one candidate function: either the matching
+    Func instance, which carries everything its pre_test() found out about the function, or None. Verdicts are keyed by
+    the code of the function and of everything it may call, and by the data of the binary, which the code may read, so
+    they remain valid across runs. Only verdicts of tests that completed without errors are stored. Like the persistent
+    lift cache, the database may be shared by concurrent processes, and a lookup or a store that fails is treated as a
+    miss.
+
+    A matching Func is stored as the name of its class and its attributes, which must be plain data. Entries are loaded
+    with an unpickler that refuses to load any class, and verdicts that cannot be stored this way are not cached.
+    """
+
+    # bump this whenever the tests of the candidate functions change
+    FORMAT_VERSION = 3
+
+    def __init__(self, path, timeout=5.0):
+        """
+        :param str path:        Path to the database file. It is created if it does not exist.
+        :param float timeout:   How many seconds to wait for a lock held by another process before giving up.
+        """
+        self.path = path
+        self.timeout = timeout
+
+        self._conn = None
+        self._pid = None
+
+    def _connection(self):
+        # sqlite connections must not be shared across fork()
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS verdicts (key BLOB PRIMARY KEY, verdict BLOB NOT NULL)")
+            self._conn = conn
+            self._pid = os.getpid()
+        return self._conn
+
+    def __getstate__(self):
+        return {'path': self.path, 'timeout': self.timeout}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'], timeout=state['timeout'])
+
+    @staticmethod
+    def data_hash(project):
+        """
+        Hash the data of the main binary, which is the content of all of its segments that are not executable.
+
+        :param project: The project.
+        :return:        The hash, as a bytes object.
+        """
+
+        h = hashlib.sha256()
+        main_object = project.loader.main_object
+        regions = main_object.segments if main_object.segments else main_object.sections
+        for region in sorted(regions, key=lambda r: r.vaddr):
+            if region.is_executable:
+                continue
+            h.update(b"%d:" % (region.vaddr - main_object.mapped_base))
+            try:
+                h.update(project.loader.memory.load(region.vaddr, region.memsize))
+            except KeyError:
+                pass
+        return h.digest()
+
+    @classmethod
+    def function_hash(cls, project, functions, func_addr, data_hash=None):
+        """
+        Hash the code of a function and of all functions that it may call, and the data of the binary.
+
+        Blocks are hashed with their offset from the start of their function, so the hash does not depend on where the
+        code is loaded.
+
+        :param project:         The project.
+        :param functions:       The FunctionManager of the CFG.
+        :param int func_addr:   Address of the function.
+        :param bytes data_hash: The data_hash() of the project, if it is computed already.
+        :return:                The hash, as a bytes object.
+        """
+
+        if data_hash is None:
+            data_hash = cls.data_hash(project)
+
+        h = hashlib.sha256(repr((cls.FORMAT_VERSION, project.arch.name)).encode())
+        h.update(data_hash)
+
+        callgraph = functions.callgraph
+        to_hash = [ func_addr ]
+        seen = set()
+        while to_hash:
+            addr = to_hash.pop()
+            if addr in seen or addr not in functions:
+                continue
+            seen.add(addr)
+
+            func = functions[addr]
+            h.update(b"function %d" % len(seen))
+            for block in sorted(func.graph.nodes(), key=lambda b: b.addr):
+                h.update(b"%d:" % (block.addr - addr))
+                try:
+                    h.update(project.loader.memory.load(block.addr, block.size))
+                except KeyError:
+                    pass
+            if addr in callgraph:
+                to_hash.extend(sorted(callgraph.successors(addr), reverse=True))
+
+        return h.digest()
+
+    @staticmethod
+    def key(function_hash, candidate_name):
+        return function_hash + candidate_name.encode()
+
+    def get(self, key):
+        """
+        Look up a verdict.
+
+        :param bytes key:   The key, from key().
+        :return:            A tuple of whether the verdict is cached, and the verdict.
+        :rtype:             tuple
+        """
+        try:
+            row = self._connection().execute("SELECT verdict FROM verdicts WHERE key = ?", (key,)).fetchone()
+        except sqlite3.Error as ex:
+            l.debug("Failed to look up a verdict in the verdict cache %s: %s", self.path, ex)
+            return False, None
+        if row is None:
+            return False, None
+
+        try:
+            data = _VerdictUnpickler(io.BytesIO(row[0])).load()
+            if data is None:
+                return True, None
+            name, attrs = data
+            verdict = Functions[name]()
+            verdict.__dict__.update(attrs)
+        except Exception:  # pylint:disable=broad-except
+            l.warning("Corrupted entry in the verdict cache %s.", self.path)
+            return False, None
+        return True, verdict
+
+    def put(self, key, verdict):
+        """
+        Store a verdict.
+
+        :param bytes key:   The key, from key().
+        :param verdict:     The matching Func instance, or None.
+        """
+        data = None if verdict is None else (type(verdict).__name__, dict(vars(verdict)))
+        try:
+            data = pickle.dumps(data, pickle.HIGHEST_PROTOCOL)
+            # make sure that the verdict can be loaded again
+            _VerdictUnpickler(io.BytesIO(data)).load()
+        except Exception as ex:  # pylint:disable=broad-except
+            l.debug("Failed to serialize a verdict for the verdict cache %s: %s", self.path, ex)
+            return
+
+        try:
+            self._connection().execute("INSERT OR REPLACE INTO verdicts (key, verdict) VALUES (?, ?)", (key, data))
+        except sqlite3.Error as ex:
+            l.debug("Failed to store a verdict in the verdict cache %s: %s", self.path, ex)
@@ -285,8 +285,9 @@ class VFG(ForwardAnalysis, Analysis):   # pylint:disable=abstract-method
         :param int timeout:
         """
 
+        # the sorting key of a job depends on the task stack
         ForwardAnalysis.__init__(self, order_jobs=True, allow_merging=True, allow_widening=True,
-                                 status_callback=status_callback
+                                 status_callback=status_callback, dynamic_job_keys=True
                                  )
 
         # Related CFG.
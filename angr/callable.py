@@ -1,7 +1,30 @@
 
+import itertools
+import multiprocessing
+
+import claripy
 import pycparser
 
 from .calling_conventions import DEFAULT_CC
+from . import sim_options as o
+
+
+# the Callable that worker processes of Callable.map() run their calls with. it is inherited through fork()
+_map_worker_callable = None
+
+
+def _map_worker_calls(job):
+    """
+    Perform a chunk of calls in a worker process.
+
+    :param tuple job:   A tuple of whether to use unicorn and a list of argument tuples.
+    :return:            A list of return values, or of the AngrCallableErrors raised by the calls.
+    :rtype:             list
+    """
+    unicorn, arg_tuples = job
+    # each worker prepares its base state once, on its first chunk
+    base_state = _map_worker_callable._batch_state(unicorn)  # pylint:disable=protected-access
+    return [ _map_worker_callable._call_from(base_state, args) for args in arg_tuples ]  # pylint:disable=protected-access
 
 
 class Callable(object):
@@ -13,6 +36,8 @@ class Callable(object):
     you can get the result state with callable.result_state.
 
     Otherwise, you can get the resulting simulation manager at callable.result_path_group.
+
+    To call the same function with many different inputs, use callable.map(), which streams back the return values.
     """
 
     def __init__(self, project, addr, concrete_only=False, perform_merge=True, base_state=None, toc=None, cc=None):
@@ -41,24 +66,150 @@ class Callable(object):
         self.result_path_group = None
         self.result_state = None
 
+        # the base states that map() prepares once and copies for each call, keyed by whether unicorn is enabled
+        self._batch_states = { }
+
     def set_base_state(self, state):
         """
         Swap out the state you'd like to use to perform the call
         :param state: The state to use to perform the call
         """
         self._base_state = state
+        self._batch_states = { }
 
     def __call__(self, *args):
         self.perform_call(*args)
         if self.result_state is not None:
-            return self.result_state.solver.simplify(self._cc.get_return_val(self.result_state, stack_base=self.result_state.regs.sp - self._cc.STACKARG_SP_DIFF))
+            return self._return_value(self.result_state)
         else:
             return None
 
     def perform_call(self, *args):
+        self._perform_call_from(self._base_state, args)
+
+    def map(self, arg_tuples, workers=None, chunk_size=16, unicorn=True):
+        """
+        Call the function once for each of a sequence of argument tuples, and yield the return values in the same
+        order as soon as they are available.
+
+        The state that the calls start from is prepared only once, and copied for each call, and all calls share the
+        blocks lifted by the project. Calls whose arguments are all concrete run through unicorn if it is available.
+        A call that fails with an AngrCallableError (for example, because execution split with concrete_only=True)
+        yields the exception instead of a return value, so one bad input does not stop the batch.
+
+        Unlike calling the Callable directly, map() does not update result_state and result_path_group.
+
+        :param arg_tuples:      An iterable of tuples of arguments.
+        :param int workers:     Number of worker processes to distribute the calls across. Worker processes are forked,
+                                and the return values must be picklable. By default, all calls are performed in the
+                                current process.
+        :param int chunk_size:  Number of calls to send to a worker process at once.
+        :param bool unicorn:    Whether to run calls with concrete arguments through unicorn.
+        :return:                A generator of return values (claripy ASTs, or None) and AngrCallableErrors.
+        """
+
+        if workers is not None and workers > 1 and 'fork' in multiprocessing.get_all_start_methods():
+            for r in self._map_in_workers(arg_tuples, workers, chunk_size, unicorn):
+                yield r
+            return
+
+        for args in arg_tuples:
+            yield self._call_from(self._batch_state(unicorn and self._is_concrete_call(args)), args)
+
+    #
+    # Private methods
+    #
+
+    def _batch_state(self, unicorn):
+        """
+        Get the prepared base state for calls of map().
+
+        :param bool unicorn:    Whether the calls run through unicorn.
+        :return:                A SimState.
+        """
+
+        state = self._batch_states.get(unicorn, None)
+        if state is None:
+            if self._base_state is not None:
+                state = self._base_state.copy()
+            else:
+                state = self._project.factory.blank_state(addr=self._addr)
+            if unicorn:
+                state.options |= o.unicorn
+            self._batch_states[unicorn] = state
+        return state
+
+    @staticmethod
+    def _is_concrete_call(args):
+        return all(Callable._is_concrete_arg(arg) for arg in args)
+
+    @staticmethod
+    def _is_concrete_arg(arg):
+        if isinstance(arg, (int, str, bytes)):
+            return True
+        if isinstance(arg, claripy.ast.Base):
+            return not arg.symbolic
+        if isinstance(arg, (list, tuple)):
+            return all(Callable._is_concrete_arg(a) for a in arg)
+        return False
+
+    def _map_in_workers(self, arg_tuples, workers, chunk_size, unicorn):
+        """
+        Distribute the calls of map() across a pool of forked worker processes, chunk by chunk.
+        """
+
+        global _map_worker_callable  # pylint:disable=global-statement
+
+        def jobs():
+            it = iter(arg_tuples)
+            while True:
+                chunk = list(itertools.islice(it, chunk_size))
+                if not chunk:
+                    return
+                # calls in the same chunk share the base state, so a chunk either runs entirely in unicorn or not
+                yield unicorn and all(self._is_concrete_call(args) for args in chunk), chunk
+
+        _map_worker_callable = self
+        pool = multiprocessing.get_context('fork').Pool(processes=workers)
+        try:
+            for results in pool.imap(_map_worker_calls, jobs()):
+                for r in results:
+                    yield r
+            pool.close()
+        finally:
+            pool.terminate()
+            pool.join()
+            _map_worker_callable = None
+
+    def _call_from(self, base_state, args):
+        """
+        Perform a call for map(), and get its return value.
+
+        :return:    The return value, or the AngrCallableError raised by the call.
+        """
+
+        try:
+            result_state = self._perform_call_from(base_state, args, update_results=False)
+        except AngrCallableError as ex:
+            return ex
+        return self._return_value(result_state)
+
+    def _return_value(self, state):
+        return state.solver.simplify(self._cc.get_return_val(state, stack_base=state.regs.sp - self._cc.STACKARG_SP_DIFF))
+
+    def _perform_call_from(self, base_state, args, update_results=True):
+        """
+        Perform a call starting from a base state.
+
+        :param base_state:          The state to copy, or None to start from a blank state.
+        :param tuple args:          The arguments of the call.
+        :param bool update_results: Whether to set result_path_group and result_state.
+        :return:                    The (merged) result state, or None if perform_merge is False.
+        """
+
         state = self._project.factory.call_state(self._addr, *args,
                     cc=self._cc,
-                    base_state=self._base_state,
+                    base_state=base_state,
                     ret_addr=self._deadend_addr,
                     toc=self._toc)
 
@@ -75,11 +226,16 @@ class Callable(object):
         if len(caller.active) == 0:
             raise AngrCallableError("No paths returned from function")
 
-        self.result_path_group = caller.copy()
+        if update_results:
+            self.result_path_group = caller.copy()
 
-        if self._perform_merge:
+        if self._perform_merge or not update_results:
             caller.merge()
-            self.result_state = caller.active[0]
+            result_state = caller.active[0]
+            if update_results:
+                self.result_state = result_state
+            return result_state
+        return None
 
     def call_c(self, c_args):
         """
@@ -113,6 +113,8 @@ class SimEngineUnicorn(SimEngine):
             state.unicorn.set_stops(extra_stop_points)
             state.unicorn.set_tracking(track_bbls=o.UNICORN_TRACK_BBL_ADDRS in state.options,
                                        track_stack=o.UNICORN_TRACK_STACK_POINTERS in state.options)
+            if state.unicorn.expected_bbls:
+                state.unicorn.set_expected_bbls(state.unicorn.expected_bbls)
             state.unicorn.hook()
             state.unicorn.start(step=step)
             state.unicorn.finish()
@@ -125,6 +127,7 @@ class SimEngineUnicorn(SimEngine):
             successors.initial_state.unicorn.countdown_symbolic_registers = state.unicorn.countdown_symbolic_registers
             successors.initial_state.unicorn.countdown_nonunicorn_blocks = state.unicorn.countdown_nonunicorn_blocks
             successors.initial_state.unicorn.countdown_stop_point = state.unicorn.countdown_stop_point
+            successors.initial_state.unicorn.expected_bbls = None
             return
 
         description = 'Unicorn (%s after %d steps)' % (STOP.name_stop(state.unicorn.stop_reason), state.unicorn.steps)
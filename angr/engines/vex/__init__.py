@@ -19,6 +19,7 @@ def translate_irconst(state, c):
 from .expressions import SimIRExpr, translate_expr
 from .statements import SimIRStmt, translate_stmt
 from .engine import SimEngineVEX
+from .lift_cache import PersistentLiftCache
 from . import ccall
 
 from .irop import operations
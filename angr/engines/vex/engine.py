@@ -15,6 +15,7 @@ from ...misc.ux import once
 from ..engine import SimEngine
 from .statements import translate_stmt
 from .expressions import translate_expr
+from .lift_cache import PersistentLiftCache
 
 import logging
 l = logging.getLogger("angr.engines.vex.engine")
@@ -36,7 +37,8 @@ class SimEngineVEX(SimEngine):
             default_opt_level=1,
             support_selfmodifying_code=None,
             single_step=False,
-            default_strict_block_end=False):
+            default_strict_block_end=False,
+            persistent_cache=None):
 
         super(SimEngineVEX, self).__init__(project)
 
@@ -47,6 +49,9 @@ class SimEngineVEX(SimEngine):
         self._single_step = single_step
         self._cache_size = cache_size
         self.default_strict_block_end = default_strict_block_end
+        if isinstance(persistent_cache, str):
+            persistent_cache = PersistentLiftCache(persistent_cache)
+        self.persistent_cache = persistent_cache
 
         if self._use_cache is None:
             if project is not None:
@@ -63,6 +68,8 @@ class SimEngineVEX(SimEngine):
         self._block_cache = None
         self._block_cache_hits = 0
         self._block_cache_misses = 0
+        self._persistent_cache_hits = 0
+        self._persistent_cache_misses = 0
 
         self._initialize_block_cache()
 
@@ -77,6 +84,8 @@ class SimEngineVEX(SimEngine):
         self._block_cache = LRUCache(maxsize=self._cache_size)
         self._block_cache_hits = 0
         self._block_cache_misses = 0
+        self._persistent_cache_hits = 0
+        self._persistent_cache_misses = 0
 
     def process(self, state,
             irsb=None,
@@ -261,9 +270,12 @@ class SimEngineVEX(SimEngine):
 
             try:
                 state.scratch.stmt_idx = stmt_idx
-                state._inspect('statement', BP_BEFORE, statement=stmt_idx)
-                self._handle_statement(state, successors, stmt)
-                state._inspect('statement', BP_AFTER)
+                if state._inspect_armed('statement'):
+                    state._inspect('statement', BP_BEFORE, statement=stmt_idx)
+                    self._handle_statement(state, successors, stmt)
+                    state._inspect('statement', BP_AFTER)
+                else:
+                    self._handle_statement(state, successors, stmt)
             except UnsupportedDirtyError:
                 if o.BYPASS_UNSUPPORTED_IRDIRTY not in state.options:
                     raise
@@ -361,11 +373,14 @@ class SimEngineVEX(SimEngine):
             for subaddr in range(stmt.len):
                 if subaddr + stmt.addr in state.scratch.dirty_addrs:
                     raise SimReliftException(state)
-            state._inspect('instruction', BP_AFTER)
+            inspect = state._inspect_armed('instruction')
+            if inspect:
+                state._inspect('instruction', BP_AFTER)
 
             l.debug("IMark: %#x", stmt.addr)
             state.scratch.num_insns += 1
-            state._inspect('instruction', BP_BEFORE, instruction=ins_addr)
+            if inspect:
+                state._inspect('instruction', BP_BEFORE, instruction=ins_addr)
 
         # process it!
         s_stmt = translate_stmt(stmt, state)
@@ -474,9 +489,14 @@ class SimEngineVEX(SimEngine):
             skip_stmts = False
 
         use_cache = self._use_cache
+        persistent_cache = self.persistent_cache
         if skip_stmts or collect_data_refs:
             # Do not cache the blocks if skip_stmts or collect_data_refs are enabled
             use_cache = False
+            persistent_cache = None
+        if traceflags:
+            # VEX only prints the traces when it actually lifts the block
+            persistent_cache = None
 
         # phase 2: thumb normalization
         thumb = int(thumb)
@@ -532,16 +552,28 @@ class SimEngineVEX(SimEngine):
         # l.debug("Creating pyvex.IRSB of arch %s at %#x", arch.name, addr)
         try:
             for subphase in range(2):
-                irsb = pyvex.lift(buff, addr + thumb, arch,
-                                  max_bytes=size,
-                                  max_inst=num_inst,
-                                  bytes_offset=thumb,
-                                  traceflags=traceflags,
-                                  opt_level=opt_level,
-                                  strict_block_end=strict_block_end,
-                                  skip_stmts=skip_stmts,
-                                  collect_data_refs=collect_data_refs,
-                                  )
+                if persistent_cache is not None:
+                    irsb, hit = persistent_cache.lift(buff, size, addr + thumb, arch,
+                                                      max_inst=num_inst,
+                                                      bytes_offset=thumb,
+                                                      opt_level=opt_level,
+                                                      strict_block_end=strict_block_end,
+                                                      )
+                    if hit:
+                        self._persistent_cache_hits += 1
+                    else:
+                        self._persistent_cache_misses += 1
+                else:
+                    irsb = pyvex.lift(buff, addr + thumb, arch,
+                                      max_bytes=size,
+                                      max_inst=num_inst,
+                                      bytes_offset=thumb,
+                                      traceflags=traceflags,
+                                      opt_level=opt_level,
+                                      strict_block_end=strict_block_end,
+                                      skip_stmts=skip_stmts,
+                                      collect_data_refs=collect_data_refs,
+                                      )
 
                 if subphase == 0 and irsb.statements is not None:
                     # check for possible stop points
@@ -659,6 +691,8 @@ class SimEngineVEX(SimEngine):
 
         self._block_cache_hits = 0
         self._block_cache_misses = 0
+        self._persistent_cache_hits = 0
+        self._persistent_cache_misses = 0
 
     #
     # Pickling
@@ -673,6 +707,7 @@ class SimEngineVEX(SimEngine):
         self._single_step = state['_single_step']
         self._cache_size = state['_cache_size']
         self.default_strict_block_end = state['default_strict_block_end']
+        self.persistent_cache = state.get('persistent_cache', None)
 
         # rebuild block cache
         self._initialize_block_cache()
@@ -687,5 +722,6 @@ class SimEngineVEX(SimEngine):
         s['_single_step'] = self._single_step
         s['_cache_size'] = self._cache_size
         s['default_strict_block_end'] = self.default_strict_block_end
+        s['persistent_cache'] = self.persistent_cache
 
         return s
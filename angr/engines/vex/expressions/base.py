@@ -24,7 +24,8 @@ class SimIRExpr(object):
         else:
             self.type = expr.result_type(state.scratch.tyenv)
 
-        self.state._inspect('expr', BP_BEFORE)
+        if self.state._inspect_armed('expr'):
+            self.state._inspect('expr', BP_BEFORE)
 
     def process(self):
         """
@@ -35,7 +36,8 @@ class SimIRExpr(object):
         self._execute()
 
         self._post_process()
-        self.state._inspect('expr', BP_AFTER, expr=self.expr)
+        if self.state._inspect_armed('expr'):
+            self.state._inspect('expr', BP_AFTER, expr=self.expr)
 
     def _execute(self):
         raise NotImplementedError()
@@ -0,0 +1,182 @@
+import io
+import os
+import pickle
+import sqlite3
+import hashlib
+
+import pyvex
+
+import logging
+l = logging.getLogger("angr.engines.vex.lift_cache")
+
+
+class _IRSBPickler(pickle.Pickler):
+    """
+    Pickle an IRSB without its architecture, which is referenced by the block and by its type environment. The
+    architecture is known when loading the block anyway.
+    """
+
+    def __init__(self, file, arch):
+        super(_IRSBPickler, self).__init__(file, pickle.HIGHEST_PROTOCOL)
+        self._arch = arch
+
+    def persistent_id(self, obj):
+        if obj is self._arch:
+            return 'arch'
+        return None
+
+
+class _IRSBUnpickler(pickle.Unpickler):
+    """
+    Unpickle an IRSB, refusing to load anything but pyvex objects, so a tampered entry cannot make us call arbitrary
+    functions.
+    """
+
+    _allowed_builtins = frozenset(('set', 'frozenset', 'bytearray', 'complex'))
+
+    def __init__(self, file, arch):
+        super(_IRSBUnpickler, self).__init__(file)
+        self._arch = arch
+
+    def persistent_load(self, pid):
+        if pid == 'arch':
+            return self._arch
+        raise pickle.UnpicklingError("Unknown persistent object %r in the lift cache" % (pid,))
+
+    def find_class(self, module, name):
+        if module == 'pyvex' or module.startswith('pyvex.') or \
+                (module == 'builtins' and name in self._allowed_builtins):
+            return super(_IRSBUnpickler, self).find_class(module, name)
+        raise pickle.UnpicklingError("%s.%s is not allowed in the lift cache" % (module, name))
+
+
+class PersistentLiftCache(object):
+    """
+    An on-disk cache of lifted IRSBs, backed by an sqlite database.
+
+    Blocks are keyed by the bytes they are lifted from, their address, the architecture, and all lifting parameters, so
+    the cache stays valid across runs, across rebased or patched binaries, and across different binaries sharing the same
+    file. The database may be shared by any number of concurrent processes: sqlite serializes the writers, and a lookup
+    or a store that cannot acquire the database in time is treated as a miss instead of failing the lift.
+
+    Entries are unpickled with an unpickler that only loads pyvex objects, and entries that contain anything else are
+    treated as corrupted. Still, whoever can write to the database decides what the blocks that are executed look like,
+    so the database must only be writable by users that are trusted.
+    """
+
+    # bump this whenever the layout of the stored IRSBs changes
+    FORMAT_VERSION = 2
+
+    def __init__(self, path, timeout=5.0):
+        """
+        :param str path:        Path to the database file. It is created if it does not exist.
+        :param float timeout:   How many seconds to wait for a lock held by another process before giving up.
+        """
+        self.path = path
+        self.timeout = timeout
+
+        self._conn = None
+        self._pid = None
+
+    def _connection(self):
+        # sqlite connections must not be shared across fork()
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS irsbs (key BLOB PRIMARY KEY, irsb BLOB NOT NULL)")
+            self._conn = conn
+            self._pid = os.getpid()
+        return self._conn
+
+    @classmethod
+    def key(cls, data, addr, arch, size, num_inst, thumb, opt_level, strict_block_end):
+        """
+        Compute the cache key of a block.
+
+        :param bytes data:  The bytes the block is lifted from, at most `size` of them.
+        :return:            The key, as a bytes object.
+        """
+        h = hashlib.sha256(data)
+        h.update(repr((cls.FORMAT_VERSION, arch.name, arch.memory_endness, addr, size, num_inst, thumb, opt_level,
+                       strict_block_end)).encode())
+        return h.digest()
+
+    def get(self, key, arch):
+        """
+        Look up a lifted block.
+
+        :param bytes key:   The cache key.
+        :param arch:        The architecture of the block.
+        :return:            The cached IRSB, or None if the block is not in the cache.
+        :rtype:             pyvex.IRSB
+        """
+        try:
+            row = self._connection().execute("SELECT irsb FROM irsbs WHERE key = ?", (key,)).fetchone()
+        except sqlite3.Error as ex:
+            l.debug("Failed to look up a block in the lift cache %s: %s", self.path, ex)
+            return None
+        if row is None:
+            return None
+
+        try:
+            return _IRSBUnpickler(io.BytesIO(row[0]), arch).load()
+        except Exception:  # pylint:disable=broad-except
+            l.warning("Corrupted entry in the lift cache %s.", self.path)
+            return None
+
+    def put(self, key, irsb):
+        """
+        Store a lifted block.
+
+        :param bytes key:           The cache key.
+        :param pyvex.IRSB irsb:     The block.
+        """
+        f = io.BytesIO()
+        _IRSBPickler(f, irsb.arch).dump(irsb)
+        data = f.getvalue()
+
+        try:
+            self._connection().execute("INSERT OR IGNORE INTO irsbs (key, irsb) VALUES (?, ?)", (key, data))
+        except sqlite3.Error as ex:
+            l.debug("Failed to store a block in the lift cache %s: %s", self.path, ex)
+
+    def lift(self, buff, size, addr, arch, **kwargs):
+        """
+        Lift a block through the cache. The arguments are the same as the ones of pyvex.lift().
+
+        :return:    A tuple of the IRSB and whether it was found in the cache.
+        """
+        data = bytes(pyvex.ffi.buffer(buff, size)) if not isinstance(buff, bytes) else buff[:size]
+        key = self.key(data, addr, arch, size, kwargs.get('max_inst', None), kwargs.get('bytes_offset', 0),
+                       kwargs.get('opt_level', 1), kwargs.get('strict_block_end', False))
+
+        irsb = self.get(key, arch)
+        if irsb is not None:
+            return irsb, True
+
+        irsb = pyvex.lift(buff, addr, arch, max_bytes=size, **kwargs)
+        self.put(key, irsb)
+        return irsb, False
+
+    def clear(self):
+        """
+        Remove all blocks from the cache.
+        """
+        self._connection().execute("DELETE FROM irsbs")
+
+    def __len__(self):
+        return self._connection().execute("SELECT COUNT(*) FROM irsbs").fetchone()[0]
+
+    #
+    # Pickling
+    #
+
+    def __getstate__(self):
+        return {'path': self.path, 'timeout': self.timeout}
+
+    def __setstate__(self, state):
+        self.path = state['path']
+        self.timeout = state['timeout']
+        self._conn = None
+        self._pid = None
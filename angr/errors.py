@@ -109,6 +109,13 @@ class AngrDataGraphError(AngrAnalysisError):
 class AngrDDGError(AngrAnalysisError):
     pass
 
+#
+# Knowledge base errors
+#
+
+class AngrKnowledgeBaseError(AngrError):
+    pass
+
 #
 # Exploration techniques
 #
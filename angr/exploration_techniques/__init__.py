@@ -174,6 +174,7 @@ from .loop_seer import LoopSeer
 from .tracer import Tracer
 from .explorer import Explorer
 from .threading import Threading
+from .process_pool import ProcessPool
 from .dfs import DFS
 from .lengthlimiter import LengthLimiter
 from .veritesting import Veritesting
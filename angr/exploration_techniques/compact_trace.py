@@ -0,0 +1,212 @@
+import os
+import sys
+import mmap
+import array
+import struct
+from collections import OrderedDict
+
+
+class CompactTrace(object):
+    """
+    A basic block trace stored in a compact binary file, which is memory-mapped instead of being loaded into a list.
+
+    The file holds the differences between consecutive addresses as zigzag-encoded varints, so most entries take one or
+    two bytes. Every `interval` entries, a checkpoint records the absolute address and the offset of the next entry, so
+    any entry can be reached by decoding at most `interval` entries. A few recently decoded checkpoint intervals are
+    cached, which makes sequential access, the way Tracer walks a trace, cost O(1) per entry.
+
+    File layout (all integers are little-endian uint64):
+        - magic, number of entries, checkpoint interval, offset of the checkpoint table
+        - the encoded deltas
+        - the checkpoint table: (offset of the first entry of the interval, address of the entry preceding it) pairs
+
+    CompactTrace supports the parts of the list interface that Tracer uses: len(), indexing, iteration, and index().
+    """
+
+    MAGIC = b'ANGRTRC1'
+    HEADER = struct.Struct('<8sQQQ')
+    DEFAULT_INTERVAL = 1024
+    # number of decoded checkpoint intervals to keep. Tracer keeps looking at the end of the trace while walking it
+    CACHED_CHUNKS = 4
+
+    def __init__(self, path):
+        """
+        :param str path:    Path of the trace file.
+        """
+
+        self.path = path
+
+        self._file = open(path, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        if size < self.HEADER.size:
+            self._file.close()
+            raise ValueError("%s is not a compact trace file." % path)
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self._count, self._interval, table_offset = self.HEADER.unpack_from(self._mmap, 0)
+        if magic != self.MAGIC:
+            self.close()
+            raise ValueError("%s is not a compact trace file." % path)
+
+        table_size = ((self._count + self._interval - 1) // self._interval) * 2
+        if sys.byteorder == 'little':
+            self._checkpoints = memoryview(self._mmap)[table_offset:table_offset + table_size * 8].cast('Q')
+        else:
+            self._checkpoints = array.array('Q', self._mmap[table_offset:table_offset + table_size * 8])
+            self._checkpoints.byteswap()
+
+        # recently decoded checkpoint intervals
+        self._chunks = OrderedDict()
+
+    def close(self):
+        if self._mmap is not None:
+            if isinstance(self._checkpoints, memoryview):
+                self._checkpoints.release()
+            self._checkpoints = None
+            self._mmap.close()
+            self._mmap = None
+        self._file.close()
+
+    def __getstate__(self):
+        return {'path': self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'])
+
+    #
+    # Writing
+    #
+
+    @classmethod
+    def write(cls, path, addrs, interval=None):
+        """
+        Write a trace file.
+
+        :param str path:        Path of the trace file.
+        :param addrs:           An iterable of basic block addresses.
+        :param int interval:    Number of entries between two checkpoints.
+        :return:                None
+        """
+
+        if interval is None:
+            interval = cls.DEFAULT_INTERVAL
+
+        checkpoints = array.array('Q')
+        count = 0
+        prev = 0
+        with open(path, 'wb') as f:
+            f.write(cls.HEADER.pack(cls.MAGIC, 0, interval, 0))
+            offset = cls.HEADER.size
+            buf = bytearray()
+            for addr in addrs:
+                if count % interval == 0:
+                    f.write(buf)
+                    offset += len(buf)
+                    buf = bytearray()
+                    checkpoints.append(offset)
+                    checkpoints.append(prev)
+
+                delta = addr - prev
+                # zigzag encoding, so that small negative deltas are small too
+                v = (delta << 1) if delta >= 0 else ((-delta) << 1) - 1
+                while v >= 0x80:
+                    buf.append((v & 0x7f) | 0x80)
+                    v >>= 7
+                buf.append(v)
+
+                prev = addr
+                count += 1
+
+            f.write(buf)
+            offset += len(buf)
+            # align the checkpoint table, so that it can be cast to an array in place
+            padding = (-offset) % 8
+            f.write(b'\0' * padding)
+            table_offset = offset + padding
+            if sys.byteorder != 'little':
+                checkpoints.byteswap()
+            f.write(checkpoints.tobytes())
+
+            f.seek(0)
+            f.write(cls.HEADER.pack(cls.MAGIC, count, interval, table_offset))
+
+    #
+    # Reading
+    #
+
+    def _decode_chunk(self, chunk):
+        """
+        Decode all entries of a checkpoint interval.
+
+        :param int chunk:   The index of the checkpoint interval.
+        :return:            A list of addresses.
+        :rtype:             list
+        """
+
+        entries = self._chunks.get(chunk, None)
+        if entries is not None:
+            self._chunks.move_to_end(chunk)
+            return entries
+
+        offset = self._checkpoints[chunk * 2]
+        prev = self._checkpoints[chunk * 2 + 1]
+        n = min(self._interval, self._count - chunk * self._interval)
+
+        data = self._mmap
+        entries = [ ]
+        for _ in range(n):
+            v, shift = 0, 0
+            while True:
+                b = data[offset]
+                offset += 1
+                v |= (b & 0x7f) << shift
+                if b < 0x80:
+                    break
+                shift += 7
+            prev += (v >> 1) if not v & 1 else -((v + 1) >> 1)
+            entries.append(prev)
+
+        self._chunks[chunk] = entries
+        if len(self._chunks) > self.CACHED_CHUNKS:
+            self._chunks.popitem(last=False)
+        return entries
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [ self[i] for i in range(*idx.indices(self._count)) ]
+        if idx < 0:
+            idx += self._count
+        if not 0 <= idx < self._count:
+            raise IndexError("trace index out of range")
+        chunk, pos = divmod(idx, self._interval)
+        return self._decode_chunk(chunk)[pos]
+
+    def __iter__(self):
+        for chunk in range((self._count + self._interval - 1) // self._interval):
+            for addr in self._decode_chunk(chunk):
+                yield addr
+
+    def index(self, value, start=0, stop=None):
+        """
+        Find the first occurrence of an address, like list.index().
+        """
+
+        if stop is None or stop > self._count:
+            stop = self._count
+        if start < 0:
+            start = max(0, start + self._count)
+
+        idx = start
+        while idx < stop:
+            chunk, pos = divmod(idx, self._interval)
+            entries = self._decode_chunk(chunk)
+            end = min(len(entries), pos + stop - idx)
+            try:
+                return chunk * self._interval + entries.index(value, pos, end)
+            except ValueError:
+                idx = (chunk + 1) * self._interval
+
+        raise ValueError("%#x is not in the trace" % value)
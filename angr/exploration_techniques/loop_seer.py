@@ -143,7 +143,7 @@ class LoopSeer(ExplorationTechnique):
             if f is None:
                 l.warning("Function at 0x%x doesn't exist in the CFG. Skipping...", func)
 
-        elif type(func) is Function:
+        elif isinstance(func, Function):
             f = func
 
         return f
@@ -0,0 +1,291 @@
+import io
+import pickle
+import copyreg
+import itertools
+import multiprocessing
+
+from . import ExplorationTechnique
+from ..errors import AngrExplorationTechniqueError
+
+import logging
+l = logging.getLogger("angr.exploration_techniques.process_pool")
+
+
+# the project instance preloaded in each worker process, and the objects we never ship across process boundaries
+_worker_project = None
+_worker_shared = None
+
+
+def _shared_objects(project):
+    """
+    Collect the project-level objects that are referenced by states but should never be serialized with them. Each
+    process (the parent and every worker) holds its own copy of these, and pickles refer to them by name.
+
+    :param angr.Project project:    The project.
+    :return:                        A dict mapping names to shared objects.
+    :rtype:                         dict
+    """
+    shared = {
+        'project': project,
+        'loader': project.loader,
+        'memory': project.loader.memory,
+        'arch': project.arch,
+        'factory': project.factory,
+        'simos': project.simos,
+        'engines': project.engines,
+    }
+    for name, engine in project.engines._active_plugins.items():
+        shared['engine_' + name] = engine
+    return shared
+
+
+def _shared_object(name):
+    """
+    Stand-in for a shared object in a pickle. It is resolved to the object of the unpickling process by
+    _SharedObjectUnpickler, and never actually called.
+    """
+    raise AngrExplorationTechniqueError("Shared object %s can only be loaded by a process pool unpickler" % name)
+
+
+class _SharedObjectPickler(pickle.Pickler):
+    def __init__(self, file, shared):
+        super(_SharedObjectPickler, self).__init__(file, pickle.HIGHEST_PROTOCOL)
+        self._shared_ids = {id(obj): name for name, obj in shared.items()}
+
+        # dispatching on the type happens natively, so objects of other types cost nothing extra. this matters since
+        # states contain hundreds of thousands of objects
+        self.dispatch_table = copyreg.dispatch_table.copy()
+        for obj in shared.values():
+            self.dispatch_table[type(obj)] = self._reduce_shared
+
+    def _reduce_shared(self, obj):
+        name = self._shared_ids.get(id(obj), None)
+        if name is None:
+            return obj.__reduce_ex__(pickle.HIGHEST_PROTOCOL)
+        return _shared_object, (name,)
+
+
+class _SharedObjectUnpickler(pickle.Unpickler):
+    def __init__(self, file, shared):
+        super(_SharedObjectUnpickler, self).__init__(file)
+        self._shared = shared
+
+    def find_class(self, module, name):
+        if module == __name__ and name == '_shared_object':
+            return self._shared.__getitem__
+        return super(_SharedObjectUnpickler, self).find_class(module, name)
+
+
+def _dumps(obj, shared):
+    f = io.BytesIO()
+    _SharedObjectPickler(f, shared).dump(obj)
+    return f.getvalue()
+
+
+def _loads(data, shared):
+    return _SharedObjectUnpickler(io.BytesIO(data), shared).load()
+
+
+def _worker_init(project):
+    global _worker_project, _worker_shared  # pylint:disable=global-statement
+    _worker_project = project
+    _worker_shared = _shared_objects(project)
+
+
+def _worker_successors(job):
+    """
+    Step a chunk of states in a worker process.
+
+    :param tuple job:   A tuple of the chunk index and the serialized (states, run_args) pair.
+    :return:            A tuple of the chunk index and the serialized list of results. Each result is either a
+                        SimSuccessors instance or the exception that was raised while stepping the state.
+    """
+    idx, data = job
+    states, run_args = _loads(data, _worker_shared)
+
+    results = [ ]
+    for state in states:
+        try:
+            results.append(_worker_project.factory.successors(state, **run_args))
+        except Exception as ex:  # pylint:disable=broad-except
+            # exceptions are re-raised in the parent process, where the resilience of the simgr decides what to do
+            results.append(ex)
+
+    try:
+        return idx, _dumps(results, _worker_shared)
+    except (pickle.PicklingError, TypeError, AttributeError) as ex:
+        # at least tell the parent process what went wrong
+        err = AngrExplorationTechniqueError("Failed to serialize stepping results in a worker process: %s" % ex)
+        return idx, _dumps([ err ] * len(states), _worker_shared)
+
+
+class ProcessPool(ExplorationTechnique):
+    """
+    Enable multiprocessing.
+
+    States of the stepped stash are shipped to a pool of worker processes, each holding its own copy of the project,
+    which compute their successors in parallel. Unlike the Threading technique, this also parallelizes the time spent
+    inside the engines (VEX interpretation, SimProcedures), which is bound by python's GIL.
+
+    The filters and selectors (including those of other techniques) are applied before anything is shipped, so states
+    that are not going to be stepped never are. Successors are streamed back as soon as each chunk of states is done,
+    and categorized in the parent process by the normal stepping procedure, so the step_state hooks of other techniques
+    still apply. The project-level objects (the project itself, its loader, arch and engines) are never serialized with
+    the states.
+
+    Note that the states, the keyword arguments to step and the results must be picklable. Stepping with a custom
+    successor_func is not parallelized. The worker processes live until close() is called, or until the end of a with
+    block that the technique is used in::
+
+        with simgr.use_technique(ProcessPool()):
+            simgr.run()
+    """
+
+    # keyword arguments of SimulationManager.step that are not passed to the engines
+    _step_args = ('selector_func', 'step_func', 'successor_func', 'filter_func', 'n', 'until')
+
+    def __init__(self, workers=None, chunk_size=None, min_states=2, start_method=None):
+        """
+        :param int workers:         Number of worker processes. Defaults to the number of CPUs.
+        :param int chunk_size:      Number of states to ship to a worker at once. By default the stash is divided evenly
+                                    among the workers.
+        :param int min_states:      Stashes with fewer states than this are stepped in the current process, since
+                                    shipping them around would cost more than it saves.
+        :param str start_method:    The multiprocessing start method to use ('fork', 'spawn' or 'forkserver'). With
+                                    'fork' the project is inherited by the workers instead of being pickled.
+        """
+        super(ProcessPool, self).__init__()
+        self.workers = workers if workers is not None else multiprocessing.cpu_count()
+        self.chunk_size = chunk_size
+        self.min_states = min_states
+        self.start_method = start_method
+
+        self._pool = None
+        self._shared = None
+        self._filtered = { }
+        self._selected = { }
+        self._precomputed = { }
+
+    def setup(self, simgr):
+        self._shared = _shared_objects(self.project)
+        ctx = multiprocessing.get_context(self.start_method)
+        self._pool = ctx.Pool(processes=self.workers, initializer=_worker_init, initargs=(self.project,))
+
+    def close(self):
+        """
+        Shut down the worker processes. The technique may not be used after this.
+        """
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def step(self, simgr, stash='active', **kwargs):
+        states = simgr.stashes[stash]
+        if self._pool is None or kwargs.get('successor_func', None) is not None or len(states) < self.min_states:
+            return simgr.step(stash=stash, **kwargs)
+
+        # decide which states are going to be stepped before stepping anything. the filters and selectors of all
+        # techniques are asked only once, and the normal stepping procedure is handed their verdicts below
+        to_step = [ ]
+        for state in states:
+            goto = simgr.filter(state, filter_func=kwargs.get('filter_func', None))
+            self._filtered[id(state)] = goto
+            if isinstance(goto, tuple):
+                goto, state = goto
+            if goto not in (None, stash):
+                continue
+
+            selected = simgr.selector(state, selector_func=kwargs.get('selector_func', None))
+            self._selected[id(state)] = selected
+            if selected:
+                to_step.append(state)
+
+        try:
+            if len(to_step) >= self.min_states:
+                run_args = { k: v for k, v in kwargs.items() if k not in self._step_args }
+                run_key = self._freeze(run_args)
+                chunk_size = self.chunk_size or -(-len(to_step) // self.workers)
+                chunks = [ to_step[i:i + chunk_size] for i in range(0, len(to_step), chunk_size) ]
+
+                for idx, data in self._pool.imap_unordered(_worker_successors, list(self._jobs(chunks, run_args))):
+                    for state, result in zip(chunks[idx], _loads(data, self._shared)):
+                        self._precomputed[(id(state), run_key)] = self._adopt(state, result)
+
+            # let the normal stepping procedure categorize everything
+            return simgr.step(stash=stash, **kwargs)
+        finally:
+            self._filtered = { }
+            self._selected = { }
+            self._precomputed = { }
+
+    def filter(self, simgr, state, **kwargs):
+        if id(state) in self._filtered:
+            return self._filtered.pop(id(state))
+        return simgr.filter(state, **kwargs)
+
+    def selector(self, simgr, state, **kwargs):
+        if id(state) in self._selected:
+            return self._selected.pop(id(state))
+        return simgr.selector(state, **kwargs)
+
+    def successors(self, simgr, state, **kwargs):
+        run_args = { k: v for k, v in kwargs.items() if k != 'successor_func' }
+        result = self._precomputed.pop((id(state), self._freeze(run_args)), None)
+        if result is None:
+            return simgr.successors(state, **kwargs)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    #
+    # Private methods
+    #
+
+    def _jobs(self, chunks, run_args):
+        for idx, chunk in enumerate(chunks):
+            # cut the history of each state before shipping it. workers do not need the ancestry, and the parent
+            # process reattaches the successors to the original history objects
+            parents = [ s.history.parent for s in chunk ]
+            try:
+                for s in chunk:
+                    s.history.parent = None
+                data = _dumps((chunk, run_args), self._shared)
+            finally:
+                for s, parent in zip(chunk, parents):
+                    s.history.parent = parent
+            yield idx, data
+
+    @staticmethod
+    def _freeze(run_args):
+        """
+        Turn the keyword arguments to the engines into a key for the results computed with them. Values that are not
+        plain constants are compared by identity, as they are passed down unchanged from the step() they came from.
+        """
+        return tuple(sorted((k, v if isinstance(v, (int, str, bytes, type(None))) else ('id', id(v)))
+                            for k, v in run_args.items()))
+
+    @staticmethod
+    def _adopt(state, result):
+        """
+        Link the successors computed by a worker back to the state they were computed from.
+        """
+        if isinstance(result, Exception):
+            return result
+
+        result.initial_state = state
+        for succ in itertools.chain(result.all_successors, result.flat_successors, result.unsat_successors,
+                                    result.unconstrained_successors):
+            # the successor history was a child of the shipped copy of the state history
+            if succ.history is not state.history:
+                succ.history.parent = state.history
+            # solver query caches are never shipped, so successors share the cache of their state again
+            succ.solver.query_cache = state.solver.query_cache
+        return result
+
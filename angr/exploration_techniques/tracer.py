@@ -1,8 +1,11 @@
 import angr
 from typing import List
+import array
+import bisect
 import logging
 
 from . import ExplorationTechnique
+from .compact_trace import CompactTrace
 from .. import BP_BEFORE, BP_AFTER, sim_options
 from ..errors import AngrTracerError
 
@@ -18,12 +21,17 @@ class Tracer(ExplorationTechnique):
     If the given concrete input makes the program crash, you should provide crash_addr, and the
     crashing state will be found in the 'crashed' stash.
 
-    :param trace:               The basic block trace.
+    :param trace:               The basic block trace, as a list of addresses, or the path of a trace file written by
+                                CompactTrace.write().
     :param resiliency:          Should we continue to step forward even if qemu and angr disagree?
     :param keep_predecessors:   Number of states before the final state we should log.
     :param crash_addr:          If the trace resulted in a crash, provide the crashing instruction
                                 pointer here, and the 'crashed' stash will be populated with the
                                 crashing state.
+    :param unicorn_trace_slice: When stepping a state in unicorn, hand up to this many upcoming trace entries to the
+                                native unicorn engine, which checks each executed block against them and stops as soon
+                                as execution leaves the trace. The blocks are then not compared again in Python.
+                                None or 0 disables it.
 
     :ivar predecessors:         A list of states in the history before the final state.
     """
@@ -32,15 +40,24 @@ class Tracer(ExplorationTechnique):
             trace=None,
             resiliency=False,
             keep_predecessors=1,
-            crash_addr=None):
+            crash_addr=None,
+            unicorn_trace_slice=None):
         super(Tracer, self).__init__()
+        if isinstance(trace, str):
+            trace = CompactTrace(trace)
         self._trace = trace
         self._resiliency = resiliency
         self._crash_addr = crash_addr
+        self._unicorn_trace_slice = unicorn_trace_slice
 
         self._aslr_slides = {}
         self._current_slide = None
 
+        # address ranges of all loaded objects, sorted by their start addresses
+        self._object_starts = None
+        self._object_ends = None
+        self._objects = None
+
         # keep track of the last basic block we hit
         self.predecessors = [None] * keep_predecessors # type: List[angr.SimState]
         self.last_state = None
@@ -57,6 +74,11 @@ class Tracer(ExplorationTechnique):
         if len(simgr.active) != 1:
             raise AngrTracerError("Tracer is being invoked on a SimulationManager without exactly one active state")
 
+        objects = sorted(self.project.loader.all_objects, key=lambda o: o.min_addr)
+        self._object_starts = array.array('Q', (o.min_addr for o in objects))
+        self._object_ends = array.array('Q', (o.max_addr + 1 for o in objects))
+        self._objects = objects
+
         # calc ASLR slide for main binary and find the entry point in one fell swoop
         # ...via heuristics
         for idx, addr in enumerate(self._trace):
@@ -107,10 +129,16 @@ class Tracer(ExplorationTechnique):
         self.predecessors.append(state)
         self.predecessors.pop(0)
 
+        # let unicorn check the upcoming part of the trace natively
+        if sim_options.UNICORN in state.options:
+            state.unicorn.expected_bbls = self._expected_unicorn_bbls(state)
+
         # perform the step. ask qemu to stop at the termination point.
         stops = set(kwargs.pop('extra_stop_points', ())) | {self._trace[-1]}
         succs_dict = simgr.step_state(state, extra_stop_points=stops, **kwargs)
         succs = succs_dict[None]
+        if sim_options.UNICORN in state.options:
+            state.unicorn.expected_bbls = None
 
         # follow the trace
         if len(succs) == 1:
@@ -159,14 +187,18 @@ class Tracer(ExplorationTechnique):
             if sync is not None:
                 raise Exception("TODO")
 
-            for addr in state.history.recent_bbl_addrs:
-                if addr == state.unicorn.transmit_addr:
-                    continue
+            if state.has_plugin('unicorn') and state.unicorn.expected_bbl_count is not None:
+                # unicorn has already checked these blocks against the trace
+                idx += state.unicorn.expected_bbl_count
+            else:
+                for addr in state.history.recent_bbl_addrs:
+                    if addr == state.unicorn.transmit_addr:
+                        continue
 
-                if self._compare_addr(self._trace[idx], addr):
-                    idx += 1
-                else:
-                    raise Exception('BUG! Please investivate the claim in the comment above me')
+                    if self._compare_addr(self._trace[idx], addr):
+                        idx += 1
+                    else:
+                        raise Exception('BUG! Please investivate the claim in the comment above me')
 
             idx -= 1 # use normal code to do the last synchronization
 
@@ -187,7 +219,7 @@ class Tracer(ExplorationTechnique):
                 raise Exception("Extremely bad news: we're executing an unhooked address in the externs space")
             if proc.is_continuation:
                 orig_addr = self.project.loader.find_symbol(proc.display_name).rebased_addr
-                orig_trace_addr = orig_addr + self._aslr_slides[self.project.loader.find_object_containing(orig_addr)]
+                orig_trace_addr = orig_addr + self._aslr_slides[self._object_containing(orig_addr)]
                 if 0 <= self._trace[idx + 1] - orig_trace_addr <= 0x10000:
                     # this is fine. we do nothing and then next round it'll get handled by the is_hooked(state.history.addr) case
                     pass
@@ -218,7 +250,7 @@ class Tracer(ExplorationTechnique):
         if self._current_slide is not None and trace_addr == state_addr + self._current_slide:
             return True
 
-        current_bin = self.project.loader.find_object_containing(state_addr)
+        current_bin = self._object_containing(state_addr)
         if current_bin is self.project.loader._extern_object or current_bin is self.project.loader._kernel_object:
             return False
         elif current_bin in self._aslr_slides:
@@ -231,9 +263,56 @@ class Tracer(ExplorationTechnique):
             else:
                 raise AngrTracerError("Trace desynced on jumping into %s. Did you load the right version of this library?" % current_bin.provides)
 
+    def _expected_unicorn_bbls(self, state):
+        """
+        Translate the upcoming part of the trace into angr addresses, so that unicorn can follow it.
+
+        The slice ends before the first trace entry that lives in an object whose ASLR slide is not known yet, or in
+        the externs or the kernel object. Python code has to look at those blocks.
+
+        :param state:   The state that is about to be stepped.
+        :return:        A list of addresses, starting at the address of the state, or None.
+        """
+
+        if not self._unicorn_trace_slice or state.globals['sync_idx'] is not None:
+            return None
+
+        idx = state.globals['trace_idx']
+        if self._current_slide is None or self._trace[idx] != state.addr + self._current_slide:
+            return None
+
+        # address ranges of all objects with a known slide, in trace addresses
+        ranges = [ ]
+        for obj, slide in self._aslr_slides.items():
+            if obj is self.project.loader._extern_object or obj is self.project.loader._kernel_object:
+                continue
+            ranges.append((obj.min_addr + slide, obj.max_addr + 1 + slide, slide))
+
+        expected = [ ]
+        lo, hi, slide = 0, 0, 0
+        for trace_addr in self._trace[idx:idx + self._unicorn_trace_slice]:
+            if not lo <= trace_addr < hi:
+                for lo, hi, slide in ranges:
+                    if lo <= trace_addr < hi:
+                        break
+                else:
+                    break
+            expected.append(trace_addr - slide)
+
+        return expected if len(expected) > 1 else None
+
+    def _object_containing(self, addr):
+        """
+        Find the loaded object containing an address, by bisecting the address ranges of all objects.
+        """
+        i = bisect.bisect_right(self._object_starts, addr) - 1
+        if i >= 0 and addr < self._object_ends[i]:
+            return self._objects[i]
+        return self.project.loader.find_object_containing(addr)
+
     def _analyze_misfollow(self, state, idx):
         angr_addr = state.addr
-        obj = self.project.loader.find_object_containing(angr_addr)
+        obj = self._object_containing(angr_addr)
         if obj not in self._aslr_slides: # this SHOULD be an invariant given the way _compare_addrs works
             raise Exception("BUG: misfollow analysis initiated when jumping into a new object")
 
@@ -265,7 +344,7 @@ class Tracer(ExplorationTechnique):
                     return True
 
         prev_addr = state.history.bbl_addrs[-1]
-        prev_obj = self.project.loader.find_object_containing(prev_addr)
+        prev_obj = self._object_containing(prev_addr)
 
         if state.block(prev_addr).vex.jumpkind == 'Ijk_Call':
             l.info('...trying to sync at callsite')
@@ -296,7 +375,7 @@ class Tracer(ExplorationTechnique):
 
     def _fast_forward(self, state):
         target_addr = state.addr
-        target_obj = self.project.loader.find_object_containing(target_addr)
+        target_obj = self._object_containing(target_addr)
         if target_obj not in self._aslr_slides:
             # if you see this message, consider implementing the find-entry-point hack for this, since if we're coming
             # out of a hook and get a cache miss like this the jump between objects is probably happening in the final
@@ -1,6 +1,7 @@
 """Representing the artifacts of a project."""
 
 from .knowledge_plugins.plugin import default_plugins
+from .knowledge_plugins.snapshot import KnowledgeBaseSnapshot
 
 
 class KnowledgeBase(object):
@@ -13,6 +14,10 @@ class KnowledgeBase(object):
         self.obj = obj
         self._plugins = {}
 
+        # the snapshot this knowledge base is loaded from, and the names of plugins that are not loaded from it yet
+        self._snapshot = None
+        self._snapshot_plugins = set()
+
     @property
     def callgraph(self):
         return self.functions.callgraph
@@ -29,8 +34,11 @@ class KnowledgeBase(object):
         self._project = state['project']
         self.obj = state['obj']
         self._plugins = state['plugins']
+        self._snapshot = None
+        self._snapshot_plugins = set()
 
     def __getstate__(self):
+        self._load_snapshot_plugins()
         s = {
             'project': self._project,
             'obj': self.obj,
@@ -38,12 +46,50 @@ class KnowledgeBase(object):
         }
         return s
 
+    #
+    # Snapshots
+    #
+
+    def save_snapshot(self, path):
+        """
+        Write a compact snapshot of this knowledge base to a file, which can be loaded by load_snapshot() much faster
+        than unpickling a knowledge base.
+
+        :param str path:    Path of the snapshot file.
+        :return:            None
+        """
+
+        self._load_snapshot_plugins()
+        KnowledgeBaseSnapshot.write(self, path)
+
+    @classmethod
+    def load_snapshot(cls, project, path, obj=None):
+        """
+        Load a knowledge base from a snapshot written by save_snapshot(). The snapshot is memory-mapped: plugins are
+        loaded when they are first accessed, and functions are materialized when they are accessed.
+
+        :param angr.Project project:    The project the knowledge base belongs to.
+        :param str path:                Path of the snapshot file.
+        :param obj:                     The object the knowledge base is about. Defaults to the main object.
+        :return:                        The knowledge base.
+        :rtype:                         KnowledgeBase
+        """
+
+        kb = cls(project, obj if obj is not None else project.loader.main_object)
+        kb._snapshot = KnowledgeBaseSnapshot(path)
+        kb._snapshot_plugins = set(kb._snapshot.plugins)
+        return kb
+
+    def _load_snapshot_plugins(self):
+        for name in list(self._snapshot_plugins):
+            self.get_plugin(name)
+
     #
     # Plugin accessor
     #
 
     def __contains__(self, plugin_name):
-        return plugin_name in self._plugins
+        return self.has_plugin(plugin_name)
 
     def __getattr__(self, v):
         try:
@@ -56,19 +102,24 @@ class KnowledgeBase(object):
     #
 
     def has_plugin(self, name):
-        return name in self._plugins
+        return name in self._plugins or name in self._snapshot_plugins
 
     def get_plugin(self, name):
         if name not in self._plugins:
-            p = default_plugins[name](self)
+            if name in self._snapshot_plugins:
+                p = self._snapshot.load_plugin(self, name)
+            else:
+                p = default_plugins[name](self)
             self.register_plugin(name, p)
             return p
         return self._plugins[name]
 
     def register_plugin(self, name, plugin):
+        self._snapshot_plugins.discard(name)
         self._plugins[name] = plugin
         return plugin
 
     def release_plugin(self, name):
+        self._snapshot_plugins.discard(name)
         if name in self._plugins:
             del self._plugins[name]
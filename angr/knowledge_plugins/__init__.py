@@ -6,3 +6,4 @@ from .data import Data
 from .indirect_jumps import IndirectJumps
 from .labels import Labels
 from .plugin import KnowledgeBasePlugin
+from .snapshot import KnowledgeBaseSnapshot
@@ -57,9 +57,12 @@ class FunctionManager(KnowledgeBasePlugin, collections.Mapping):
         super(FunctionManager, self).__init__()
         self._kb = kb
         self._function_map = FunctionDict(self)
-        self.callgraph = networkx.MultiDiGraph()
+        self._callgraph = networkx.MultiDiGraph()
         self.block_map = {}
 
+        # the KnowledgeBaseSnapshot this function manager is loaded from, if any
+        self._snapshot = None
+
         # Registers used for passing arguments around
         self._arg_registers = kb._project.arch.argument_registers
 
@@ -71,6 +74,31 @@ class FunctionManager(KnowledgeBasePlugin, collections.Mapping):
 
         return fm
 
+    def __getstate__(self):
+        s = dict(self.__dict__)
+        # snapshots are memory-mapped files, which cannot be pickled
+        s['_callgraph'] = self.callgraph
+        s['_snapshot'] = None
+        return s
+
+    def __setstate__(self, s):
+        if 'callgraph' in s:
+            # pickled before the call graph could be loaded lazily
+            s['_callgraph'] = s.pop('callgraph')
+        s.setdefault('_snapshot', None)
+        self.__dict__.update(s)
+
+    @property
+    def callgraph(self):
+        if self._callgraph is None:
+            # the call graph is built from the snapshot on first access
+            self._callgraph = self._snapshot.load_callgraph(self._kb)
+        return self._callgraph
+
+    @callgraph.setter
+    def callgraph(self, v):
+        self._callgraph = v
+
     def clear(self):
         self._function_map.clear()
         self.callgraph = networkx.MultiDiGraph()
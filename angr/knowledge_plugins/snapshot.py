@@ -0,0 +1,672 @@
+import io
+import sys
+import mmap
+import heapq
+import array
+import bisect
+import pickle
+import copyreg
+import struct
+
+import networkx
+
+from .functions import Function
+from .functions.function_manager import FunctionDict, FunctionManager
+
+import logging
+l = logging.getLogger("angr.knowledge_plugins.snapshot")
+
+
+# kinds of nodes in function transition graphs
+_NODE_BLOCK = 0
+_NODE_HOOK = 1
+_NODE_FUNCTION = 2
+
+# bits of the function flags column
+_FLAG_SYSCALL = 1
+_FLAG_PLT = 2
+_FLAG_SIMPROCEDURE = 4
+_FLAG_RETURNING_KNOWN = 8
+_FLAG_RETURNING = 16
+
+# Function attributes that are stored as they are
+_FUNCTION_EXTRA_ATTRS = ('normalized', '_argument_registers', '_argument_stack_variables', 'bp_on_stack',
+                         'retaddr_on_stack', 'sp_delta', 'calling_convention', 'prototype', 'prepared_registers',
+                         'prepared_stack_variables', 'registers_read_afterwards', 'info', 'tags',
+                         )
+
+
+class _SnapshotFunction(Function):
+    """
+    A Function that is loaded from a knowledge base snapshot. Only the attributes that are stored in the columns of the
+    snapshot are set when it is created. The rest of the function is loaded the first time any other attribute is
+    accessed or set.
+    """
+
+    __slots__ = ('_body_loader', )
+
+    # attributes that are set when the function is created
+    _SHELL_ATTRS = frozenset(('addr', '_function_manager', '_project', '_name', 'binary_name', 'is_syscall', 'is_plt',
+                              'is_simprocedure', '_returning', '_body_loader'))
+
+    def __getattr__(self, attr):
+        # only called for attributes that are not set yet
+        if attr == '_body_loader' or self._body_loader is None:
+            raise AttributeError(attr)
+        self._load_body()
+        return getattr(self, attr)
+
+    def __setattr__(self, attr, value):
+        if attr not in self._SHELL_ATTRS and self._body_loader is not None:
+            self._load_body()
+        super(_SnapshotFunction, self).__setattr__(attr, value)
+
+    def __reduce_ex__(self, protocol):
+        # the snapshot cannot be pickled, so this is pickled as a plain Function
+        self._load_body()
+        state = dict((attr, getattr(self, attr)) for attr in Function.__slots__)
+        return copyreg.__newobj__, (Function, ), (None, state)
+
+    def _load_body(self):
+        loader = self._body_loader
+        if loader is not None:
+            self._body_loader = None
+            loader(self)
+
+
+class _SnapshotPickler(pickle.Pickler):
+    """
+    Pickles objects of a knowledge base, referring to the knowledge base itself and to its project by name.
+    """
+    def __init__(self, file, kb):
+        super(_SnapshotPickler, self).__init__(file, pickle.HIGHEST_PROTOCOL)
+        self._kb = kb
+
+    def persistent_id(self, obj):  # pylint:disable=method-hidden
+        if obj is self._kb:
+            return 'kb'
+        if obj is self._kb._project:
+            return 'project'
+        return None
+
+
+class _SnapshotUnpickler(pickle.Unpickler):
+    def __init__(self, file, kb):
+        super(_SnapshotUnpickler, self).__init__(file)
+        self._kb = kb
+
+    def persistent_load(self, pid):  # pylint:disable=method-hidden
+        if pid == 'kb':
+            return self._kb
+        if pid == 'project':
+            return self._kb._project
+        raise pickle.UnpicklingError("Unknown persistent id %s" % pid)
+
+
+class KnowledgeBaseSnapshot(object):
+    """
+    A compact, read-only snapshot of a knowledge base on disk.
+
+    Functions are stored column by column: sorted function addresses, names, flags, and one serialized body (blocks,
+    transition graph, endpoints, and everything else) per function. Snapshots are memory-mapped when they are loaded, so
+    that only the columns are touched until a function is accessed, and pages are shared among all processes that load
+    the same snapshot. The call graph is stored as columns of edges as well, and built on first access. All other
+    plugins (labels, indirect jumps, comments, ...) are stored as serialized blobs, and loaded when they are first
+    accessed.
+
+    Snapshots are written by KnowledgeBase.save_snapshot() and loaded by KnowledgeBase.load_snapshot().
+    """
+
+    MAGIC = b'ANGRKBS\x00'
+    # bump this whenever the layout of snapshots changes
+    FORMAT_VERSION = 1
+
+    _HEADER = struct.Struct('<8sQQQ')
+
+    def __init__(self, path):
+        """
+        :param str path:    Path to the snapshot file.
+        """
+        self.path = path
+
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+
+        if len(self._mmap) < self._HEADER.size:
+            raise AngrKnowledgeBaseError("%s is not a knowledge base snapshot" % path)
+        magic, version, toc_offset, toc_size = self._HEADER.unpack_from(self._mmap, 0)
+        if magic != self.MAGIC:
+            raise AngrKnowledgeBaseError("%s is not a knowledge base snapshot" % path)
+        if version != self.FORMAT_VERSION:
+            raise AngrKnowledgeBaseError("Unsupported knowledge base snapshot version %d" % version)
+
+        toc = pickle.loads(self._view[toc_offset:toc_offset + toc_size])
+        if toc['byteorder'] != sys.byteorder:
+            raise AngrKnowledgeBaseError("The snapshot was written on a machine with a different byte order")
+        self._sections = toc['sections']
+        self.plugins = toc['plugins']
+
+        if 'functions' in self.plugins:
+            self._func_addrs = self._column('functions.addrs', 'Q')
+            self._func_name_offsets = self._column('functions.name_offsets', 'Q')
+            self._func_names = self._section('functions.names')
+            self._func_flags = self._column('functions.flags', 'B')
+            self._func_binary_names = self._column('functions.binary_names', 'i')
+            self._func_body_offsets = self._column('functions.body_offsets', 'Q')
+            self._func_bodies = self._section('functions.bodies')
+            self._binary_names = pickle.loads(self._section('functions.binary_name_table'))
+        else:
+            self._func_addrs = [ ]
+
+    #
+    # Writing
+    #
+
+    @classmethod
+    def write(cls, kb, path):
+        """
+        Write a snapshot of a knowledge base. All plugins of the knowledge base must be loaded.
+
+        :param angr.KnowledgeBase kb:   The knowledge base.
+        :param str path:                Path of the snapshot file.
+        :return:                        None
+        """
+
+        sections = { }
+        plugins = [ ]
+
+        for name, plugin in kb._plugins.items():
+            if name == 'functions':
+                cls._write_functions(kb, plugin, sections)
+            else:
+                try:
+                    sections['plugin.' + name] = cls._dumps(plugin, kb)
+                except (pickle.PicklingError, TypeError, AttributeError):
+                    l.warning("Cannot serialize the knowledge base plugin %s. It is not included in the snapshot.",
+                              name, exc_info=True)
+                    continue
+            plugins.append(name)
+
+        with open(path, 'wb') as f:
+            f.write(b'\x00' * cls._HEADER.size)
+
+            toc = {'byteorder': sys.byteorder, 'sections': { }, 'plugins': plugins}
+            for name, data in sections.items():
+                # align all sections, so that columns can be accessed in place
+                offset = f.tell()
+                if offset % 8:
+                    f.write(b'\x00' * (8 - offset % 8))
+                    offset = f.tell()
+                f.write(data)
+                toc['sections'][name] = (offset, len(data))
+
+            toc_data = pickle.dumps(toc, pickle.HIGHEST_PROTOCOL)
+            toc_offset = f.tell()
+            f.write(toc_data)
+
+            f.seek(0)
+            f.write(cls._HEADER.pack(cls.MAGIC, cls.FORMAT_VERSION, toc_offset, len(toc_data)))
+
+    @classmethod
+    def _write_functions(cls, kb, function_manager, sections):
+
+        addrs = array.array('Q')
+        name_offsets = array.array('Q', [ 0 ])
+        names = bytearray()
+        flags = array.array('B')
+        binary_names = array.array('i')
+        binary_name_table = [ ]
+        binary_name_ids = { }
+        body_offsets = array.array('Q', [ 0 ])
+        bodies = bytearray()
+
+        for addr in function_manager:
+            func = function_manager.get_by_addr(addr)
+
+            addrs.append(addr)
+
+            names += func.name.encode('utf-8')
+            name_offsets.append(len(names))
+
+            flags.append(cls._function_flags(func))
+
+            if func.binary_name is None:
+                binary_names.append(-1)
+            else:
+                if func.binary_name not in binary_name_ids:
+                    binary_name_ids[func.binary_name] = len(binary_name_table)
+                    binary_name_table.append(func.binary_name)
+                binary_names.append(binary_name_ids[func.binary_name])
+
+            bodies += cls._dumps(cls._function_body(func), kb)
+            body_offsets.append(len(bodies))
+
+        sections['functions.addrs'] = addrs.tobytes()
+        sections['functions.name_offsets'] = name_offsets.tobytes()
+        sections['functions.names'] = bytes(names)
+        sections['functions.flags'] = flags.tobytes()
+        sections['functions.binary_names'] = binary_names.tobytes()
+        sections['functions.binary_name_table'] = pickle.dumps(binary_name_table, pickle.HIGHEST_PROTOCOL)
+        sections['functions.body_offsets'] = body_offsets.tobytes()
+        sections['functions.bodies'] = bytes(bodies)
+        sections['functions.block_map'] = cls._dumps(function_manager.block_map, kb)
+
+        # the call graph
+        callgraph = function_manager.callgraph
+        try:
+            nodes = array.array('Q', callgraph.nodes())
+            srcs = array.array('Q')
+            dsts = array.array('Q')
+            data_ids = array.array('I')
+            data_table = [ ]
+            data_table_ids = { }
+            for src, dst, data in callgraph.edges(data=True):
+                srcs.append(src)
+                dsts.append(dst)
+                data_key = tuple(sorted(data.items()))
+                if data_key not in data_table_ids:
+                    data_table_ids[data_key] = len(data_table)
+                    data_table.append(data)
+                data_ids.append(data_table_ids[data_key])
+        except (TypeError, OverflowError):
+            # there are nodes that are not addresses
+            sections['callgraph.graph'] = cls._dumps(callgraph, kb)
+        else:
+            sections['callgraph.nodes'] = nodes.tobytes()
+            sections['callgraph.srcs'] = srcs.tobytes()
+            sections['callgraph.dsts'] = dsts.tobytes()
+            sections['callgraph.data_ids'] = data_ids.tobytes()
+            sections['callgraph.data_table'] = pickle.dumps(data_table, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _function_flags(func):
+        flags = 0
+        if func.is_syscall:
+            flags |= _FLAG_SYSCALL
+        if func.is_plt:
+            flags |= _FLAG_PLT
+        if func.is_simprocedure:
+            flags |= _FLAG_SIMPROCEDURE
+        if func.returning is not None:
+            flags |= _FLAG_RETURNING_KNOWN
+            if func.returning:
+                flags |= _FLAG_RETURNING
+        return flags
+
+    @staticmethod
+    def _function_body(func):
+        """
+        Convert everything of a function except the attributes stored in columns into plain data. Nodes are replaced by
+        their indices in a list of node descriptions.
+        """
+
+        nodes = [ ]
+        node_ids = { }
+
+        def _id(node):
+            try:
+                return node_ids[node]
+            except KeyError:
+                pass
+
+            if isinstance(node, Function):
+                desc = (_NODE_FUNCTION, node.addr, node.name)
+            elif isinstance(node, HookNode):
+                sim_procedure = node.sim_procedure
+                if sim_procedure is None or isinstance(sim_procedure, (str, type)):
+                    desc = (_NODE_HOOK, node.addr, node.size, sim_procedure, False)
+                else:
+                    # SimProcedure instances are taken from the hooks of the project that loads the snapshot
+                    desc = (_NODE_HOOK, node.addr, node.size, type(sim_procedure), True)
+            else:
+                desc = (_NODE_BLOCK, node.addr, node.size, node.bytestr, node.thumb)
+
+            node_ids[node] = len(nodes)
+            nodes.append(desc)
+            return node_ids[node]
+
+        graph_nodes = [ _id(node) for node in func.transition_graph.nodes() ]
+        graph_edges = [ (_id(src), _id(dst), data) for src, dst, data in func.transition_graph.edges(data=True) ]
+
+        return (
+            nodes,
+            graph_nodes,
+            graph_edges,
+            [ (addr, _id(node)) for addr, node in func._local_blocks.items() ],
+            [ (addr, _id(node)) for addr, node in func._addr_to_block_node.items() ],
+            dict(func._block_sizes),
+            _id(func.startpoint) if func.startpoint is not None else None,
+            [ _id(node) for node in func._ret_sites ],
+            [ _id(node) for node in func._jumpout_sites ],
+            [ _id(node) for node in func._callout_sites ],
+            [ _id(node) for node in func._retout_sites ],
+            dict((sort, [ _id(node) for node in endpoints ]) for sort, endpoints in func._endpoints.items()),
+            dict(func._call_sites),
+            dict((attr, getattr(func, attr)) for attr in _FUNCTION_EXTRA_ATTRS),
+        )
+
+    @staticmethod
+    def _dumps(obj, kb):
+        f = io.BytesIO()
+        _SnapshotPickler(f, kb).dump(obj)
+        return f.getvalue()
+
+    #
+    # Loading
+    #
+
+    def _section(self, name):
+        offset, size = self._sections[name]
+        return self._view[offset:offset + size]
+
+    def _column(self, name, typecode):
+        return self._section(name).cast(typecode)
+
+    def _loads(self, data, kb):
+        return _SnapshotUnpickler(io.BytesIO(data), kb).load()
+
+    def load_plugin(self, kb, name):
+        """
+        Load a plugin from the snapshot.
+
+        :param angr.KnowledgeBase kb:   The knowledge base to load the plugin into.
+        :param str name:                Name of the plugin.
+        :return:                        The plugin.
+        """
+
+        if name not in self.plugins:
+            raise KeyError(name)
+
+        if name == 'functions':
+            fm = FunctionManager(kb)
+            fm._function_map = SnapshotFunctionDict(fm, self)
+            fm.block_map = self._loads(self._section('functions.block_map'), kb)
+            fm._callgraph = None
+            fm._snapshot = self
+            return fm
+
+        return self._loads(self._section('plugin.' + name), kb)
+
+    def load_callgraph(self, kb):
+        """
+        Build the call graph stored in the snapshot.
+
+        :param angr.KnowledgeBase kb:   The knowledge base that the call graph belongs to.
+        :return:                        The call graph.
+        :rtype:                         networkx.MultiDiGraph
+        """
+
+        if 'callgraph.graph' in self._sections:
+            return self._loads(self._section('callgraph.graph'), kb)
+
+        data_table = pickle.loads(self._section('callgraph.data_table'))
+        callgraph = networkx.MultiDiGraph()
+        callgraph.add_nodes_from(self._column('callgraph.nodes', 'Q'))
+        callgraph.add_edges_from((src, dst, dict(data_table[data_id])) for src, dst, data_id in
+                                 zip(self._column('callgraph.srcs', 'Q'), self._column('callgraph.dsts', 'Q'),
+                                     self._column('callgraph.data_ids', 'I')))
+        return callgraph
+
+    #
+    # Functions
+    #
+
+    def __len__(self):
+        return len(self._func_addrs)
+
+    def _function_index(self, addr):
+        idx = bisect.bisect_left(self._func_addrs, addr)
+        if idx < len(self._func_addrs) and self._func_addrs[idx] == addr:
+            return idx
+        return None
+
+    def has_function(self, addr):
+        return self._function_index(addr) is not None
+
+    def function_addrs(self):
+        """
+        All function addresses in the snapshot, sorted.
+        """
+        return self._func_addrs
+
+    def floor_function_addr(self, addr, excluded):
+        """
+        The greatest function address that is less than or equal to `addr` and not in `excluded`, or None.
+        """
+        idx = bisect.bisect_right(self._func_addrs, addr) - 1
+        while idx >= 0 and self._func_addrs[idx] in excluded:
+            idx -= 1
+        return self._func_addrs[idx] if idx >= 0 else None
+
+    def ceiling_function_addr(self, addr, excluded):
+        """
+        The least function address that is greater than or equal to `addr` and not in `excluded`, or None.
+        """
+        idx = bisect.bisect_left(self._func_addrs, addr)
+        while idx < len(self._func_addrs) and self._func_addrs[idx] in excluded:
+            idx += 1
+        return self._func_addrs[idx] if idx < len(self._func_addrs) else None
+
+    def function_shell(self, function_manager, addr, function_map):
+        """
+        Create a Function instance from the columns of the snapshot. Its blocks, transition graph and all other
+        attributes are loaded by load_function_body() when they are first accessed.
+
+        :param FunctionManager function_manager:    The function manager the function belongs to.
+        :param int addr:                            Address of the function.
+        :param SnapshotFunctionDict function_map:   The function map that callees are taken from.
+        :return:                                    The Function instance.
+        :rtype:                                     Function
+        """
+
+        idx = self._function_index(addr)
+        if idx is None:
+            raise KeyError(addr)
+
+        func = _SnapshotFunction.__new__(_SnapshotFunction)
+        func._body_loader = lambda f: self.load_function_body(f, function_map)
+        func.addr = addr
+        func._function_manager = function_manager
+        func._project = function_manager._kb._project
+
+        func._name = bytes(self._func_names[self._func_name_offsets[idx]:self._func_name_offsets[idx + 1]]).decode(
+            'utf-8')
+        binary_name = self._func_binary_names[idx]
+        func.binary_name = self._binary_names[binary_name] if binary_name >= 0 else None
+
+        flags = self._func_flags[idx]
+        func.is_syscall = bool(flags & _FLAG_SYSCALL)
+        func.is_plt = bool(flags & _FLAG_PLT)
+        func.is_simprocedure = bool(flags & _FLAG_SIMPROCEDURE)
+        func._returning = bool(flags & _FLAG_RETURNING) if flags & _FLAG_RETURNING_KNOWN else None
+
+        return func
+
+    def load_function_body(self, func, function_map):
+        """
+        Fill in the blocks, the transition graph and all other attributes of a function created by function_shell().
+        This is called the first time one of them is accessed.
+
+        :param Function func:                       The function.
+        :param SnapshotFunctionDict function_map:   The function map that callees are taken from.
+        :return:                                    None
+        """
+
+        # initialize everything that is not stored in the snapshot, then restore what is
+        shell = dict((attr, getattr(func, attr)) for attr in _SnapshotFunction._SHELL_ATTRS
+                     if attr != '_body_loader')
+        Function.__init__(func, shell['_function_manager'], func.addr, name=shell['_name'],
+                          syscall=shell['is_syscall'])
+        for attr, value in shell.items():
+            setattr(func, attr, value)
+
+        idx = self._function_index(func.addr)
+        body = self._func_bodies[self._func_body_offsets[idx]:self._func_body_offsets[idx + 1]]
+        (node_descs, graph_nodes, graph_edges, local_blocks, addr_to_block_node, block_sizes, startpoint, ret_sites,
+         jumpout_sites, callout_sites, retout_sites, endpoints, call_sites, extras) = \
+            self._loads(body, func._function_manager._kb)
+
+        nodes = [ self._load_node(desc, func.transition_graph, function_map) for desc in node_descs ]
+
+        func.transition_graph.add_nodes_from(nodes[i] for i in graph_nodes)
+        func.transition_graph.add_edges_from((nodes[src], nodes[dst], data) for src, dst, data in graph_edges)
+
+        func._local_blocks = dict((addr, nodes[i]) for addr, i in local_blocks)
+        func._local_block_addrs = set(func._local_blocks)
+        func._addr_to_block_node = dict((addr, nodes[i]) for addr, i in addr_to_block_node)
+        func._block_sizes = block_sizes
+        func.startpoint = nodes[startpoint] if startpoint is not None else None
+        func._ret_sites = set(nodes[i] for i in ret_sites)
+        func._jumpout_sites = set(nodes[i] for i in jumpout_sites)
+        func._callout_sites = set(nodes[i] for i in callout_sites)
+        func._retout_sites = set(nodes[i] for i in retout_sites)
+        for sort, ids in endpoints.items():
+            func._endpoints[sort] = set(nodes[i] for i in ids)
+        func._call_sites = call_sites
+
+        for attr, value in extras.items():
+            setattr(func, attr, value)
+
+    def _load_node(self, desc, graph, function_map):
+        kind = desc[0]
+        if kind == _NODE_FUNCTION:
+            _, addr, name = desc
+            return function_map.function_node(addr, name)
+        if kind == _NODE_HOOK:
+            _, addr, size, sim_procedure, is_instance = desc
+            if is_instance:
+                hooker = function_map._backref._kb._project.hooked_by(addr)
+                if isinstance(hooker, sim_procedure):
+                    sim_procedure = hooker
+            return HookNode(addr, size, sim_procedure, graph=graph)
+        _, addr, size, bytestr, thumb = desc
+        return BlockNode(addr, size, bytestr=bytestr, graph=graph, thumb=thumb)
+
+
+class SnapshotFunctionDict(object):
+    """
+    The function map of a FunctionManager that is loaded from a knowledge base snapshot. It behaves like a
+    FunctionDict, except that functions stored in the snapshot are only materialized when they are accessed. Functions
+    that are added afterwards are kept in memory as usual.
+    """
+
+    def __init__(self, backref, snapshot):
+        self._backref = backref
+        self._snapshot = snapshot
+        # functions that are materialized or added
+        self._functions = FunctionDict(backref)
+        # addresses of functions that are materialized, replaced, or removed, and how many of them are in the snapshot
+        self._claimed = set()
+        self._claimed_in_snapshot = 0
+
+    def _unclaimed(self, addr):
+        return addr not in self._claimed and self._snapshot.has_function(addr)
+
+    def _claim(self, addr):
+        if self._unclaimed(addr):
+            self._claimed_in_snapshot += 1
+        self._claimed.add(addr)
+
+    def _materialize(self, addr):
+        func = self._snapshot.function_shell(self._backref, addr, self)
+        self._claim(addr)
+        self._functions[addr] = func
+        return func
+
+    def function_node(self, addr, name):
+        """
+        Get the Function instance to put into the transition graph of another function. Its body is loaded when it is
+        accessed.
+
+        :param int addr:    Address of the function.
+        :param str name:    Name of the function, in case it is not in the function map.
+        :return:            The Function instance.
+        :rtype:             Function
+        """
+
+        if addr in self._functions:
+            return self._functions.get(addr)
+        if self._unclaimed(addr):
+            return self._materialize(addr)
+        # the function has been removed
+        return Function(self._backref, addr, name=name)
+
+    def __getitem__(self, addr):
+        if addr not in self._functions and self._unclaimed(addr):
+            self._materialize(addr)
+        # FunctionDict creates the function if it does not exist
+        return self._functions[addr]
+
+    def get(self, addr):
+        if addr not in self._functions and self._unclaimed(addr):
+            self._materialize(addr)
+        return self._functions.get(addr)
+
+    def __setitem__(self, addr, func):
+        self._claim(addr)
+        self._functions[addr] = func
+
+    def __delitem__(self, addr):
+        if addr in self._functions:
+            del self._functions[addr]
+        elif not self._unclaimed(addr):
+            raise KeyError(addr)
+        self._claim(addr)
+
+    def __contains__(self, addr):
+        return addr in self._functions or self._unclaimed(addr)
+
+    def __len__(self):
+        return len(self._functions) + len(self._snapshot) - self._claimed_in_snapshot
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def keys(self):
+        snapshot_addrs = (addr for addr in self._snapshot.function_addrs() if addr not in self._claimed)
+        return list(heapq.merge(self._functions.keys(), snapshot_addrs))
+
+    def values(self):
+        return [ self.get(addr) for addr in self.keys() ]
+
+    def items(self):
+        return [ (addr, self.get(addr)) for addr in self.keys() ]
+
+    def clear(self):
+        self._functions.clear()
+        self._claimed = set(self._snapshot.function_addrs())
+        self._claimed_in_snapshot = len(self._snapshot)
+
+    def copy(self):
+        return FunctionDict(self._backref, self.items())
+
+    def __reduce__(self):
+        # snapshots cannot be pickled. materialize everything instead
+        return FunctionDict, (self._backref, dict(self.items()))
+
+    def floor_addr(self, addr):
+        candidates = [ self._snapshot.floor_function_addr(addr, self._claimed) ]
+        try:
+            candidates.append(self._functions.floor_addr(addr))
+        except KeyError:
+            pass
+        candidates = [ a for a in candidates if a is not None ]
+        if not candidates:
+            raise KeyError(addr)
+        return max(candidates)
+
+    def ceiling_addr(self, addr):
+        candidates = [ self._snapshot.ceiling_function_addr(addr, self._claimed) ]
+        try:
+            candidates.append(self._functions.ceiling_addr(addr))
+        except KeyError:
+            pass
+        candidates = [ a for a in candidates if a is not None ]
+        if not candidates:
+            raise KeyError(addr)
+        return min(candidates)
+
+
+from ..codenode import BlockNode, HookNode
+from ..errors import AngrKnowledgeBaseError
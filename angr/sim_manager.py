@@ -191,6 +191,23 @@ class SimulationManager(ana.Storable):
         self._techniques.append(tech)
         return tech
 
+    def use_solver_query_cache(self, cache=None):
+        """
+        Share the answers to solver queries between all states of this SimulationManager, and all states that are
+        derived from them.
+
+        :param cache:   A SolverQueryCache to use, which may be shared with other simulation managers. By default, a new
+                        one is created.
+        :type cache:    angr.state_plugins.solver.SolverQueryCache
+        :return:        The cache, for convenience (to look at its hit rate)
+        """
+        if cache is None:
+            cache = SolverQueryCache()
+        for stash in self._stashes.values():
+            for state in stash:
+                state.solver.query_cache = cache
+        return cache
+
     def remove_technique(self, tech):
         """
         Remove an exploration technique from a list of active techniques.
@@ -809,3 +826,4 @@ from .sim_state import SimState
 from .state_hierarchy import StateHierarchy
 from .errors import AngrError, SimUnsatError, SimulationManagerError
 from .exploration_techniques import ExplorationTechnique, Veritesting, Threading, Explorer
+from .state_plugins.solver import SolverQueryCache
@@ -131,6 +131,10 @@ TRACK_OP_ACTIONS = "TRACK_OP_ACTIONS"
 # track the history of actions through a path (multiple states). This action affects things on the angr level
 TRACK_ACTION_HISTORY = "TRACK_ACTION_HISTORY"
 
+# record actions in compact, columnar logs instead of keeping SimAction objects in the history. The low-level details of
+# data actions (actual_addrs, actual_value, and added_constraints) are not kept
+COMPACT_ACTION_HISTORY = "COMPACT_ACTION_HISTORY"
+
 # track memory mapping and permissions
 TRACK_MEMORY_MAPPING = "TRACK_MEMORY_MAPPING"
 
@@ -264,6 +264,14 @@ class SimState(PluginHub, ana.Storable):
         if self.has_plugin('inspect'):
             self.inspect.action(*args, **kwargs)
 
+    def _inspect_armed(self, event_type):
+        """
+        Check whether any breakpoint is registered for an event type. Call sites of hot events skip them entirely,
+        including reading the inspect attributes back, when this is False.
+        """
+        inspector = self._active_plugins.get('inspect', None)
+        return inspector is not None and inspector._armed & event_masks.get(event_type, 0) != 0
+
     def _inspect_getattr(self, attr, default_value):
         if self.has_plugin('inspect'):
             if hasattr(self.inspect, attr):
@@ -796,7 +804,7 @@ default_state_plugin_preset = PluginPreset()
 SimState.register_preset('default', default_state_plugin_preset)
 
 from .state_plugins.history import SimStateHistory
-from .state_plugins.inspect import BP_AFTER, BP_BEFORE
+from .state_plugins.inspect import BP_AFTER, BP_BEFORE, event_masks
 from .state_plugins.sim_action import SimActionConstraint
 
 from . import sim_options as o
@@ -6,7 +6,7 @@ import claripy
 
 from .plugin import SimStatePlugin
 from .. import sim_options
-from ..state_plugins.sim_action import SimActionObject
+from ..state_plugins.sim_action import SimActionObject, SimActionLog
 
 l = logging.getLogger("angr.state_plugins.history")
 
@@ -18,11 +18,19 @@ class SimStateHistory(SimStatePlugin):
 
     STRONGREF_STATE = True
 
+    # the attributes whose items are indexed along the lineage. None stands for the history nodes themselves
+    _INDEXED_ATTRS = (None, 'recent_bbl_addrs', 'recent_ins_addrs', 'jumpkind')
+
     def __init__(self, parent=None, clone=None):
         SimStatePlugin.__init__(self)
 
         # attributes handling the progeny of this history object
+        self._parent = None
+        self._index = None
         self.parent = parent if clone is None else clone.parent
+        if clone is not None:
+            # the index only depends on the ancestors, which are shared with the clone
+            self._index = clone._index
         self.merged_from = [ ] if clone is None else list(clone.merged_from)
         self.merge_conditions = [ ] if clone is None else list(clone.merge_conditions)
         self.depth = (0 if parent is None else parent.depth + 1) if clone is None else clone.depth
@@ -44,6 +52,12 @@ class SimStateHistory(SimStatePlugin):
         self.recent_bbl_addrs = [ ] if clone is None else list(clone.recent_bbl_addrs)
         self.recent_ins_addrs = [ ] if clone is None else list(clone.recent_ins_addrs)
         self.recent_stack_actions = [ ] if clone is None else list(clone.recent_stack_actions)
+        # actions recorded with COMPACT_ACTION_HISTORY
+        self.recent_action_log = None if clone is None or clone.recent_action_log is None else \
+            clone.recent_action_log.copy()
+        # the maximum number of actions that compact logs keep along the lineage, or None to keep all of them
+        self.action_limit = (None if parent is None else parent.action_limit) if clone is None else clone.action_limit
+        self._actions_evicted = False if clone is None else clone._actions_evicted
         self.last_stmt_idx = None if clone is None else clone.last_stmt_idx
 
         # numbers of blocks, syscalls, and instructions that were executed in this step
@@ -76,15 +90,18 @@ class SimStateHistory(SimStatePlugin):
         d['strongref_state'] = None
         d['ancestry'] = ancestry
         d['successor_ip'] = self.successor_ip
+        # the index holds references to ancestors. it is rebuilt on demand
+        d['_index'] = None
         return d
 
     def __setstate__(self, d):
+        ancestry = d.pop('ancestry')
+        self.__dict__.update(d)
         child = self
-        for parent in d.pop('ancestry'):
+        for parent in ancestry:
             child.parent = parent
             child = parent
         child.parent = None
-        self.__dict__.update(d)
 
     def __repr__(self):
         addr = self.addr
@@ -95,6 +112,15 @@ class SimStateHistory(SimStatePlugin):
 
         return "<StateHistory @ %s>" % addr_str
 
+    @property
+    def parent(self):
+        return self._parent
+
+    @parent.setter
+    def parent(self, v):
+        self._parent = v
+        self._index = None
+
     def set_strongref_state(self, state):
         if sim_options.EFFICIENT_STATE_MERGING in state.options:
             self.strongref_state = state
@@ -242,7 +268,13 @@ class SimStateHistory(SimStatePlugin):
                 return False
             return True
 
-        return [x for x in reversed(self.actions) if
+        mem_addr = None
+        if read_from is not None and read_type == 'mem':
+            mem_addr = read_offset
+        elif write_to is not None and write_type == 'mem':
+            mem_addr = write_offset
+
+        return [x for x in self._actions_newest_first(insn_addr=insn_addr, mem_addr=mem_addr) if
                     (block_addr is None or x.bbl_addr == block_addr) and
                     (block_stmt is None or x.stmt_idx == block_stmt) and
                     (read_from is None or action_reads(x)) and
@@ -251,6 +283,34 @@ class SimStateHistory(SimStatePlugin):
                     #(insn_addr is None or (x.sim_procedure is None and addr_of_stmt(x.bbl_addr, x.stmt_idx) == insn_addr))
             ]
 
+    def _actions_newest_first(self, insn_addr=None, mem_addr=None):
+        """
+        Iterate over the actions of the entire lineage, from the most recent one. Compact action logs are looked up by
+        their indices, so the actions that are generated may be limited to the ones that can match the given
+        instruction address or memory address.
+        """
+
+        hist = self
+        while hist is not None:
+            log = hist.recent_action_log
+            if log is None:
+                for a in reversed(hist.recent_actions):
+                    yield a
+            else:
+                if insn_addr is not None:
+                    rows = log.rows_by_ins_addr(insn_addr)
+                elif mem_addr is not None:
+                    rows = log.rows_by_mem_addr(mem_addr)
+                else:
+                    rows = log.rows()
+                actions = [ log.action(row) for row in rows ]
+                others = [ ev for ev in hist.recent_events if isinstance(ev, SimAction) ]
+                if others:
+                    actions = sorted(actions + others, key=operator.attrgetter('id'))
+                for a in reversed(actions):
+                    yield a
+            hist = hist.parent
+
     #def _record_state(self, state, strong_reference=True):
     #   else:
     #       # state.scratch.bbl_addr may not be initialized as final states from the "flat_successors" list. We need to get
@@ -310,10 +370,44 @@ class SimStateHistory(SimStatePlugin):
         self.recent_events.append(new_event)
 
     def add_action(self, action):
-        self.recent_events.append(action)
+        if sim_options.COMPACT_ACTION_HISTORY in self.state.options:
+            self._log_action(action)
+        else:
+            self.recent_events.append(action)
 
     def extend_actions(self, new_actions):
-        self.recent_events.extend(new_actions)
+        if sim_options.COMPACT_ACTION_HISTORY in self.state.options:
+            for action in new_actions:
+                self._log_action(action)
+        else:
+            self.recent_events.extend(new_actions)
+
+    def _log_action(self, action):
+        if isinstance(action, SimActionConstraint):
+            # constraints are needed by merging and constraints_since(), so they are never evicted
+            self.recent_events.append(action)
+            return
+        if self.recent_action_log is None:
+            self.recent_action_log = SimActionLog(max_records=self.action_limit)
+            if self.action_limit is not None:
+                self._evict_actions()
+        self.recent_action_log.add(action, self.state)
+
+    def _evict_actions(self):
+        """
+        Drop the compact action logs of ancestors that are older than the most recent `action_limit` actions. Ancestors
+        are shared with other states, which lose the same actions. Constraint actions are not logged, so they are kept.
+        """
+
+        kept = 0
+        hist = self.parent
+        while hist is not None and not hist._actions_evicted:
+            if kept >= self.action_limit:
+                hist.recent_action_log = None
+                hist._actions_evicted = True
+            elif hist.recent_action_log is not None:
+                kept += len(hist.recent_action_log)
+            hist = hist.parent
 
     #
     # Convenient accessors
@@ -325,7 +419,11 @@ class SimStateHistory(SimStatePlugin):
         return [ ev.constraint for ev in self.recent_events if isinstance(ev, SimActionConstraint) ]
     @property
     def recent_actions(self):
-        return [ ev for ev in self.recent_events if isinstance(ev, SimAction) ]
+        actions = [ ev for ev in self.recent_events if isinstance(ev, SimAction) ]
+        if self.recent_action_log is not None:
+            logged = list(self.recent_action_log)
+            actions = sorted(actions + logged, key=operator.attrgetter('id')) if actions else logged
+        return actions
 
     @property
     def block_count(self):
@@ -347,7 +445,7 @@ class SimStateHistory(SimStatePlugin):
         return LambdaIterIter(self, operator.attrgetter('recent_actions'))
     @property
     def jumpkinds(self):
-        return LambdaAttrIter(self, operator.attrgetter('jumpkind'))
+        return LambdaAttrIter(self, operator.attrgetter('jumpkind'), attr='jumpkind')
     @property
     def jump_guards(self):
         return LambdaAttrIter(self, operator.attrgetter('jump_guard'))
@@ -359,10 +457,10 @@ class SimStateHistory(SimStatePlugin):
         return LambdaAttrIter(self, operator.attrgetter('recent_description'))
     @property
     def bbl_addrs(self):
-        return LambdaIterIter(self, operator.attrgetter('recent_bbl_addrs'))
+        return LambdaIterIter(self, operator.attrgetter('recent_bbl_addrs'), attr='recent_bbl_addrs')
     @property
     def ins_addrs(self):
-        return LambdaIterIter(self, operator.attrgetter('recent_ins_addrs'))
+        return LambdaIterIter(self, operator.attrgetter('recent_ins_addrs'), attr='recent_ins_addrs')
     @property
     def stack_actions(self):
         return LambdaIterIter(self, operator.attrgetter('recent_stack_actions'))
@@ -428,10 +526,91 @@ class SimStateHistory(SimStatePlugin):
     def make_child(self):
         return SimStateHistory(parent=self)
 
+    #
+    # Lineage index
+    #
+
+    @staticmethod
+    def _indexed_count(hist, attr):
+        """
+        The number of items an indexed attribute holds in a single history node.
+        """
+        if attr is None:
+            return 1
+        v = getattr(hist, attr)
+        if isinstance(v, (list, tuple)):
+            return len(v)
+        return 0 if v is None else 1
+
+    def _get_index(self):
+        """
+        Get the lineage index of this history node, building it if necessary.
+
+        The index is a tuple of a skip pointer to an ancestor and the numbers of items each of the indexed attributes
+        holds in all ancestors. Skip pointers follow the skew-binary scheme (Myers, 1983), so any ancestor can be reached
+        in O(log n) jumps while each node only stores a single pointer. The index of a node only depends on its
+        ancestors, which are not modified anymore once they have children.
+
+        :return:    A tuple of (skip pointer, item counts).
+        """
+        if self._index is not None:
+            return self._index
+
+        # lineages may be arbitrarily deep, so index them iteratively, from the oldest unindexed ancestor down
+        pending = [ ]
+        hist = self
+        while hist is not None and hist._index is None:
+            pending.append(hist)
+            hist = hist.parent
+
+        for hist in reversed(pending):
+            parent = hist.parent
+            if parent is None:
+                hist._index = (None, (0, ) * len(self._INDEXED_ATTRS))
+                continue
+
+            parent_skip, parent_counts = parent._index
+            counts = tuple(c + self._indexed_count(parent, attr) for c, attr in zip(parent_counts, self._INDEXED_ATTRS))
+            skip = parent
+            if parent_skip is not None and parent_skip._index is not None:
+                skip_skip = parent_skip._index[0]
+                if skip_skip is not None and skip_skip._index is not None:
+                    skip_depth = parent_skip._index[1][0]
+                    if parent_counts[0] - skip_depth == skip_depth - skip_skip._index[1][0]:
+                        skip = skip_skip
+            hist._index = (skip, counts)
+
+        return self._index
+
+    def _indexed_total(self, attr_idx):
+        """
+        The number of items an indexed attribute holds in the entire lineage, up to and including this node.
+        """
+        return self._get_index()[1][attr_idx] + self._indexed_count(self, self._INDEXED_ATTRS[attr_idx])
+
+    def _indexed_lookup(self, attr_idx, pos):
+        """
+        Find the history node holding the item at some position of an indexed attribute, counting from the root.
+
+        :param int attr_idx:    The index of the attribute in _INDEXED_ATTRS.
+        :param int pos:         The position of the item, which must be within the lineage.
+        :return:                A tuple of the history node and the position of the item inside that node.
+        """
+        hist = self
+        while hist._get_index()[1][attr_idx] > pos:
+            skip = hist._index[0]
+            if skip is not None and skip._get_index()[1][attr_idx] > pos:
+                hist = skip
+            else:
+                hist = hist.parent
+        return hist, pos - hist._index[1][attr_idx]
+
 class TreeIter(object):
-    def __init__(self, start, end=None):
+    def __init__(self, start, end=None, attr=None):
         self._start = start
         self._end = end
+        # the position of the history attribute the items come from in the lineage index, if it is indexed
+        self._attr_idx = SimStateHistory._INDEXED_ATTRS.index(attr) if attr is not None else None
 
     def _iter_nodes(self):
         n = self._start
@@ -448,8 +627,9 @@ class TreeIter(object):
 
     @property
     def hardcopy(self):
-        # lmao
-        return list(reversed(tuple(reversed(self))))
+        items = list(reversed(self))
+        items.reverse()
+        return items
 
     def __len__(self):
         # TODO: this is wrong
@@ -460,6 +640,11 @@ class TreeIter(object):
             raise ValueError("Please use .hardcopy to use slices")
         if k >= 0:
             raise ValueError("Please use .hardcopy to use nonnegative indexes")
+        if self._attr_idx is not None and self._end is None:
+            pos = self._start._indexed_total(self._attr_idx) + k
+            if pos < 0:
+                raise IndexError(k)
+            return self._indexed_item(*self._start._indexed_lookup(self._attr_idx, pos))
         i = 0
         for item in reversed(self):
             i -= 1
@@ -481,12 +666,25 @@ class TreeIter(object):
                 ctr += 1
         return ctr
 
+    def _indexed_item(self, hist, offset):
+        """
+        Get an item out of the history node holding it, as found through the lineage index.
+        """
+        raise NotImplementedError()
+
 
 class HistoryIter(TreeIter):
+    def __init__(self, start, **kwargs):
+        TreeIter.__init__(self, start, **kwargs)
+        self._attr_idx = 0
+
     def __reversed__(self):
         for hist in self._iter_nodes():
             yield hist
 
+    def _indexed_item(self, hist, offset):
+        return hist
+
 
 class LambdaAttrIter(TreeIter):
     def __init__(self, start, f, **kwargs):
@@ -499,18 +697,30 @@ class LambdaAttrIter(TreeIter):
             if a is not None:
                 yield a
 
+    def _indexed_item(self, hist, offset):
+        return self._f(hist)
+
 
 class LambdaIterIter(LambdaAttrIter):
     def __init__(self, start, f, reverse=True, **kwargs):
         LambdaAttrIter.__init__(self, start, f, **kwargs)
         self._f = f
         self._reverse = reverse
+        if not reverse:
+            # the items of each node are not in lineage order
+            self._attr_idx = None
 
     def __reversed__(self):
         for hist in self._iter_nodes():
             for a in reversed(self._f(hist)) if self._reverse else self._f(hist):
                 yield a
 
+    def _indexed_item(self, hist, offset):
+        return self._f(hist)[offset]
+
+    def count(self, v):
+        return sum(self._f(hist).count(v) for hist in self._iter_nodes())
+
 
 from angr.sim_state import SimState
 SimState.register_default('history', SimStateHistory)
@@ -3,6 +3,8 @@
 import logging
 l = logging.getLogger("angr.state_plugins.inspect")
 
+import claripy
+
 event_types = {
     'mem_read',
     'mem_write',
@@ -29,6 +31,9 @@ event_types = {
     'engine_process',
 }
 
+# a bit for each event type, so that checking whether an event has any breakpoints is a single operation
+event_masks = { t: 1 << i for i, t in enumerate(sorted(event_types)) }
+
 inspect_attributes = {
     # mem_read
     'mem_read_address',
@@ -119,6 +124,25 @@ BP_BOTH = 'both'
 BP_IPDB = 'ipdb'
 BP_IPYTHON = 'ipython'
 
+def _concrete_match(current_expr, needed):
+    """
+    Compare the current value of an inspect attribute with the value a breakpoint needs without the solver, if both of
+    them are concrete integers or bitvectors.
+
+    :return:    True or False, or None if the comparison needs the solver.
+    """
+    if type(needed) is int:
+        if type(current_expr) is int:
+            return current_expr == needed
+        if isinstance(current_expr, claripy.ast.BV) and current_expr.op == 'BVV':
+            return current_expr.args[0] == needed % (1 << current_expr.length)
+    elif isinstance(needed, claripy.ast.BV) and needed.op == 'BVV':
+        if isinstance(current_expr, claripy.ast.BV) and current_expr.op == 'BVV' and \
+                current_expr.length == needed.length:
+            return current_expr.args[0] == needed.args[0]
+    return None
+
+
 class BP(object):
     """
     A breakpoint.
@@ -157,18 +181,23 @@ class BP(object):
                 l.debug("...... both None, True")
                 c_ok = True
             elif current_expr is not None and needed is not None:
-                if state.solver.solution(current_expr, needed):
-                    l.debug("...... is_solution!")
-                    c_ok = True
+                c_ok = _concrete_match(current_expr, needed)
+                if c_ok is not None:
+                    # concrete values are trivially unique
+                    l.debug("...... concrete match: %s", c_ok)
                 else:
-                    l.debug("...... not solution...")
-                    c_ok = False
-
-                if c_ok and self.kwargs.get(a+'_unique', True):
-                    l.debug("...... checking uniqueness")
-                    if not state.solver.unique(current_expr):
-                        l.debug("...... not unique")
+                    if state.solver.solution(current_expr, needed):
+                        l.debug("...... is_solution!")
+                        c_ok = True
+                    else:
+                        l.debug("...... not solution...")
                         c_ok = False
+
+                    if c_ok and self.kwargs.get(a+'_unique', True):
+                        l.debug("...... checking uniqueness")
+                        if not state.solver.unique(current_expr):
+                            l.debug("...... not unique")
+                            c_ok = False
             else:
                 l.debug("...... one None, False")
                 c_ok = False
@@ -221,6 +250,8 @@ class SimInspector(SimStatePlugin):
         self._breakpoints = { }
         for t in event_types:
             self._breakpoints[t] = [ ]
+        # the event masks of all event types that have breakpoints
+        self._armed = 0
 
         for i in inspect_attributes:
             setattr(self, i, None)
@@ -273,6 +304,17 @@ class SimInspector(SimStatePlugin):
                                                                                         ", ".join(event_types))
                              )
         self._breakpoints[event_type].append(bp)
+        self._armed |= event_masks[event_type]
+
+    def is_armed(self, event_type):
+        """
+        Check whether any breakpoint is registered for an event type.
+
+        :param str event_type:  The event type.
+        :return:                True if there is at least one breakpoint for this event type, False otherwise.
+        :rtype:                 bool
+        """
+        return self._armed & event_masks[event_type] != 0
 
     def remove_breakpoint(self, event_type, bp=None, filter_func=None):
         """
@@ -294,6 +336,9 @@ class SimInspector(SimStatePlugin):
             # the breakpoint is not found
             l.error('remove_breakpoint(): Breakpoint %s (type %s) is not found.', bp, event_type)
 
+        if not self._breakpoints[event_type]:
+            self._armed &= ~event_masks[event_type]
+
     @SimStatePlugin.memo
     def copy(self, memo): # pylint: disable=unused-argument
         c = SimInspector()
@@ -302,6 +347,7 @@ class SimInspector(SimStatePlugin):
 
         for t,a in self._breakpoints.items():
             c._breakpoints[t].extend(a)
+        c._armed = self._armed
         return c
 
     def downsize(self):
@@ -329,6 +375,8 @@ class SimInspector(SimStatePlugin):
                     if id(b) not in seen:
                         self._breakpoints[t].append(b)
                         seen.add(id(b))
+            if self._breakpoints[t]:
+                self._armed |= event_masks[t]
         return False
 
     def merge(self, others, merge_conditions, common_ancestor=None): # pylint: disable=unused-argument
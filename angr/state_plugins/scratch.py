@@ -86,13 +86,16 @@ class SimStateScratch(SimStatePlugin):
         :param simplify: simplify the tmp before returning it
         :returns: a Claripy expression of the tmp
         """
-        self.state._inspect('tmp_read', BP_BEFORE, tmp_read_num=tmp)
+        inspect = self.state._inspect_armed('tmp_read')
+        if inspect:
+            self.state._inspect('tmp_read', BP_BEFORE, tmp_read_num=tmp)
         v = self.temps.get(tmp, None)
         if v is None:
             raise SimValueError('VEX temp variable %d does not exist. This is usually the result of an incorrect '
                                 'slicing.' % tmp
                                 )
-        self.state._inspect('tmp_read', BP_AFTER, tmp_read_expr=v)
+        if inspect:
+            self.state._inspect('tmp_read', BP_AFTER, tmp_read_expr=v)
         return v
 
     def store_tmp(self, tmp, content, reg_deps=None, tmp_deps=None, action_holder=None):
@@ -105,9 +108,11 @@ class SimStateScratch(SimStatePlugin):
         :param reg_deps: the register dependencies of the content
         :param tmp_deps: the temporary value dependencies of the content
         """
-        self.state._inspect('tmp_write', BP_BEFORE, tmp_write_num=tmp, tmp_write_expr=content)
-        tmp = self.state._inspect_getattr('tmp_write_num', tmp)
-        content = self.state._inspect_getattr('tmp_write_expr', content)
+        inspect = self.state._inspect_armed('tmp_write')
+        if inspect:
+            self.state._inspect('tmp_write', BP_BEFORE, tmp_write_num=tmp, tmp_write_expr=content)
+            tmp = self.state._inspect_getattr('tmp_write_num', tmp)
+            content = self.state._inspect_getattr('tmp_write_expr', content)
 
         if o.SYMBOLIC_TEMPS not in self.state.options:
             # Non-symbolic
@@ -125,7 +130,8 @@ class SimStateScratch(SimStatePlugin):
             else:
                 action_holder.append(r)
 
-        self.state._inspect('tmp_write', BP_AFTER)
+        if inspect:
+            self.state._inspect('tmp_write', BP_AFTER)
 
     @SimStatePlugin.memo
     def copy(self, memo): # pylint: disable=unused-argument
@@ -1,5 +1,6 @@
 # This module contains data structures for handling memory, code, and register references.
 
+import array
 import logging
 l = logging.getLogger("angr.state_plugins.sim_action")
 
@@ -251,4 +252,285 @@ class SimActionData(SimAction):
         c.fallback = self._copy_object(self.fallback)
         c.fd = self._copy_object(self.fd)
 
+
+class SimActionLog(object):
+    """
+    A compact, columnar log of the actions performed in a history node.
+
+    Data actions on registers, memory, and temporaries are kept as rows of a few typed arrays instead of SimActionData
+    objects. The ASTs they refer to are interned, so an AST that is used by many actions is stored once. Other actions
+    are kept as they are. SimAction objects are materialized on demand, without the low-level details that downsize()
+    removes.
+
+    The log can be bounded, in which case only the most recent `max_records` actions are kept.
+    """
+
+    # the kind of a row that holds a SimAction object as is
+    OBJECT = 0
+    # kinds of data action rows
+    _DATA_KINDS = {
+        (SimAction.REG, SimActionData.READ): 1,
+        (SimAction.REG, SimActionData.WRITE): 2,
+        (SimAction.MEM, SimActionData.READ): 3,
+        (SimAction.MEM, SimActionData.WRITE): 4,
+        (SimAction.TMP, SimActionData.READ): 5,
+        (SimAction.TMP, SimActionData.WRITE): 6,
+    }
+    _KIND_DATA = dict((v, k) for k, v in _DATA_KINDS.items())
+
+    # marks an absent value in unsigned columns
+    NONE = 0xffffffffffffffff
+    # marks an absent value in signed columns
+    _NONE_SIGNED = -0x8000000000000000
+
+    _REF_COLUMNS = ('_addrs', '_sizes', '_data', '_conditions', '_fallbacks')
+    _INT_COLUMNS = ('_kinds', '_ids', '_bbl_addrs', '_ins_addrs', '_stmt_idxs', '_locs', '_procs') + _REF_COLUMNS
+
+    __slots__ = _INT_COLUMNS + ('max_records', '_start', '_table', '_table_keys', '_ins_index', '_mem_index', )
+
+    def __init__(self, max_records=None):
+        self.max_records = max_records
+
+        self._kinds = array.array('B')
+        self._ids = array.array('Q')
+        self._bbl_addrs = array.array('Q')
+        self._ins_addrs = array.array('Q')
+        self._stmt_idxs = array.array('q')
+        # register offsets, concrete memory addresses, and tmp numbers
+        self._locs = array.array('Q')
+        # references into the table of interned objects, or -1
+        self._procs = array.array('i')
+        self._addrs = array.array('i')
+        self._sizes = array.array('i')
+        self._data = array.array('i')
+        self._conditions = array.array('i')
+        self._fallbacks = array.array('i')
+
+        # rows before this one are evicted
+        self._start = 0
+
+        # interned objects, and their keys
+        self._table = [ ]
+        self._table_keys = { }
+
+        # lazily built indices from instruction addresses and from memory addresses to rows
+        self._ins_index = None
+        self._mem_index = None
+
+    def __len__(self):
+        return len(self._kinds) - self._start
+
+    def copy(self):
+        c = SimActionLog.__new__(SimActionLog)
+        for k in self._INT_COLUMNS:
+            setattr(c, k, array.array(getattr(self, k).typecode, getattr(self, k)))
+        c.max_records = self.max_records
+        c._start = self._start
+        # the interned objects themselves are shared, only the table that refers to them is copied
+        c._table = list(self._table)
+        c._table_keys = dict(self._table_keys)
+        c._ins_index = None
+        c._mem_index = None
+        return c
+
+    #
+    # Recording
+    #
+
+    def _intern(self, obj, key=None):
+        if obj is None:
+            return -1
+        if key is None:
+            key = id(obj)
+        idx = self._table_keys.get(key, None)
+        if idx is None:
+            idx = len(self._table)
+            self._table.append(obj)
+            self._table_keys[key] = idx
+        return idx
+
+    def _intern_object(self, o):
+        """
+        Intern a SimActionObject, as the triple of its AST and its dependencies.
+        """
+        if o is None:
+            return -1
+        ast, reg_deps, tmp_deps = o.ast, o.reg_deps, o.tmp_deps
+        return self._intern((ast, reg_deps, tmp_deps), key=(id(ast), id(reg_deps), id(tmp_deps)))
+
+    def add(self, action, state):
+        """
+        Record an action.
+
+        :param SimAction action:    The action.
+        :param state:               The state the action is performed in.
+        """
+
+        kind = None
+        if type(action) is SimActionData and action.fd is None:
+            kind = self._DATA_KINDS.get((action.type, action.action), None)
+
+        self._ids.append(action.id)
+        self._bbl_addrs.append(self.NONE if action.bbl_addr is None else action.bbl_addr)
+        self._ins_addrs.append(self.NONE if action.ins_addr is None else action.ins_addr)
+        self._stmt_idxs.append(self._NONE_SIGNED if action.stmt_idx is None else action.stmt_idx)
+        self._procs.append(self._intern(action.sim_procedure))
+
+        if kind is None:
+            self._kinds.append(self.OBJECT)
+            self._locs.append(self.NONE)
+            self._addrs.append(self._intern(action))
+            for k in self._REF_COLUMNS[1:]:
+                getattr(self, k).append(-1)
+        else:
+            self._kinds.append(kind)
+            if action.type == SimAction.REG:
+                loc = action.offset
+            elif action.type == SimAction.TMP:
+                loc = action.tmp
+            else:
+                loc = self._concrete_addr(action.addr, state)
+            self._locs.append(self.NONE if loc is None else loc)
+            self._addrs.append(self._intern_object(action.addr))
+            self._sizes.append(self._intern_object(action.size))
+            self._data.append(self._intern_object(action.data))
+            self._conditions.append(self._intern_object(action.condition))
+            self._fallbacks.append(self._intern_object(action.fallback))
+
+        self._ins_index = None
+        self._mem_index = None
+
+        if self.max_records is not None and len(self) > self.max_records:
+            self._start += 1
+            if self._start >= max(self.max_records, 64):
+                self._compact()
+
+    @staticmethod
+    def _concrete_addr(addr, state):
+        if addr is None:
+            return None
+        ast = addr.ast
+        if isinstance(ast, int):
+            return ast
+        if ast.op == 'BVV':
+            return ast.args[0]
+        if ast.symbolic:
+            return None
+        return state.solver.eval(ast)
+
+    def _compact(self):
+        """
+        Drop evicted rows, and all interned objects that only they refer to.
+        """
+
+        start = self._start
+        for k in self._INT_COLUMNS:
+            del getattr(self, k)[:start]
+        self._start = 0
+
+        table, self._table, self._table_keys = self._table, [ ], { }
+        for k in ('_procs', ) + self._REF_COLUMNS:
+            col = getattr(self, k)
+            for i, idx in enumerate(col):
+                if idx != -1:
+                    obj = table[idx]
+                    if type(obj) is tuple:
+                        col[i] = self._intern(obj, key=(id(obj[0]), id(obj[1]), id(obj[2])))
+                    else:
+                        col[i] = self._intern(obj)
+
+    #
+    # Queries
+    #
+
+    def _build_indices(self):
+        ins_index, mem_index = { }, { }
+        for i in range(self._start, len(self._kinds)):
+            ins_addr = self._ins_addrs[i]
+            if ins_addr != self.NONE:
+                ins_index.setdefault(ins_addr, [ ]).append(i)
+            kind = self._kinds[i]
+            if kind in (3, 4) and self._locs[i] != self.NONE:
+                mem_index.setdefault(self._locs[i], [ ]).append(i)
+        self._ins_index, self._mem_index = ins_index, mem_index
+
+    def rows_by_ins_addr(self, ins_addr):
+        """
+        Get the rows of all actions performed by an instruction.
+
+        :param int ins_addr:    Address of the instruction.
+        :return:                A list of row numbers, in the order the actions were performed.
+        :rtype:                 list
+        """
+        if self._ins_index is None:
+            self._build_indices()
+        return self._ins_index.get(ins_addr, [ ])
+
+    def rows_by_mem_addr(self, addr):
+        """
+        Get the rows of all memory actions on a concrete address.
+
+        :param int addr:    The memory address.
+        :return:            A list of row numbers, in the order the actions were performed.
+        :rtype:             list
+        """
+        if self._mem_index is None:
+            self._build_indices()
+        return self._mem_index.get(addr, [ ])
+
+    def rows(self):
+        return range(self._start, len(self._kinds))
+
+    def action(self, row):
+        """
+        Materialize the action recorded in a row.
+
+        :param int row: The row number.
+        :return:        The action.
+        :rtype:         SimAction
+        """
+
+        kind = self._kinds[row]
+        if kind == self.OBJECT:
+            return self._table[self._addrs[row]]
+
+        region_type, action = self._KIND_DATA[kind]
+        a = SimActionData.__new__(SimActionData)
+        a.id = self._ids[row]
+        a.type = region_type
+        a.bbl_addr = None if self._bbl_addrs[row] == self.NONE else self._bbl_addrs[row]
+        a.ins_addr = None if self._ins_addrs[row] == self.NONE else self._ins_addrs[row]
+        a.stmt_idx = None if self._stmt_idxs[row] == self._NONE_SIGNED else self._stmt_idxs[row]
+        a.sim_procedure = None if self._procs[row] == -1 else self._table[self._procs[row]]
+        a.objects = { }
+        a.action = action
+
+        loc = None if self._locs[row] == self.NONE else self._locs[row]
+        a.tmp = loc if region_type == SimAction.TMP else None
+        a.offset = loc if region_type == SimAction.REG else None
+        a._reg_dep = frozenset((loc,)) if region_type == SimAction.REG and action == SimActionData.READ else _noneset
+        a._tmp_dep = frozenset((loc,)) if region_type == SimAction.TMP and action == SimActionData.READ else _noneset
+
+        a.addr = self._make(self._addrs[row])
+        a.size = self._make(self._sizes[row])
+        a.data = self._make(self._data[row])
+        a.condition = self._make(self._conditions[row])
+        a.fallback = self._make(self._fallbacks[row])
+        a.fd = None
+        a.actual_addrs = None
+        a.actual_value = None
+        a.added_constraints = None
+        return a
+
+    def _make(self, idx):
+        if idx == -1:
+            return None
+        ast, reg_deps, tmp_deps = self._table[idx]
+        return SimActionObject(ast, reg_deps=reg_deps, tmp_deps=tmp_deps)
+
+    def __iter__(self):
+        for row in self.rows():
+            yield self.action(row)
+
+
 from .sim_action_object import SimActionObject
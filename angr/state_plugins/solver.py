@@ -2,6 +2,7 @@ import binascii
 import functools
 import time
 import logging
+from collections import OrderedDict
 
 from .plugin import SimStatePlugin
 from .sim_action_object import ast_stripping_decorator, SimActionObject
@@ -164,6 +165,88 @@ def concrete_path_list(f):
             return [ v ]
     return concrete_shortcut_list
 
+#
+# Sharing queries between states
+#
+
+class SolverQueryCache(object):
+    """
+    A cache of solver queries that is shared by many states, for example all states of a SimulationManager.
+
+    Every state has its own claripy solver, so sibling states that share their constraints ask the same questions again
+    and again. This cache remembers the answers, keyed by the set of constraints, the kind of solver, and the query.
+    Keys are built from the hashes of the ASTs, which are only stable within a process, so the cache lives in memory.
+    The least recently used answers are evicted once the cache holds max_entries of them.
+
+    Only exact queries that reach the solver are cached: satisfiable, eval, min, max, and solution.
+    """
+
+    def __init__(self, max_entries=100000):
+        """
+        :param int max_entries: The maximum number of answers to keep.
+        """
+        self.max_entries = max_entries
+
+        self.hits = 0
+        self.misses = 0
+
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def hit_rate(self):
+        """
+        :returns:   The fraction of the queries that were answered from the cache.
+        :rtype:     float
+        """
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def clear(self):
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _ast_hash(e):
+        return hash(e) if isinstance(e, claripy.ast.Base) else repr(e)
+
+    def query(self, solver, kind, compute, e=None, extra_constraints=(), args=()):
+        """
+        Answer a solver query from the cache, or compute and remember the answer.
+
+        :param solver:              The claripy solver that would answer the query.
+        :param str kind:            The kind of the query.
+        :param compute:             A function that computes the answer.
+        :param e:                   The expression the query is about, if any.
+        :param extra_constraints:   The extra constraints of the query.
+        :param tuple args:          The remaining (hashable) arguments of the query.
+        :return:                    The answer.
+        """
+        key = (kind, type(solver).__name__,
+               frozenset(self._ast_hash(c) for c in solver.constraints),
+               self._ast_hash(e),
+               tuple(self._ast_hash(c) for c in extra_constraints),
+               tuple(self._ast_hash(a) for a in args))
+
+        try:
+            result = self._entries[key]
+        except KeyError:
+            pass
+        else:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return result
+
+        self.misses += 1
+        result = compute()
+        self._entries[key] = result
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return result
+
 #
 # The main event
 #
@@ -176,13 +259,15 @@ class SimSolver(SimStatePlugin):
 
     Any top-level variable of the claripy module can be accessed as a property of this object.
     """
-    def __init__(self, solver=None, all_variables=None, temporal_tracked_variables=None, eternal_tracked_variables=None): #pylint:disable=redefined-outer-name
+    def __init__(self, solver=None, all_variables=None, temporal_tracked_variables=None, eternal_tracked_variables=None, query_cache=None): #pylint:disable=redefined-outer-name
         l.debug("Creating SimSolverClaripy.")
         SimStatePlugin.__init__(self)
         self._stored_solver = solver
         self.all_variables = [] if all_variables is None else all_variables
         self.temporal_tracked_variables = {} if temporal_tracked_variables is None else temporal_tracked_variables
         self.eternal_tracked_variables = {} if eternal_tracked_variables is None else eternal_tracked_variables
+        # a SolverQueryCache shared with other states, if any. it is passed on to copies of the state
+        self.query_cache = query_cache
 
     def reload_solver(self):
         """
@@ -383,6 +468,12 @@ class SimSolver(SimStatePlugin):
         else:
             return f
 
+    def __getstate__(self):
+        d = super(SimSolver, self).__getstate__()
+        # the query cache is shared with other states, and its keys are only valid in the current process
+        d['query_cache'] = None
+        return d
+
     def __dir__(self):
         return sorted(set(dir(super(SimSolver, self)) + dir(claripy._all_operations) + dir(self.__class__)))
 
@@ -392,7 +483,7 @@ class SimSolver(SimStatePlugin):
 
     @SimStatePlugin.memo
     def copy(self, memo): # pylint: disable=unused-argument
-        return SimSolver(solver=self._solver.branch(), all_variables=self.all_variables, temporal_tracked_variables=self.temporal_tracked_variables, eternal_tracked_variables=self.eternal_tracked_variables)
+        return SimSolver(solver=self._solver.branch(), all_variables=self.all_variables, temporal_tracked_variables=self.temporal_tracked_variables, eternal_tracked_variables=self.eternal_tracked_variables, query_cache=self.query_cache)
 
     @error_converter
     def merge(self, others, merge_conditions, common_ancestor=None): # pylint: disable=W0613
@@ -444,6 +535,18 @@ class SimSolver(SimStatePlugin):
         else:
             return constraints.__class__((self._adjust_constraint(self.And(*constraints)),))
 
+    def _use_query_cache(self, exact):
+        """
+        Check if a query may be answered from the query cache. Only exact answers are cached: the hybrid solver is
+        approximate unless exact=True is asked for, and the other solvers that are not listed here always are.
+        """
+        if self.query_cache is None or exact is False:
+            return False
+        solver_type = type(self._solver)
+        if solver_type is claripy.SolverHybrid:
+            return exact is True
+        return solver_type in (claripy.Solver, claripy.SolverCacheless, claripy.SolverComposite, claripy.SolverConcrete)
+
     @timed_function
     @ast_stripping_decorator
     @error_converter
@@ -475,7 +578,12 @@ class SimSolver(SimStatePlugin):
         :return: a tuple of the solutions, in the form of Python primitives
         :rtype: tuple
         """
-        return self._solver.eval(e, n, extra_constraints=self._adjust_constraint_list(extra_constraints), exact=exact)
+        extra_constraints = self._adjust_constraint_list(extra_constraints)
+        if self._use_query_cache(exact):
+            return self.query_cache.query(self._solver, 'eval',
+                                          lambda: self._solver.eval(e, n, extra_constraints=extra_constraints, exact=exact),
+                                          e, extra_constraints, (n,))
+        return self._solver.eval(e, n, extra_constraints=extra_constraints, exact=exact)
 
     @concrete_path_scalar
     @timed_function
@@ -495,7 +603,12 @@ class SimSolver(SimStatePlugin):
             er = self._solver.max(e, extra_constraints=self._adjust_constraint_list(extra_constraints))
             assert er <= ar
             return ar
-        return self._solver.max(e, extra_constraints=self._adjust_constraint_list(extra_constraints), exact=exact)
+        extra_constraints = self._adjust_constraint_list(extra_constraints)
+        if self._use_query_cache(exact):
+            return self.query_cache.query(self._solver, 'max',
+                                          lambda: self._solver.max(e, extra_constraints=extra_constraints, exact=exact),
+                                          e, extra_constraints)
+        return self._solver.max(e, extra_constraints=extra_constraints, exact=exact)
 
     @concrete_path_scalar
     @timed_function
@@ -515,7 +628,12 @@ class SimSolver(SimStatePlugin):
             er = self._solver.min(e, extra_constraints=self._adjust_constraint_list(extra_constraints))
             assert ar <= er
             return ar
-        return self._solver.min(e, extra_constraints=self._adjust_constraint_list(extra_constraints), exact=exact)
+        extra_constraints = self._adjust_constraint_list(extra_constraints)
+        if self._use_query_cache(exact):
+            return self.query_cache.query(self._solver, 'min',
+                                          lambda: self._solver.min(e, extra_constraints=extra_constraints, exact=exact),
+                                          e, extra_constraints)
+        return self._solver.min(e, extra_constraints=extra_constraints, exact=exact)
 
     @timed_function
     @ast_stripping_decorator
@@ -536,7 +654,12 @@ class SimSolver(SimStatePlugin):
             if er is True:
                 assert ar is True
             return ar
-        return self._solver.solution(e, v, extra_constraints=self._adjust_constraint_list(extra_constraints), exact=exact)
+        extra_constraints = self._adjust_constraint_list(extra_constraints)
+        if self._use_query_cache(exact):
+            return self.query_cache.query(self._solver, 'solution',
+                                          lambda: self._solver.solution(e, v, extra_constraints=extra_constraints, exact=exact),
+                                          e, extra_constraints, (v,))
+        return self._solver.solution(e, v, extra_constraints=extra_constraints, exact=exact)
 
     @concrete_path_bool
     @timed_function
@@ -616,7 +739,12 @@ class SimSolver(SimStatePlugin):
             if er is True:
                 assert ar is True
             return ar
-        return self._solver.satisfiable(extra_constraints=self._adjust_constraint_list(extra_constraints), exact=exact)
+        extra_constraints = self._adjust_constraint_list(extra_constraints)
+        if self._use_query_cache(exact):
+            return self.query_cache.query(self._solver, 'satisfiable',
+                                          lambda: self._solver.satisfiable(extra_constraints=extra_constraints, exact=exact),
+                                          None, extra_constraints)
+        return self._solver.satisfiable(extra_constraints=extra_constraints, exact=exact)
 
     @timed_function
     @ast_stripping_decorator
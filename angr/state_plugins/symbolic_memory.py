@@ -85,22 +85,29 @@ class SimSymbolicMemory(SimMemory): #pylint:disable=abstract-method
     #
 
     def _changes_to_merge(self, others):
-        changed_bytes = set()
+        changed_ranges = [ ]
 
         for o in others:  # pylint:disable=redefined-outer-name
-            changed_bytes |= self.changed_bytes(o)
+            changed_ranges.extend(self.changed_ranges(o))
 
-        return changed_bytes
+        # coalesce the ranges from all the other memories
+        merged_ranges = [ ]
+        for start, end in sorted(changed_ranges):
+            if merged_ranges and start <= merged_ranges[-1][1]:
+                merged_ranges[-1] = (merged_ranges[-1][0], max(merged_ranges[-1][1], end))
+            else:
+                merged_ranges.append((start, end))
+        return merged_ranges
 
     def merge(self, others, merge_conditions, common_ancestor=None): # pylint: disable=unused-argument
         """
         Merge this SimMemory with the other SimMemory
         """
 
-        changed_bytes = self._changes_to_merge(others)
+        changed_ranges = self._changes_to_merge(others)
 
-        l.info("Merging %d bytes", len(changed_bytes))
-        l.info("... %s has changed bytes %s", self.id, changed_bytes)
+        l.info("Merging %d bytes", sum(end - start for start, end in changed_ranges))
+        l.info("... %s has changed ranges %s", self.id, changed_ranges)
 
         self.read_strategies = self._merge_strategies(self.read_strategies, *[
             o.read_strategies for o in others
@@ -108,7 +115,7 @@ class SimSymbolicMemory(SimMemory): #pylint:disable=abstract-method
         self.write_strategies = self._merge_strategies(self.write_strategies, *[
             o.write_strategies for o in others
         ])
-        merged_bytes = self._merge(others, changed_bytes, merge_conditions=merge_conditions)
+        merged_bytes = self._merge(others, changed_ranges, merge_conditions=merge_conditions)
 
         return len(merged_bytes) > 0
 
@@ -129,12 +136,12 @@ class SimSymbolicMemory(SimMemory): #pylint:disable=abstract-method
         return merged_strategies
 
     def widen(self, others):
-        changed_bytes = self._changes_to_merge(others)
-        l.info("Memory %s widening bytes %s", self.id, changed_bytes)
-        self._merge(others, changed_bytes, is_widening=True)
-        return len(changed_bytes) > 0
+        changed_ranges = self._changes_to_merge(others)
+        l.info("Memory %s widening ranges %s", self.id, changed_ranges)
+        self._merge(others, changed_ranges, is_widening=True)
+        return len(changed_ranges) > 0
 
-    def _merge(self, others, changed_bytes, merge_conditions=None, is_widening=False):
+    def _merge(self, others, changed_ranges, merge_conditions=None, is_widening=False):
         all_memories = [self] + others
         if merge_conditions is None:
             merge_conditions = [ None ] * len(all_memories)
@@ -142,7 +149,7 @@ class SimSymbolicMemory(SimMemory): #pylint:disable=abstract-method
         merged_to = None
         merged_objects = set()
         merged_bytes = set()
-        for b in sorted(changed_bytes):
+        for b in itertools.chain.from_iterable(range(start, end) for start, end in changed_ranges):
             if merged_to is not None and not b >= merged_to:
                 l.info("merged_to = %d ... already merged byte 0x%x", merged_to, b)
                 continue
@@ -585,14 +592,26 @@ class SimSymbolicMemory(SimMemory): #pylint:disable=abstract-method
 
         chunk_start = 0
         chunk_size = max(0x100, seek_size + 0x80)
-        chunk = self.load(start, chunk_size, endness="Iend_BE",
-                          disable_actions=disable_actions, inspect=inspect)
+
+        if self._find_fast_path_allowed(start, what, step, remaining_symbolic, disable_actions, inspect):
+            # search the leading concrete bytes natively, and only build cases from the first symbolic byte on
+            data = self._concrete_prefix(self.state.solver.eval(start), max_search)
+            idx = data.find(self.state.solver.eval(what, cast_to=bytes))
+            if idx != -1:
+                l.debug("... found concrete at offset %d", idx)
+                constraints = [ self.state.solver.true ] if default is None else [ ]
+                return start + idx, constraints, [ idx ]
+            chunk_start = max(0, len(data) - seek_size + 1)
+
+        if chunk_start == 0 or chunk_start <= max_search - seek_size:
+            chunk = self.load(start+chunk_start, chunk_size, endness="Iend_BE", ret_on_segv=chunk_start > 0,
+                              disable_actions=disable_actions, inspect=inspect)
 
         cases = [ ]
         match_indices = [ ]
         offsets_matched = [ ] # Only used in static mode
 
-        for i in itertools.count(step=step):
+        for i in itertools.count(start=chunk_start, step=step):
             l.debug("... checking offset %d", i)
             if i > max_search - seek_size:
                 l.debug("... hit max size")
@@ -660,6 +679,52 @@ class SimSymbolicMemory(SimMemory): #pylint:disable=abstract-method
             r = self.state.solver.ite_cases(cases, default - start) + start
             return r, constraints, match_indices
 
+    def _find_fast_path_allowed(self, start, what, step, max_symbolic_bytes, disable_actions, inspect):
+        """
+        Check whether a search may read the concrete bytes directly from the memory objects. Such reads bypass load(),
+        so this is only allowed when nothing observes the loads: no read breakpoints and no automatic read actions.
+        """
+        if self.state.mode == 'static' or self.state.arch.byte_width != 8 or step != 1:
+            return False
+        if max_symbolic_bytes is not None and max_symbolic_bytes <= 0:
+            return False
+        if self.state.solver.symbolic(start) or self.state.solver.symbolic(what):
+            return False
+        if inspect and self.state._inspect_armed(self.category + '_read'):
+            return False
+        if not disable_actions and options.AUTO_REFS in self.state.options:
+            return False
+        return True
+
+    def _concrete_prefix(self, addr, max_size):
+        """
+        Read the run of concrete bytes starting at a concrete address, straight from the memory objects.
+
+        :param int addr:        The address to start reading from.
+        :param int max_size:    The maximum number of bytes to read.
+        :return:                The bytes. The run stops at the first symbolic, uninitialized, or unreadable byte.
+        :rtype:                 bytes
+        """
+        data = [ ]
+        end = addr + max_size
+        while addr < end:
+            items = self.mem.load_objects(addr, min(end - addr, 0x1000), ret_on_segv=True)
+            if not items:
+                break
+            for n, (mo_addr, mo) in enumerate(items):
+                if mo_addr != addr:
+                    # a gap, which would be filled with unconstrained bytes
+                    return b''.join(data)
+                mo_end = min(mo.last_addr + 1, end)
+                if n + 1 < len(items):
+                    mo_end = min(mo_end, items[n + 1][0])
+                obj = mo.bytes_at(addr, mo_end - addr)
+                if obj.symbolic:
+                    return b''.join(data)
+                data.append(self.state.solver.eval(obj, cast_to=bytes))
+                addr = mo_end
+        return b''.join(data)
+
     def __contains__(self, dst):
         if isinstance(dst, int):
             addr = dst
@@ -1040,10 +1105,11 @@ class SimSymbolicMemory(SimMemory): #pylint:disable=abstract-method
 
     # Replaces the differences between self and other with unconstrained bytes.
     def unconstrain_differences(self, other):
-        changed_bytes = self.changed_bytes(other)
-        l.debug("Will unconstrain %d %s bytes", len(changed_bytes), self.id)
-        for b in changed_bytes:
-            self.unconstrain_byte(b)
+        changed_ranges = self.changed_ranges(other)
+        l.debug("Will unconstrain %d %s bytes", sum(end - start for start, end in changed_ranges), self.id)
+        for start, end in changed_ranges:
+            for b in range(start, end):
+                self.unconstrain_byte(b)
 
     @staticmethod
     def _is_uninitialized(a):
@@ -1132,6 +1198,15 @@ class SimSymbolicMemory(SimMemory): #pylint:disable=abstract-method
         """
         return self.mem.changed_bytes(other.mem)
 
+    def changed_ranges(self, other):
+        """
+        Gets the ranges of changed bytes between self and `other`.
+
+        :param other:   The other :class:`SimSymbolicMemory`.
+        :returns:       A sorted list of non-overlapping (start, end) tuples, where `end` is exclusive
+        """
+        return self.mem.changed_ranges(other.mem)
+
     def replace_all(self, old, new):
         """
         Replaces all instances of expression old with expression new.
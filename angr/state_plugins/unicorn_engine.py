@@ -6,6 +6,7 @@ import ctypes
 import threading
 import itertools
 import pkg_resources
+from collections import OrderedDict
 import logging
 import pyvex
 import claripy
@@ -55,6 +56,7 @@ class STOP(object): # stop_t
     STOP_SEGFAULT       = 9
     STOP_ZERO_DIV       = 10
     STOP_NODECODE       = 11
+    STOP_TRACE_DIVERGED = 12
 
     @staticmethod
     def name_stop(num):
@@ -63,6 +65,60 @@ class STOP(object): # stop_t
                 return item
         raise ValueError(num)
 
+#
+# Register synchronization
+#
+
+class RegisterMap(object):
+    """
+    The registers of an architecture that are copied between angr and unicorn in bulk.
+
+    Registers that have a VEX offset and are at most 8 bytes long are grouped into runs of adjacent registers. Each run
+    is loaded from or stored to the register file of the state at once, and all of them are written to or read from
+    unicorn with a single native call. Sub-registers of registers in the map are left out, since they are covered by
+    their full registers. All other registers in arch.uc_regs are synchronized one by one.
+
+    :ivar runs:         A list of (VEX offset, size, [ (offset in the run, register size) ]) tuples.
+    :ivar uc_ids:       A ctypes array of the unicorn register ids, in the order of the runs.
+    :ivar others:       A list of (register name, unicorn register id) tuples of the other registers.
+    :ivar byteorder:    The byte order of registers, as expected by int.from_bytes().
+    :ivar size:         The size of the register file.
+    """
+
+    def __init__(self, arch, blacklist):
+        self.byteorder = 'little' if arch.register_endness == 'Iend_LE' else 'big'
+        highest_reg_offset, reg_size = max(arch.registers.values())
+        self.size = highest_reg_offset + reg_size
+
+        self.others = [ ]
+        regs = [ ]
+        for r, c in arch.uc_regs.items():
+            if r in blacklist:
+                continue
+            if r in arch.registers and arch.registers[r][1] <= 8:
+                offset, size = arch.registers[r]
+                regs.append((offset, size, c))
+            else:
+                self.others.append((r, c))
+
+        self.runs = [ ]
+        uc_ids = [ ]
+        end = 0
+        for offset, size, c in sorted(regs, key=lambda reg: (reg[0], -reg[1])):
+            if offset < end:
+                # a sub-register of the previous register
+                continue
+            if self.runs and offset == end:
+                run_offset, run_size, members = self.runs[-1]
+                members.append((offset - run_offset, size))
+                self.runs[-1] = (run_offset, run_size + size, members)
+            else:
+                self.runs.append((offset, size, [ (0, size) ]))
+            uc_ids.append(c)
+            end = offset + size
+
+        self.uc_ids = (ctypes.c_int * len(uc_ids))(*uc_ids)
+
 #
 # Memory mapping errors - only used internally
 #
@@ -92,7 +148,7 @@ class AggressiveConcretizationAnnotation(claripy.SimplificationAvoidanceAnnotati
         self.unicorn_start_addr = addr
 
 #
-# Because Unicorn leaks like crazy, we use one Uc object per thread...
+# Because Unicorn leaks like crazy, we keep a small pool of Uc objects per thread, one for each project (cache key)...
 #
 
 _unicounter = itertools.count()
@@ -105,6 +161,9 @@ class Uniwrapper(unicorn.Uc if unicorn is not None else object):
         self.cache_key = cache_key
         self.wrapped_mapped = set()
         self.wrapped_hooks = set()
+        # mapped ranges that are kept mapped for the next state, with the versions of their pages (see
+        # SimPagedMemory.page_versions()) at the time they were last synchronized with angr
+        self.retained = { }
         self.id = None
         unicorn.Uc.__init__(self, arch.uc_arch, arch.uc_mode)
 
@@ -130,14 +189,19 @@ class Uniwrapper(unicorn.Uc if unicorn is not None else object):
         #l.debug("Unmapping %d bytes at %#x", size, addr)
         m = unicorn.Uc.mem_unmap(self, addr, size)
         self.wrapped_mapped.discard((addr, size))
+        self.retained.pop((addr, size), None)
         return m
 
-    def mem_reset(self):
+    def mem_reset(self, keep_retained=True):
         #l.debug("Resetting memory.")
+        if not keep_retained:
+            self.retained.clear()
         for addr,size in self.wrapped_mapped:
+            if (addr, size) in self.retained:
+                continue
             #l.debug("Unmapping %d bytes at %#x", size, addr)
             unicorn.Uc.mem_unmap(self, addr, size)
-        self.wrapped_mapped.clear()
+        self.wrapped_mapped = set(self.retained)
 
     def hook_reset(self):
         #l.debug("Resetting hooks.")
@@ -152,7 +216,7 @@ class Uniwrapper(unicorn.Uc if unicorn is not None else object):
         #l.debug("Reset complete.")
 
 _unicorn_tls = threading.local()
-_unicorn_tls.uc = None
+_unicorn_tls.pool = None
 
 class _VexCacheInfo(ctypes.Structure):
     _fields_ = [
@@ -204,6 +268,8 @@ def _load_native():
 
         #_setup_prototype_explicit(h, 'logSetLogLevel', None, ctypes.c_uint64)
         _setup_prototype(h, 'alloc', state_t, uc_engine_t, ctypes.c_uint64)
+        _setup_prototype(h, 'write_registers', uc_err, uc_engine_t, ctypes.c_uint64, ctypes.POINTER(ctypes.c_int), ctypes.POINTER(ctypes.c_uint64))
+        _setup_prototype(h, 'read_registers', uc_err, uc_engine_t, ctypes.c_uint64, ctypes.POINTER(ctypes.c_int), ctypes.POINTER(ctypes.c_uint64))
         _setup_prototype(h, 'dealloc', None, state_t)
         _setup_prototype(h, 'hook', None, state_t)
         _setup_prototype(h, 'unhook', None, state_t)
@@ -219,6 +285,8 @@ def _load_native():
         _setup_prototype(h, 'stop_reason', stop_t, state_t)
         _setup_prototype(h, 'activate', None, state_t, ctypes.c_uint64, ctypes.c_uint64, ctypes.c_char_p)
         _setup_prototype(h, 'set_stops', None, state_t, ctypes.c_uint64, ctypes.POINTER(ctypes.c_uint64))
+        _setup_prototype(h, 'set_expected_bbls', None, state_t, ctypes.c_uint64, ctypes.POINTER(ctypes.c_uint64))
+        _setup_prototype(h, 'expected_bbl_count', ctypes.c_uint64, state_t)
         _setup_prototype(h, 'cache_page', ctypes.c_bool, state_t, ctypes.c_uint64, ctypes.c_uint64, ctypes.c_char_p, ctypes.c_uint64)
         _setup_prototype(h, 'uncache_page', None, state_t, ctypes.c_uint64)
         _setup_prototype(h, 'enable_symbolic_reg_tracking', None, state_t, VexArch, _VexArchInfo)
@@ -253,6 +321,8 @@ class Unicorn(SimStatePlugin):
     '''
 
     UC_CONFIG = {} # config cache for each arch
+    UC_REG_MAPS = {} # register map cache for each arch
+    UC_POOL_SIZE = 4 # number of Uc objects kept around by each thread
 
     def __init__(
         self,
@@ -349,6 +419,15 @@ class Unicorn(SimStatePlugin):
         # the address to use for concrete transmits
         self.transmit_addr = None
 
+        # whether the pages that are kept mapped in unicorn match this state
+        self._retained_synced = False
+
+        # the basic blocks that the next run is expected to execute, in order. emulation stops when it diverges from
+        # them. they only apply to a single run
+        self.expected_bbls = None
+        # the number of expected basic blocks that the last run went through
+        self.expected_bbl_count = None
+
         self.time = None
 
     @SimStatePlugin.memo
@@ -376,6 +455,7 @@ class Unicorn(SimStatePlugin):
         u.countdown_symbolic_memory = self.countdown_symbolic_memory
         u.countdown_stop_point = self.countdown_stop_point
         u.transmit_addr = self.transmit_addr
+        u.expected_bbls = self.expected_bbls
         u._uncache_pages = list(self._uncache_pages)
         return u
 
@@ -458,7 +538,7 @@ class Unicorn(SimStatePlugin):
         self._unicount = next(_unicounter)
         self._uc_state = None
         self.cache_key = hash(self)
-        _unicorn_tls.uc = None
+        self.delete_uc()
 
     def set_state(self, state):
         SimStatePlugin.set_state(self, state)
@@ -469,34 +549,45 @@ class Unicorn(SimStatePlugin):
     def _reuse_unicorn(self):
         return self.state.arch.name != "MIPS32"
 
+    @staticmethod
+    def _uc_pool():
+        pool = getattr(_unicorn_tls, "pool", None)
+        if pool is None:
+            pool = _unicorn_tls.pool = OrderedDict()
+        return pool
+
     @property
     def uc(self):
         new_id = next(_unicounter)
 
-        if (
-            not hasattr(_unicorn_tls, "uc") or
-            _unicorn_tls.uc is None or
-            _unicorn_tls.uc.arch != self.state.arch or
-            _unicorn_tls.uc.cache_key != self.cache_key
-        ):
-            _unicorn_tls.uc = Uniwrapper(self.state.arch, self.cache_key)
-        elif _unicorn_tls.uc.id != self._unicount:
+        pool = self._uc_pool()
+        key = (self.state.arch.name, self.cache_key)
+        uc = pool.get(key, None)
+        if uc is None or uc.arch != self.state.arch:
+            uc = pool[key] = Uniwrapper(self.state.arch, self.cache_key)
+            if len(pool) > self.UC_POOL_SIZE:
+                pool.popitem(last=False)
+        elif uc.id != self._unicount:
             if not self._reuse_unicorn:
-                _unicorn_tls.uc = Uniwrapper(self.state.arch, self.cache_key)
+                uc = pool[key] = Uniwrapper(self.state.arch, self.cache_key)
             else:
                 #l.debug("Reusing unicorn state!")
-                _unicorn_tls.uc.reset()
+                uc.reset()
         else:
             #l.debug("Reusing unicorn state!")
             pass
+        pool.move_to_end(key)
 
-        _unicorn_tls.uc.id = new_id
+        uc.id = new_id
         self._unicount = new_id
-        return _unicorn_tls.uc
+        return uc
 
     @staticmethod
     def delete_uc():
-        _unicorn_tls.uc = None
+        _unicorn_tls.pool = None
+
+    def _delete_own_uc(self):
+        self._uc_pool().pop((self.state.arch.name, self.cache_key), None)
 
     @property
     def _uc_regs(self):
@@ -520,6 +611,12 @@ class Unicorn(SimStatePlugin):
             (ctypes.c_uint64 * len(stop_points))(*map(ctypes.c_uint64, stop_points))
         )
 
+    def set_expected_bbls(self, bbl_addrs):
+        _UC_NATIVE.set_expected_bbls(self._uc_state,
+            ctypes.c_uint64(len(bbl_addrs)),
+            (ctypes.c_uint64 * len(bbl_addrs))(*bbl_addrs)
+        )
+
     def set_tracking(self, track_bbls, track_stack):
         _UC_NATIVE.set_tracking(self._uc_state, track_bbls, track_stack)
 
@@ -811,6 +908,7 @@ class Unicorn(SimStatePlugin):
 
         data = bytearray(length)
         taint = [ ] # this is a list to reference a nonlocal variable. we're using the list like an Option<c array>
+        concretized = False
 
         def _taint(pos, chunk_size):
             if not taint:
@@ -840,6 +938,7 @@ class Unicorn(SimStatePlugin):
                 #print "TAINT: %x, %d" % (mo_addr, chunk_size)
                 _taint(mo_addr, chunk_size)
             else:
+                concretized |= chunk.symbolic
                 s = self.state.solver.eval(d, cast_to=bytes)
                 data[mo_addr-start:mo_addr-start+chunk_size] = s
             last_missing = mo_addr - 1
@@ -863,6 +962,11 @@ class Unicorn(SimStatePlugin):
             uc.mem_write(start, bytes(data))
             self._mapped += 1
             _UC_NATIVE.activate(self._uc_state, start, length, taint[0] if taint else None)
+            if not taint and not concretized:
+                # other states can reuse this mapping as long as their pages are the same as ours
+                versions = self.state.memory.mem.page_versions(start, start + length)
+                if versions is not None:
+                    uc.retained[(start, length)] = versions
             return True
 
     def uncache_page(self, addr):
@@ -882,6 +986,35 @@ class Unicorn(SimStatePlugin):
         # just fyi there's a GDT in memory
         _UC_NATIVE.activate(self._uc_state, 0x1000, 0x1000, None)
 
+        self._reuse_retained_pages()
+
+    def _reuse_retained_pages(self):
+        """
+        Keep the ranges that an earlier run left mapped in unicorn if their pages are unchanged in this state, and unmap
+        all others. This way, switching between sibling states only remaps the pages in which they differ.
+        """
+        uc = self.uc
+        for (start, length), versions in list(uc.retained.items()):
+            if self.state.memory.mem.page_versions(start, start + length) == versions:
+                _UC_NATIVE.activate(self._uc_state, start, length, None)
+            else:
+                uc.mem_unmap(start, length)
+        self._retained_synced = False
+
+    def _update_retained_pages(self):
+        """
+        After the memory of this state has been synchronized with unicorn, record the new versions of the retained
+        pages.
+        """
+        uc = self.uc
+        for (start, length) in list(uc.retained):
+            versions = self.state.memory.mem.page_versions(start, start + length)
+            if versions is None:
+                uc.mem_unmap(start, length)
+            else:
+                uc.retained[(start, length)] = versions
+        self._retained_synced = True
+
     def start(self, step=None):
         self.jumpkind = 'Ijk_Boring'
         self.countdown_nonunicorn_blocks = self.cooldown_nonunicorn_blocks
@@ -909,24 +1042,28 @@ class Unicorn(SimStatePlugin):
             # does not refer to constructing the set of symbolic register
             # offsets, but rather to not having to lift each block etc.)
             if not self._check_registers(report=False):
-                highest_reg_offset, reg_size = max(self.state.arch.registers.values())
-                symbolic_offsets = set(range(0, highest_reg_offset+reg_size))
-                items = self.state.registers.mem.load_objects(0, highest_reg_offset+reg_size)
+                reg_file_size = self._reg_map.size
+                # one flag per byte of the register file
+                symbolic = bytearray(b'\x01') * reg_file_size
+                items = self.state.registers.mem.load_objects(0, reg_file_size)
                 for start,v in items:
-                    end = v.last_addr + 1
+                    end = min(v.last_addr + 1, reg_file_size)
                     vv = self._symbolic_passthrough(v.object)
 
                     if not vv.symbolic:
-                        symbolic_offsets.difference_update(range(start, end))
+                        symbolic[start:end] = bytes(max(end - start, 0))
                     else:
-                        symbolic_offsets.difference_update(b for b,vb in enumerate(vv.chop(8), start) if not vb.symbolic)
+                        for b,vb in enumerate(vv.chop(8), start):
+                            if b < reg_file_size and not vb.symbolic:
+                                symbolic[b] = 0
 
                 # for register flagged systems, we should save off all CC regs together
-                if self.state.arch.name == 'X86' and symbolic_offsets & set(range(40, 56)):
-                    symbolic_offsets.update(range(40, 56))
-                elif self.state.arch.name == 'AMD64' and symbolic_offsets & set(range(144, 176)):
-                    symbolic_offsets.update(range(144, 176))
+                if self.state.arch.name == 'X86' and any(symbolic[40:56]):
+                    symbolic[40:56] = b'\x01' * 16
+                elif self.state.arch.name == 'AMD64' and any(symbolic[144:176]):
+                    symbolic[144:176] = b'\x01' * 32
 
+                symbolic_offsets = [ b for b,flag in enumerate(symbolic) if flag ]
                 sym_regs_array = (ctypes.c_uint64 * len(symbolic_offsets))(*map(ctypes.c_uint64, symbolic_offsets))
                 _UC_NATIVE.symbolic_register_data(self._uc_state, len(symbolic_offsets), sym_regs_array)
             else:
@@ -943,6 +1080,11 @@ class Unicorn(SimStatePlugin):
         self.get_regs()
         self.steps = _UC_NATIVE.step(self._uc_state)
         self.stop_reason = _UC_NATIVE.stop_reason(self._uc_state)
+        if self.expected_bbls:
+            self.expected_bbl_count = _UC_NATIVE.expected_bbl_count(self._uc_state)
+            self.expected_bbls = None
+        else:
+            self.expected_bbl_count = None
 
         # figure out why we stopped
         if self.stop_reason == STOP.STOP_SYMBOLIC_REG:
@@ -977,6 +1119,7 @@ class Unicorn(SimStatePlugin):
             p_update = update.next
 
         _UC_NATIVE.destroy(head)    # free the linked list
+        self._update_retained_pages()
 
         # adjust the countdowns
         #if self.steps >= 128:
@@ -998,7 +1141,7 @@ class Unicorn(SimStatePlugin):
 
         if self.stop_reason in (STOP.STOP_NORMAL, STOP.STOP_SYSCALL):
             self.countdown_nonunicorn_blocks = 0
-        elif self.stop_reason == STOP.STOP_STOPPOINT:
+        elif self.stop_reason in (STOP.STOP_STOPPOINT, STOP.STOP_TRACE_DIVERGED):
             self.countdown_nonunicorn_blocks = 0
             self.countdown_stop_point = self.cooldown_stop_point
         elif self.stop_reason == STOP.STOP_SYMBOLIC_REG:
@@ -1061,11 +1204,13 @@ class Unicorn(SimStatePlugin):
 
         # there's something we're not properly resetting for syscalls, so
         # we'll clear the state when they happen
-        if self.stop_reason not in (STOP.STOP_NORMAL, STOP.STOP_STOPPOINT, STOP.STOP_SYMBOLIC_MEM, STOP.STOP_SYMBOLIC_REG):
-            self.delete_uc()
+        if self.stop_reason not in (STOP.STOP_NORMAL, STOP.STOP_STOPPOINT, STOP.STOP_SYMBOLIC_MEM, STOP.STOP_SYMBOLIC_REG,
+                                    STOP.STOP_TRACE_DIVERGED):
+            self._delete_own_uc()
 
         #l.debug("Resetting the unicorn state.")
-        self.uc.reset()
+        # if the memory was not synchronized back, the retained pages may hold data that angr has never seen
+        self.uc.mem_reset(keep_retained=self._retained_synced)
 
     def set_regs(self):
         ''' setting unicorn registers '''
@@ -1089,9 +1234,27 @@ class Unicorn(SimStatePlugin):
             gs = self.state.solver.eval(self.state.regs.gs) << 16
             self.setup_gdt(fs, gs)
 
-        for r, c in self._uc_regs.items():
-            if r in self.reg_blacklist:
-                continue
+        reg_map = self._reg_map
+        values = (ctypes.c_uint64 * len(reg_map.uc_ids))()
+        i = 0
+        for offset, size, members in reg_map.runs:
+            v = self.state.registers.load(offset, size, endness='Iend_BE')
+            if not v.symbolic and not v.annotations:
+                data = self.state.solver.eval(v).to_bytes(size, 'big')
+                for start, reg_size in members:
+                    values[i] = int.from_bytes(data[start:start+reg_size], reg_map.byteorder)
+                    i += 1
+            else:
+                # some registers in this run are symbolic or annotated, look at them one by one
+                for start, reg_size in members:
+                    v = self._process_value(self.state.registers.load(offset + start, reg_size), 'reg')
+                    if v is None:
+                        raise SimValueError('setting a symbolic register')
+                    values[i] = self.state.solver.eval(v)
+                    i += 1
+        _UC_NATIVE.write_registers(uc._uch, len(reg_map.uc_ids), reg_map.uc_ids, values)
+
+        for r, c in reg_map.others:
             v = self._process_value(getattr(self.state.regs, r), 'reg')
             if v is None:
                     raise SimValueError('setting a symbolic register')
@@ -1236,13 +1399,21 @@ class Unicorn(SimStatePlugin):
 
     reg_blacklist = ('cs', 'ds', 'es', 'fs', 'gs', 'ss', 'mm0', 'mm1', 'mm2', 'mm3', 'mm4', 'mm5', 'mm6', 'mm7')
 
+    @property
+    def _reg_map(self):
+        reg_map = self.UC_REG_MAPS.get(self.state.arch.name, None)
+        if reg_map is None:
+            reg_map = self.UC_REG_MAPS[self.state.arch.name] = RegisterMap(self.state.arch, self.reg_blacklist)
+        return reg_map
+
     def get_regs(self):
         ''' loading registers from unicorn '''
 
         # first, get the ignore list (in case of symbolic registers)
+        reg_map = self._reg_map
+
         if options.UNICORN_SYM_REGS_SUPPORT in self.state.options:
-            highest_reg_offset, reg_size = max(self.state.arch.registers.values())
-            symbolic_list = (ctypes.c_uint64*(highest_reg_offset + reg_size))()
+            symbolic_list = (ctypes.c_uint64*reg_map.size)()
             num_regs = _UC_NATIVE.get_symbolic_registers(self._uc_state, symbolic_list)
 
             # we take the approach of saving off the symbolic regs and then writing them back
@@ -1264,9 +1435,18 @@ class Unicorn(SimStatePlugin):
                 ))
 
         # now we sync registers out of unicorn
-        for r, c in self._uc_regs.items():
-            if r in self.reg_blacklist:
-                continue
+        values = (ctypes.c_uint64 * len(reg_map.uc_ids))()
+        _UC_NATIVE.read_registers(self.uc._uch, len(reg_map.uc_ids), reg_map.uc_ids, values)
+        i = 0
+        for offset, size, members in reg_map.runs:
+            data = b''.join(
+                (values[i + j] & ((1 << (reg_size * 8)) - 1)).to_bytes(reg_size, reg_map.byteorder)
+                for j, (_, reg_size) in enumerate(members)
+            )
+            self.state.registers.store(offset, self.state.solver.BVV(data), endness='Iend_BE')
+            i += len(members)
+
+        for r, c in reg_map.others:
             v = self.uc.reg_read(c)
             # l.debug('getting $%s = %#x', r, v)
             setattr(self.state.regs, r, v)
@@ -1,3 +1,4 @@
+import mmap
 import claripy
 import logging
 import itertools
@@ -142,8 +143,13 @@ class SimFile(SimFileBase, SimSymbolicMemory):
     The normal SimFile is meant to model files on disk. It subclasses SimSymbolicMemory so loads and stores to/from
     it are very simple.
 
+    Concrete content (a string, or a bytes-like object such as an mmap) is not turned into memory objects up front.
+    It is kept as a flat buffer that is shared by all copies of the file. Reads of ranges that have not been written
+    to are slices of that buffer, and the memory is only filled in page by page when a read or write cannot be served
+    from the buffer. A file backed by an mmap cannot be pickled.
+
     :param name:        The name of the file
-    :param content:     Optional initial content for the file as a string or bitvector
+    :param content:     Optional initial content for the file as a string, bytes-like object, or bitvector
     :param size:        Optional size of the file. If content is not specified, it defaults to zero
     :param has_end:     Whether the size boundary is treated as the end of the file or a frontier at which new content
                         will be generated. If unspecified, will pick its value based on options.FILES_HAVE_EOF. Another
@@ -157,20 +163,35 @@ class SimFile(SimFileBase, SimSymbolicMemory):
     """
     def __init__(self, name, content=None, size=None, has_end=None, seekable=True, writable=True, ident=None, concrete=None, **kwargs):
         kwargs['memory_id'] = kwargs.get('memory_id', 'file')
+
+        # this is hacky because we need to work around not having a state yet
+        content = _deps_unpack(content)[0]
+        backing = None
+        if type(content) is str:
+            content = content.encode()
+        if type(content) is bytearray:
+            # the buffer is shared with all copies of the file, so it must not change behind our backs
+            content = bytes(content)
+        if isinstance(content, (bytes, memoryview, mmap.mmap)):
+            if concrete is None: concrete = True
+            backing = content
+            content = None
+            if 'mem' not in kwargs:
+                kwargs['memory_backer'] = backing
+            if size is None:
+                size = len(backing)
+
         super(SimFile, self).__init__(name, writable=writable, ident=ident, **kwargs)
         self._size = size
         self.has_end = has_end
         self.seekable = seekable
 
-        # this is hacky because we need to work around not having a state yet
-        content = _deps_unpack(content)[0]
-        if type(content) is bytes:
-            if concrete is None: concrete = True
-            content = claripy.BVV(content)
-        elif type(content) is str:
-            if concrete is None: concrete = True
-            content = claripy.BVV(content.encode())
-        elif content is None:
+        # the concrete content of the file, and the pages that have been written to since. None means that any page
+        # may have been written to
+        self._backing = backing
+        self._overlay = set()
+
+        if content is None:
             pass
         elif isinstance(content, claripy.Bits):
             if concrete is None and not content.symbolic: concrete = True
@@ -188,7 +209,7 @@ class SimFile(SimFileBase, SimSymbolicMemory):
 
             if self._size is None:
                 self._size = len(content) // 8
-        else:
+        elif backing is None:
             if self._size is None:
                 self._size = 0
                 if has_end is None:
@@ -212,6 +233,33 @@ class SimFile(SimFileBase, SimSymbolicMemory):
     def size(self):
         return self._size
 
+    #
+    # Concrete backing
+    #
+
+    def _read_from(self, addr, num_bytes, inspect=True, events=True, ret_on_segv=False):
+        if self._backing is not None and addr + num_bytes <= len(self._backing) and \
+                self.state.arch.byte_width == 8 and not self._overlaps_overlay(addr, num_bytes):
+            return claripy.BVV(bytes(self._backing[addr:addr + num_bytes]))
+        return super(SimFile, self)._read_from(addr, num_bytes, inspect=inspect, events=events, ret_on_segv=ret_on_segv)
+
+    def _store(self, req):
+        req = super(SimFile, self)._store(req)
+        if self._backing is not None and self._overlay is not None and req.actual_addresses:
+            max_bytes = len(req.data) // self.state.arch.byte_width
+            page_size = self.mem._page_size
+            for addr in req.actual_addresses:
+                self._overlay.update(range(addr // page_size, (addr + max_bytes + page_size - 1) // page_size))
+        return req
+
+    def _overlaps_overlay(self, addr, num_bytes):
+        if self._overlay is None:
+            return True
+        if not self._overlay:
+            return False
+        page_size = self.mem._page_size
+        return any(page in self._overlay for page in range(addr // page_size, (addr + num_bytes + page_size - 1) // page_size))
+
     def concretize(self, **kwargs):
         """
         Return a concretization of the contents of the file, as a flat bytestring.
@@ -280,7 +328,7 @@ class SimFile(SimFileBase, SimSymbolicMemory):
     @SimStatePlugin.memo
     def copy(self, _):
         #l.debug("Copying %d bytes of memory with id %s." % (len(self.mem), self.id))
-        return type(self)(name=self.name, size=self._size, has_end=self.has_end, seekable=self.seekable, writable=self.writable, ident=self.ident, concrete=self.concrete,
+        c = type(self)(name=self.name, size=self._size, has_end=self.has_end, seekable=self.seekable, writable=self.writable, ident=self.ident, concrete=self.concrete,
             mem=self.mem.branch(),
             memory_id=self.id,
             endness=self.endness,
@@ -290,6 +338,9 @@ class SimFile(SimFileBase, SimSymbolicMemory):
             stack_region_map=self._stack_region_map,
             generic_region_map=self._generic_region_map
         )
+        c._backing = self._backing
+        c._overlay = None if self._overlay is None else set(self._overlay)
+        return c
 
     def merge(self, others, merge_conditions, common_ancestor=None): # pylint: disable=unused-argument
         if not all(type(o) is type(self) for o in others):
@@ -300,6 +351,13 @@ class SimFile(SimFileBase, SimSymbolicMemory):
 
         self._size = self.state.solver.ite_cases(zip(merge_conditions[1:], (o._size for o in others)), self._size)
 
+        # the merged memory may differ from the buffer wherever any of the files was written to
+        for o in others:
+            if o._backing is not self._backing or o._overlay is None or self._overlay is None:
+                self._overlay = None
+                break
+            self._overlay |= o._overlay
+
         return super(SimFile, self).merge(others, merge_conditions, common_ancestor=common_ancestor)
 
     def widen(self, _):
@@ -511,7 +511,7 @@ class SimMemory(SimStatePlugin):
         elif size_e is None:
             size_e = self.state.solver.BVV(data_e.size() // self.state.arch.byte_width, self.state.arch.bits)
 
-        if inspect is True:
+        if inspect is True and self.state._inspect_armed(self.category + '_write'):
             if self.category == 'reg':
                 self.state._inspect(
                     'reg_write',
@@ -558,7 +558,7 @@ class SimMemory(SimStatePlugin):
             e.original_addr = addr_e
             raise
 
-        if inspect is True:
+        if inspect is True and self.state._inspect_armed(self.category + '_write'):
             if self.category == 'reg': self.state._inspect('reg_write', BP_AFTER)
             if self.category == 'mem': self.state._inspect('mem_write', BP_AFTER)
 
@@ -735,7 +735,7 @@ class SimMemory(SimStatePlugin):
             size = self.state.arch.bits // self.state.arch.byte_width
             size_e = size
 
-        if inspect is True:
+        if inspect is True and self.state._inspect_armed(self.category + '_read'):
             if self.category == 'reg':
                 self.state._inspect('reg_read', BP_BEFORE, reg_read_offset=addr_e, reg_read_length=size_e,
                                     reg_read_condition=condition_e
@@ -789,7 +789,7 @@ class SimMemory(SimStatePlugin):
         if endness == "Iend_LE":
             r = r.reversed
 
-        if inspect is True:
+        if inspect is True and self.state._inspect_armed(self.category + '_read'):
             if self.category == 'mem':
                 self.state._inspect('mem_read', BP_AFTER, mem_read_expr=r)
                 r = self.state._inspect_getattr("mem_read_expr", r)
@@ -1,3 +1,8 @@
+import os
+import mmap
+import uuid
+import itertools
+
 import cooldict
 import claripy
 import cle
@@ -10,6 +15,25 @@ from .memory_object import SimMemoryObject
 
 l = logging.getLogger("angr.storage.paged_memory")
 
+# every modification of a page gets a new generation. copies of a page keep the generation of the original, so two
+# pages with the same generation are guaranteed to have the same contents. pages are pickled with their generation and
+# forked processes inherit the counter, so generations are prefixed with a token that is unique to each process
+_page_generations = itertools.count()
+_generation_token = None
+_generation_pid = None
+
+
+def _new_generation():
+    global _generation_token, _generation_pid  # pylint:disable=global-statement
+    pid = os.getpid()
+    if pid != _generation_pid:
+        _generation_token = uuid.uuid4().int
+        _generation_pid = pid
+    return _generation_token, next(_page_generations)
+
+# flat buffers that can back a SimPagedMemory. their content starts at address 0
+_BUFFER_BACKERS = (bytes, bytearray, memoryview, mmap.mmap)
+
 
 class BasePage:
     """
@@ -38,6 +62,10 @@ class BasePage:
         self._page_addr = page_addr
         self._page_size = page_size
 
+        # the number of page tables containing this page. a page may only be modified in place if it is not shared
+        self.refcount = 1
+        self.generation = _new_generation()
+
         if permissions is None:
             perms = Page.PROT_READ|Page.PROT_WRITE
             if executable:
@@ -76,13 +104,16 @@ class BasePage:
             self.store_overwrite(state, new_mo, start, end)
         else:
             self.store_underwrite(state, new_mo, start, end)
+        self.generation = _new_generation()
 
     def copy(self):
-        return Page(
+        page = type(self)(
             self._page_addr, self._page_size,
             permissions=self.permissions,
             **self._copy_args()
         )
+        page.generation = self.generation
+        return page
 
     #
     # Abstract functions
@@ -145,6 +176,7 @@ class TreePage(BasePage):
             if val is old_mo:
                 #assert new_mo.includes(a)
                 self._storage[key] = new_mo
+        self.generation = _new_generation()
 
     def store_overwrite(self, state, new_mo, start, end):
         # iterate over each item we might overwrite
@@ -265,6 +297,7 @@ class ListPage(BasePage):
             for i in range(start, end):
                 if self._storage[i-self._page_addr] is old_mo:
                     self._storage[i-self._page_addr] = new_mo
+        self.generation = _new_generation()
 
     def store_overwrite(self, state, new_mo, start, end):
         if start == self._page_addr and end == self._page_addr + self._page_size:
@@ -321,12 +354,29 @@ Page = ListPage
 
 #pylint:disable=unidiomatic-typecheck
 
+class SharedPageTable:
+    """
+    Reference count of the page table of a SimPagedMemory. Branching a SimPagedMemory shares its page table with the
+    new instance, and the first instance to modify it takes a private copy.
+    """
+
+    __slots__ = ('refcount', )
+
+    def __init__(self):
+        self.refcount = 1
+
+    def __getstate__(self):
+        return self.refcount
+
+    def __setstate__(self, s):
+        self.refcount = s
+
+
 class SimPagedMemory:
     """
     Represents paged memory.
     """
-    def __init__(self, memory_backer=None, permissions_backer=None, pages=None, initialized=None, name_mapping=None, hash_mapping=None, page_size=None, symbolic_addrs=None, check_permissions=False):
-        self._cowed = set()
+    def __init__(self, memory_backer=None, permissions_backer=None, pages=None, initialized=None, name_mapping=None, hash_mapping=None, page_size=None, symbolic_addrs=None, check_permissions=False, shared_table=None, cloned_pages=0):
         self._memory_backer = { } if memory_backer is None else memory_backer
         self._permissions_backer = permissions_backer # saved for copying
         self._executable_pages = False if permissions_backer is None else permissions_backer[0]
@@ -339,6 +389,10 @@ class SimPagedMemory:
         self._preapproved_stack = range(0)
         self._check_perms = check_permissions
 
+        # the page table (_pages, _symbolic_addrs and _initialized) may be shared with other branches
+        self._shared_table = SharedPageTable() if shared_table is None else shared_table
+        self.cloned_pages = cloned_pages
+
         # reverse mapping
         self._name_mapping = cooldict.BranchingDict() if name_mapping is None else name_mapping
         self._hash_mapping = cooldict.BranchingDict() if hash_mapping is None else hash_mapping
@@ -358,31 +412,50 @@ class SimPagedMemory:
             '_hash_mapping': self._hash_mapping,
             '_symbolic_addrs': self._symbolic_addrs,
             '_preapproved_stack': self._preapproved_stack,
-            '_check_perms': self._check_perms
+            '_check_perms': self._check_perms,
+            '_shared_table': self._shared_table,
+            'cloned_pages': self.cloned_pages,
         }
 
     def __setstate__(self, s):
-        self._cowed = set()
         self.__dict__.update(s)
 
+    def __del__(self):
+        try:
+            self._release_table()
+        except AttributeError:
+            # we were never fully initialized
+            pass
+
     def branch(self):
         new_name_mapping = self._name_mapping.branch() if options.REVERSE_MEMORY_NAME_MAP in self.state.options else self._name_mapping
         new_hash_mapping = self._hash_mapping.branch() if options.REVERSE_MEMORY_HASH_MAP in self.state.options else self._hash_mapping
 
-        new_pages = dict(self._pages)
-        self._cowed = set()
+        # the new instance shares our page table. whoever writes to it first makes a copy
+        self._shared_table.refcount += 1
         m = SimPagedMemory(memory_backer=self._memory_backer,
                            permissions_backer=self._permissions_backer,
-                           pages=new_pages,
-                           initialized=set(self._initialized),
+                           pages=self._pages,
+                           initialized=self._initialized,
                            page_size=self._page_size,
                            name_mapping=new_name_mapping,
                            hash_mapping=new_hash_mapping,
-                           symbolic_addrs=dict(self._symbolic_addrs),
-                           check_permissions=self._check_perms)
+                           symbolic_addrs=self._symbolic_addrs,
+                           check_permissions=self._check_perms,
+                           shared_table=self._shared_table,
+                           cloned_pages=self.cloned_pages)
         m._preapproved_stack = self._preapproved_stack
         return m
 
+    @property
+    def shared_pages(self):
+        """
+        The number of pages that are currently shared with other SimPagedMemory instances.
+        """
+        if self._shared_table.refcount > 1:
+            return len(self._pages)
+        return sum(1 for page in self._pages.values() if page.refcount > 1)
+
     def __getitem__(self, addr):
         page_num = addr // self._page_size
         page_idx = addr
@@ -472,7 +545,16 @@ class SimPagedMemory:
         if n in self._initialized:
             return False
         self._initialized.add(n)
+        return self._fill_page_from_backer(n, new_page)
+
+    def _fill_page_from_backer(self, n, new_page):
+        """
+        Write the data of the memory backer to a new page.
 
+        :param int n:       The page number.
+        :param new_page:    The page.
+        :return:            Whether the memory backer has any data for the page.
+        """
         new_page_addr = n*self._page_size
         initialized = False
 
@@ -481,6 +563,19 @@ class SimPagedMemory:
 
         if self._memory_backer is None:
             pass
+        elif isinstance(self._memory_backer, _BUFFER_BACKERS):
+            relevant_region_end = min(new_page_addr + self._page_size, len(self._memory_backer))
+            if new_page_addr < relevant_region_end:
+                relevant_data = bytes(self._memory_backer[new_page_addr:relevant_region_end])
+                if self.byte_width == 8:
+                    mo = SimMemoryObject(claripy.BVV(relevant_data), new_page_addr, byte_width=self.byte_width)
+                    self._apply_object_to_page(new_page_addr, mo, page=new_page)
+                else:
+                    for i, byte in enumerate(relevant_data):
+                        mo = SimMemoryObject(claripy.BVV(byte, self.byte_width), new_page_addr + i,
+                                             byte_width=self.byte_width)
+                        self._apply_object_to_page(new_page_addr, mo, page=new_page)
+                initialized = True
         elif isinstance(self._memory_backer, cle.Clemory):
             # find permission backer associated with the address
             # fall back to default (read-write-maybe-exec) if can't find any
@@ -547,7 +642,34 @@ class SimPagedMemory:
             self.state.scratch.pop_priv()
         return initialized
 
+    def _own_table(self):
+        """
+        Make sure that the page table is not shared with any other SimPagedMemory, so that it can be modified.
+        """
+        if self._shared_table.refcount == 1:
+            return
+
+        self._shared_table.refcount -= 1
+        self._shared_table = SharedPageTable()
+        self._pages = dict(self._pages)
+        self._symbolic_addrs = dict(self._symbolic_addrs)
+        self._initialized = set(self._initialized)
+        for page in self._pages.values():
+            page.refcount += 1
+
+    def _release_table(self):
+        """
+        Drop our reference to the page table, and the references of the page table to its pages if it was the last one.
+        """
+        self._shared_table.refcount -= 1
+        if self._shared_table.refcount == 0:
+            for page in self._pages.values():
+                page.refcount -= 1
+
     def _get_page(self, page_num, write=False, create=False, initialize=True):
+        if write:
+            self._own_table()
+
         page_addr = page_num * self._page_size
         try:
             page = self._pages[page_num]
@@ -555,6 +677,8 @@ class SimPagedMemory:
             if not (initialize or create or page_addr in self._preapproved_stack):
                 raise
 
+            # pages initialized from the memory backer look the same for everyone, so it is fine to add them to a
+            # shared page table
             page = self._create_page(page_num)
             self._symbolic_addrs[page_num] = set()
             if initialize:
@@ -563,14 +687,14 @@ class SimPagedMemory:
                     raise
 
             self._pages[page_num] = page
-            self._cowed.add(page_num)
             return page
 
-        if write and page_num not in self._cowed:
+        if write and page.refcount > 1:
+            page.refcount -= 1
             page = page.copy()
             self._symbolic_addrs[page_num] = set(self._symbolic_addrs[page_num])
-            self._cowed.add(page_num)
             self._pages[page_num] = page
+            self.cloned_pages += 1
 
         return page
 
@@ -596,7 +720,10 @@ class SimPagedMemory:
 
     def keys(self):
         sofar = set()
-        sofar.update(self._memory_backer.keys())
+        if isinstance(self._memory_backer, _BUFFER_BACKERS):
+            sofar.update(range(len(self._memory_backer)))
+        else:
+            sofar.update(self._memory_backer.keys())
 
         for i, p in self._pages.items():
             sofar.update([k + i * self._page_size for k in p.keys()])
@@ -607,76 +734,154 @@ class SimPagedMemory:
         return len(self.keys())
 
     def changed_bytes(self, other):
-        return self.__changed_bytes(other)
-
-    def __changed_bytes(self, other):
         """
         Gets the set of changed bytes between `self` and `other`.
 
         :type other:    SimPagedMemory
         :returns:       A set of differing bytes.
         """
-        if self._page_size != other._page_size:
-            raise SimMemoryError("SimPagedMemory page sizes differ. This is asking for disaster.")
+        return set(itertools.chain.from_iterable(range(start, end) for start, end in self.changed_ranges(other)))
 
-        our_pages = set(self._pages.keys())
-        their_pages = set(other._pages.keys())
-        their_additions = their_pages - our_pages
-        our_additions = our_pages - their_pages
-        common_pages = our_pages & their_pages
+    def changed_ranges(self, other):
+        """
+        Gets the ranges of bytes that differ between `self` and `other`.
 
-        candidates = set()
-        for p in their_additions:
-            candidates.update(other._pages[p].keys())
-        for p in our_additions:
-            candidates.update(self._pages[p].keys())
+        Pages that are shared or have the same generation are skipped entirely, and the remaining pages are compared
+        one run of memory objects at a time. Only runs backed by different memory objects are compared byte by byte.
 
-        for p in common_pages:
-            our_page = self._pages[p]
-            their_page = other._pages[p]
+        :type other:    SimPagedMemory
+        :returns:       A sorted list of non-overlapping (start, end) tuples, where `end` is exclusive.
+        """
+        if self._page_size != other._page_size:
+            raise SimMemoryError("SimPagedMemory page sizes differ. This is asking for disaster.")
 
+        ranges = [ ]
+        for page_num in sorted(set(self._pages) | set(other._pages)):
+            our_page = self._get_page_or_none(page_num)
+            their_page = other._get_page_or_none(page_num)
             if our_page is their_page:
                 continue
+            if our_page is not None and their_page is not None and our_page.generation == their_page.generation:
+                continue
 
-            our_keys = set(our_page.keys())
-            their_keys = set(their_page.keys())
-            changes = (our_keys - their_keys) | (their_keys - our_keys) | {
-                i for i in (our_keys & their_keys) if our_page.load_mo(self.state, i) is not their_page.load_mo(self.state, i)
-            }
-            candidates.update(changes)
-
-        #both_changed = our_changes & their_changes
-        #ours_changed_only = our_changes - both_changed
-        #theirs_changed_only = their_changes - both_changed
-        #both_deleted = their_deletions & our_deletions
-        #ours_deleted_only = our_deletions - both_deleted
-        #theirs_deleted_only = their_deletions - both_deleted
-
-        differences = set()
-        for c in candidates:
-            if c not in self and c in other:
-                differences.add(c)
-            elif c in self and c not in other:
-                differences.add(c)
-            else:
-                if type(self[c]) is not SimMemoryObject:
-                    self[c] = SimMemoryObject(self.state.solver.BVV(ord(self[c]), self.byte_width), c, byte_width=self.byte_width)
-                if type(other[c]) is not SimMemoryObject:
-                    other[c] = SimMemoryObject(self.state.solver.BVV(ord(other[c]), self.byte_width), c, byte_width=self.byte_width)
-                if c in self and self[c] != other[c]:
-                    # Try to see if the bytes are equal
-                    self_byte = self[c].bytes_at(c, 1)
-                    other_byte = other[c].bytes_at(c, 1)
-                    if self_byte is not other_byte:
-                        #l.debug("%s: offset %x, two different bytes %s %s from %s %s", self.id, c,
-                        #        self_byte, other_byte,
-                        #        self[c].object.model, other[c].object.model)
-                        differences.add(c)
-                else:
-                    # this means the byte is in neither memory
-                    pass
+            page_start = page_num * self._page_size
+            page_end = page_start + self._page_size
+            our_runs = self._page_runs(our_page, page_start, page_end)
+            their_runs = other._page_runs(their_page, page_start, page_end)
+
+            for start, end, our_mo, their_mo in self._align_runs(our_runs, their_runs):
+                for r in self._changed_ranges_in_run(start, end, our_mo, their_mo):
+                    if ranges and ranges[-1][1] == r[0]:
+                        ranges[-1] = (ranges[-1][0], r[1])
+                    else:
+                        ranges.append(r)
+
+        return ranges
 
-        return differences
+    def page_versions(self, start, end):
+        """
+        Get the versions of all pages that overlap with a range of addresses. Two pages with the same version hold the
+        same data and have the same permissions, so a copy of a page taken by someone else can be checked for being
+        stale without looking at its data.
+
+        :param int start:   The start address.
+        :param int end:     The end address (non-inclusive).
+        :returns:           A list of (generation, permissions) tuples, one for each page, or None if any of the pages
+                            is not in the page table yet.
+        """
+        versions = [ ]
+        for page_num in range(start // self._page_size, (end + self._page_size - 1) // self._page_size):
+            # pages that are only in the memory backer get a new generation whenever they are built, so they have no
+            # version to compare
+            page = self._pages.get(page_num, None)
+            if page is None:
+                return None
+            permissions = None if page.permissions.symbolic else page.permissions.args[0]
+            versions.append((page.generation, permissions))
+        return versions
+
+    def _get_page_or_none(self, page_num):
+        """
+        Get a page for reading it, without modifying the page table. A page that is only in the memory backer is built
+        into a temporary page, which is not added to the page table.
+
+        :param int page_num:    The page number.
+        :return:                The page, or None if the page does not exist.
+        """
+        page = self._pages.get(page_num, None)
+        if page is not None or page_num in self._initialized:
+            return page
+
+        page = self._create_page(page_num)
+        if not self._fill_page_from_backer(page_num, page):
+            return None
+        return page
+
+    def _page_runs(self, page, start, end):
+        """
+        Split a page into runs of bytes backed by the same memory object.
+
+        :returns:   A list of (start, end, memory object) tuples.
+        """
+        if page is None:
+            return [ ]
+
+        items = page.load_slice(self.state, start, end)
+        runs = [ ]
+        for i, (addr, mo) in enumerate(items):
+            run_end = min(mo.last_addr + 1, end)
+            if i + 1 < len(items):
+                run_end = min(run_end, items[i + 1][0])
+            if addr < run_end:
+                runs.append((addr, run_end, mo))
+        return runs
+
+    @staticmethod
+    def _align_runs(our_runs, their_runs):
+        """
+        Split two lists of runs at each other's boundaries.
+
+        :returns:   A generator of (start, end, our memory object, their memory object) tuples, where either memory object
+                    may be None.
+        """
+        points = sorted({ p for r in itertools.chain(our_runs, their_runs) for p in r[:2] })
+        i, j = 0, 0
+        for start, end in zip(points, points[1:]):
+            while i < len(our_runs) and our_runs[i][1] <= start:
+                i += 1
+            while j < len(their_runs) and their_runs[j][1] <= start:
+                j += 1
+            our_mo = our_runs[i][2] if i < len(our_runs) and our_runs[i][0] <= start else None
+            their_mo = their_runs[j][2] if j < len(their_runs) and their_runs[j][0] <= start else None
+            if our_mo is not None or their_mo is not None:
+                yield start, end, our_mo, their_mo
+
+    def _changed_ranges_in_run(self, start, end, our_mo, their_mo):
+        if our_mo is None or their_mo is None:
+            return [ (start, end) ]
+        if our_mo is their_mo or our_mo == their_mo:
+            return [ ]
+
+        ours = our_mo.bytes_at(start, end - start)
+        theirs = their_mo.bytes_at(start, end - start)
+        if ours is theirs:
+            return [ ]
+
+        if ours.op == 'BVV' and theirs.op == 'BVV':
+            # find the differing bytes without building any more ASTs
+            diff = ours.args[0] ^ theirs.args[0]
+            mask = (1 << self.byte_width) - 1
+            changed = [ addr for addr in range(start, end) if (diff >> ((end - addr - 1) * self.byte_width)) & mask ]
+        else:
+            changed = [ addr for addr in range(start, end) if our_mo.bytes_at(addr, 1) is not their_mo.bytes_at(addr, 1) ]
+
+        ranges = [ ]
+        for addr in changed:
+            if ranges and ranges[-1][1] == addr:
+                ranges[-1] = (ranges[-1][0], addr + 1)
+            else:
+                ranges.append((addr, addr + 1))
+        return ranges
 
     #
     # Memory object management
@@ -974,7 +1179,7 @@ class SimPagedMemory:
         page_num = addr // self._page_size
 
         try:
-            page = self._get_page(page_num)
+            page = self._get_page(page_num, write=permissions is not None)
         except KeyError:
             raise SimMemoryMissingError("page does not exist at given address")
 
@@ -1019,8 +1224,11 @@ class SimPagedMemory:
         if isinstance(permissions, int):
             permissions = claripy.BVV(permissions, 3)
 
+        self._own_table()
         for page in range(pages):
             page_id = base_page_num + page
+            if page_id in self._pages:
+                self._pages[page_id].refcount -= 1
             self._pages[page_id] = self._create_page(page_id, permissions=permissions)
             self._symbolic_addrs[page_id] = set()
             if init_zero:
@@ -1054,8 +1262,9 @@ class SimPagedMemory:
                     l.warning("unmap_region received address and length combination is not mapped")
                     return
 
+        self._own_table()
         for page in range(pages):
-            del self._pages[base_page_num + page]
+            self._pages.pop(base_page_num + page).refcount -= 1
             del self._symbolic_addrs[base_page_num + page]
 
 from .. import sim_options as o
@@ -47,6 +47,7 @@ typedef enum stop {
 	STOP_SEGFAULT,
 	STOP_ZERO_DIV,
 	STOP_NODECODE,
+	STOP_TRACE_DIVERGED,
 } stop_t;
 
 typedef struct block_entry {
@@ -142,6 +143,11 @@ public:
 	bool track_bbls;
 	bool track_stack;
 
+	// the basic blocks that execution is expected to go through, e.g. a slice of a concrete trace
+	std::vector<uint64_t> expected_bbls;
+	uint64_t expected_pos;
+	bool expected_pending;
+
 	State(uc_engine *_uc, uint64_t cache_key):uc(_uc)
 	{
 		hooked = false;
@@ -157,6 +163,8 @@ public:
 		syscall_count = 0;
 		uc_context_alloc(uc, &saved_regs);
 		executed_pages_iterator = NULL;
+		expected_pos = 0;
+		expected_pending = false;
 
 		auto it = global_cache.find(cache_key);
 		if (it == global_cache.end()) {
@@ -287,6 +295,9 @@ public:
 			case STOP_NODECODE:
 				msg = "instruction decoding error";
 				break;
+			case STOP_TRACE_DIVERGED:
+				msg = "diverged from the expected basic blocks";
+				break;
 			default:
 				msg = "unknown error";
 		}
@@ -309,6 +320,21 @@ public:
 		cur_address = current_address;
 		cur_size = size;
 
+		// the concrete transmit block is not part of the program, so it is not checked (and not stepped with
+		// check_stop_points)
+		if (!expected_bbls.empty() && check_stop_points) {
+			if (expected_pos >= expected_bbls.size()) {
+				stop(STOP_NORMAL);
+				return;
+			}
+			if (expected_bbls[expected_pos] != current_address) {
+				stop(STOP_TRACE_DIVERGED);
+				return;
+			}
+			// only counted once the block is committed
+			expected_pending = true;
+		}
+
 		if (cur_steps >= max_steps) {
 			stop(STOP_NORMAL);
 		} else if (check_stop_points) {
@@ -382,6 +408,11 @@ public:
 		// clear memory rollback status
 		mem_writes.clear();
 		cur_steps++;
+
+		if (expected_pending) {
+			expected_pos++;
+			expected_pending = false;
+		}
 	}
 
 	/*
@@ -423,6 +454,7 @@ public:
 		// restore registers
 		uc_context_restore(uc, saved_regs);
 		bbl_addrs.pop_back();
+		expected_pending = false;
 	}
 
 	/*
@@ -525,6 +557,17 @@ public:
 		}
 	}
 
+	/*
+	 * set the list of basic blocks that execution must follow. execution stops as soon as it leaves the list.
+	 */
+
+	void set_expected_bbls(uint64_t count, uint64_t *bbls)
+	{
+		expected_bbls.assign(bbls, bbls + count);
+		expected_pos = 0;
+		expected_pending = false;
+	}
+
 	std::pair<uint64_t, size_t> cache_page(uint64_t address, size_t size, char* bytes, uint64_t permissions)
 	{
 		//printf("caching page %#lx - %#lx.\n", address, address + size);
@@ -1216,6 +1259,30 @@ void simunicorn_dealloc(State *state) {
 	delete state;
 }
 
+/*
+ * bulk register synchronization. all values are passed as uint64_t, registers that are smaller than that only use the
+ * low bytes.
+ */
+
+extern "C"
+uc_err simunicorn_write_registers(uc_engine *uc, uint64_t count, int *regs, uint64_t *values) {
+	std::vector<void *> ptrs(count);
+	for (uint64_t i = 0; i < count; i++) {
+		ptrs[i] = &values[i];
+	}
+	return uc_reg_write_batch(uc, regs, ptrs.data(), count);
+}
+
+extern "C"
+uc_err simunicorn_read_registers(uc_engine *uc, uint64_t count, int *regs, uint64_t *values) {
+	std::vector<void *> ptrs(count);
+	for (uint64_t i = 0; i < count; i++) {
+		values[i] = 0;
+		ptrs[i] = &values[i];
+	}
+	return uc_reg_read_batch(uc, regs, ptrs.data(), count);
+}
+
 extern "C"
 uint64_t *simunicorn_bbl_addrs(State *state) {
 	return &(state->bbl_addrs[0]);
@@ -1281,6 +1348,17 @@ void simunicorn_set_stops(State *state, uint64_t count, uint64_t *stops)
 	state->set_stops(count, stops);
 }
 
+extern "C"
+void simunicorn_set_expected_bbls(State *state, uint64_t count, uint64_t *bbls)
+{
+	state->set_expected_bbls(count, bbls);
+}
+
+extern "C"
+uint64_t simunicorn_expected_bbl_count(State *state) {
+	return state->expected_pos;
+}
+
 extern "C"
 void simunicorn_activate(State *state, uint64_t address, uint64_t length, uint8_t *taint) {
 	// //LOG_D("activate [%#lx, %#lx]", address, address + length);
@@ -0,0 +1,61 @@
+import sys
+import time
+import random
+
+from angr.analyses import bindiff
+
+
+def _synthetic_attributes(n, prefix, max_value):
+    # functions with (number of blocks, number of edges, number of calls) attributes, most of them small
+    attributes = { }
+    for i in range(n):
+        blocks = min(int(random.expovariate(1.0 / 12)) + 1, max_value)
+        edges = blocks + random.randint(0, blocks // 2 + 1)
+        calls = random.randint(0, blocks // 3 + 1)
+        attributes[(prefix, i)] = (blocks, edges, calls)
+    return attributes
+
+
+def _closest_matches_python(input_attributes, target_attributes):
+    # the all-pairs loop, as _get_closest_matches computes it without numpy
+    numpy = bindiff.numpy
+    bindiff.numpy = None
+    try:
+        return bindiff._get_closest_matches(input_attributes, target_attributes)
+    finally:
+        bindiff.numpy = numpy
+
+
+def perf_closest_matches():
+    if bindiff.numpy is None:
+        print("numpy is not installed")
+        return
+
+    random.seed(0)
+    for n in (500, 2000, 8000):
+        attributes_a = _synthetic_attributes(n, 'a', 2000)
+        attributes_b = _synthetic_attributes(n, 'b', 2000)
+
+        start = time.time()
+        python_matches = _closest_matches_python(attributes_a, attributes_b)
+        elapsed_python = time.time() - start
+
+        start = time.time()
+        numpy_matches = bindiff._get_closest_matches(attributes_a, attributes_b)
+        elapsed_numpy = time.time() - start
+
+        assert python_matches == numpy_matches
+        print("%d x %d functions: python %f sec, numpy %f sec" % (n, n, elapsed_python, elapsed_numpy))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        for arg in sys.argv[1:]:
+            print('perf_' + arg)
+            globals()['perf_' + arg]()
+
+    else:
+        for fk, fv in list(globals().items()):
+            if fk.startswith('perf_') and callable(fv):
+                print(fk)
+                res = fv()
@@ -0,0 +1,74 @@
+import sys
+import os
+import time
+import tracemalloc
+from collections import defaultdict
+
+import angr
+from angr.analyses import ddg
+
+test_location = str(os.path.join(os.path.dirname(os.path.realpath(__file__)), '../../'))
+
+
+class CopyingLiveDefinitions(ddg.LiveDefinitions):
+    """
+    The live definition collection DDG used to have: every branch copies all maps.
+    """
+    __slots__ = ( )
+
+    def __init__(self):
+        super(CopyingLiveDefinitions, self).__init__()
+        self._memory_map = defaultdict(frozenset)
+        self._register_map = defaultdict(frozenset)
+        self._defs = defaultdict(frozenset)
+
+    def branch(self):
+        ld = CopyingLiveDefinitions()
+        ld._memory_map = self._memory_map.copy()
+        ld._register_map = self._register_map.copy()
+        ld._defs = self._defs.copy()
+        return ld
+
+    def copy(self):
+        return self.branch()
+
+
+def _run_ddg(p, cfg, live_definitions_cls):
+    original = ddg.LiveDefinitions
+    ddg.LiveDefinitions = live_definitions_cls
+    try:
+        tracemalloc.start()
+        start = time.time()
+        d = p.analyses.DDG(cfg, start=p.entry)
+        elapsed = time.time() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        ddg.LiveDefinitions = original
+    return d, elapsed, peak
+
+
+def perf_ddg_live_definitions():
+    p = angr.Project(os.path.join(test_location, 'binaries', 'tests', 'x86_64', 'libc.so.6'),
+                     auto_load_libs=False)
+    cfg = p.analyses.CFGEmulated(starts=(p.entry, ), context_sensitivity_level=1, keep_state=True,
+                                 state_add_options=angr.sim_options.refs)
+    print("CFGEmulated: %d nodes" % len(cfg.graph))
+
+    for name, cls in (("copying", CopyingLiveDefinitions), ("copy-on-write", ddg.LiveDefinitions)):
+        d, elapsed, peak = _run_ddg(p, cfg, cls)
+        print("%s live definitions: %d DDG nodes, elapsed %f sec, peak memory %.1f MB" % (
+            name, len(d.graph), elapsed, peak / 1024.0 / 1024.0))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        for arg in sys.argv[1:]:
+            print('perf_' + arg)
+            globals()['perf_' + arg]()
+
+    else:
+        for fk, fv in list(globals().items()):
+            if fk.startswith('perf_') and callable(fv):
+                print(fk)
+                res = fv()
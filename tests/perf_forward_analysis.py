@@ -0,0 +1,118 @@
+import sys
+import os
+import time
+import random
+
+import angr
+from angr.analyses import forward_analysis
+from angr.analyses.forward_analysis import ForwardAnalysis, JobInfo, JobInfoQueue
+
+test_location = str(os.path.join(os.path.dirname(os.path.realpath(__file__)), '../../'))
+
+
+class ListJobInfoQueue(list):
+    """
+    The job queue ForwardAnalysis used to have: a sorted list.
+    """
+    def __init__(self, sorting_key):
+        super(ListJobInfoQueue, self).__init__()
+        self._sorting_key = sorting_key
+
+    def append(self, job_info):
+        if self._sorting_key is None:
+            super(ListJobInfoQueue, self).append(job_info)
+        else:
+            ForwardAnalysis._binary_insert(self, job_info, self._sorting_key)
+
+    def pop(self):  # pylint:disable=arguments-differ
+        return super(ListJobInfoQueue, self).pop(0)
+
+    def remove_if(self, predicate):
+        kept = [ job_info for job_info in self if not predicate(job_info) ]
+        removed = len(self) - len(kept)
+        self[:] = kept
+        return removed
+
+
+def _queue_workload(queue, n):
+    # insert n jobs, merge every other one into a new job (remove + reinsert), then drain the queue
+    random.seed(0)
+    job_infos = [ JobInfo(i, random.randint(0, n)) for i in range(n) ]
+
+    start = time.time()
+    for job_info in job_infos:
+        queue.append(job_info)
+    for job_info in job_infos[::2]:
+        queue.remove(job_info)
+        job_info.add_job(job_info.job + 1, merged=True)
+        queue.append(job_info)
+    popped = [ ]
+    while queue:
+        popped.append(queue.pop())
+    return time.time() - start, popped
+
+
+def perf_job_info_queue():
+    for n in (1000, 10000, 50000):
+        sorting_key = lambda job_info: job_info.job
+        elapsed_list, popped_list = _queue_workload(ListJobInfoQueue(sorting_key), n)
+        elapsed_heap, popped_heap = _queue_workload(JobInfoQueue(sorting_key), n)
+        # both queues must process the jobs in the same order
+        assert [ job_info.key for job_info in popped_list ] == [ job_info.key for job_info in popped_heap ]
+        print("%d jobs: sorted list %f sec, JobInfoQueue %f sec" % (n, elapsed_list, elapsed_heap))
+
+
+def _cfg_emulated_queue(p, queue_cls):
+    # measure how much time the analysis spends on its job queue
+    queue_time = [ 0.0 ]
+    def timed(func):
+        def wrapper(*args, **kwargs):
+            start = time.time()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                queue_time[0] += time.time() - start
+        return wrapper
+
+    originals = { name: getattr(queue_cls, name) for name in ('append', 'pop', 'remove', 'remove_if') }
+    for name, func in originals.items():
+        setattr(queue_cls, name, timed(func))
+    forward_analysis.JobInfoQueue = queue_cls
+
+    try:
+        start = time.time()
+        cfg = p.analyses.CFGEmulated(starts=(p.entry, ), context_sensitivity_level=1, keep_state=True)
+        elapsed = time.time() - start
+    finally:
+        forward_analysis.JobInfoQueue = JobInfoQueue
+        for name, func in originals.items():
+            setattr(queue_cls, name, func)
+
+    return cfg, elapsed, queue_time[0]
+
+
+def perf_cfg_emulated_queue():
+    p = angr.Project(os.path.join(test_location, 'binaries', 'tests', 'x86_64', 'libc.so.6'),
+                     auto_load_libs=False)
+
+    cfg_list, elapsed_list, queue_time_list = _cfg_emulated_queue(p, ListJobInfoQueue)
+    cfg, elapsed, queue_time = _cfg_emulated_queue(p, JobInfoQueue)
+
+    # both queues must produce the same graph
+    assert sorted((src.addr, dst.addr) for src, dst in cfg.graph.edges()) == \
+        sorted((src.addr, dst.addr) for src, dst in cfg_list.graph.edges())
+    print("CFGEmulated: %d nodes" % len(cfg.graph))
+    print("sorted list: elapsed %f sec, %f sec in the job queue" % (elapsed_list, queue_time_list))
+    print("JobInfoQueue: elapsed %f sec, %f sec in the job queue" % (elapsed, queue_time))
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        for arg in sys.argv[1:]:
+            print('perf_' + arg)
+            globals()['perf_' + arg]()
+
+    else:
+        for fk, fv in list(globals().items()):
+            if fk.startswith('perf_') and callable(fv):
+                print(fk)
+                res = fv()
@@ -1,6 +1,7 @@
 import angr
 from angr import SimState, SIM_PROCEDURES
 from angr.engines import SimEngineProcedure
+from angr import sim_options as o
 import nose
 
 FAKE_ADDR = 0x100000
@@ -16,5 +17,75 @@ def test_procedure_actions():
     nose.tools.assert_equal(s.solver.eval(rbx), 2)
     nose.tools.assert_equal(rbx.reg_deps, { s.arch.registers['rbx'][0] })
 
+def _access_memory(s):
+    s.memory.store(0x1000, s.solver.BVV(0x41424344, 32))
+    s.memory.load(0x1000, 4)
+    s.memory.store(0x2000, s.solver.BVS('x', 32))
+    s.memory.load(0x2000, 4)
+    s.memory.load(s.solver.BVS('addr', 64), 4)
+
+def _summarize(actions):
+    return [ (a.type, a.action, a.addr.ast.cache_key, a.data.ast.cache_key) for a in actions ]
+
+def test_compact_action_history():
+    plain = SimState(arch='AMD64', add_options={o.AUTO_REFS})
+    compact = SimState(arch='AMD64', add_options={o.AUTO_REFS, o.COMPACT_ACTION_HISTORY})
+    _access_memory(plain)
+    _access_memory(compact)
+
+    nose.tools.assert_equal(plain.history.recent_events[0].type, 'mem')
+    nose.tools.assert_equal(len(compact.history.recent_events), 0)
+    nose.tools.assert_equal(len(compact.history.recent_action_log), 5)
+    nose.tools.assert_equal(_summarize(compact.history.recent_actions), _summarize(plain.history.recent_actions))
+
+    # indexed lookups by memory address
+    for kwargs in ({'read_from': 0x1000}, {'write_to': 0x2000}, {'read_from': 'mem'}, {'write_to': 0x3000}):
+        nose.tools.assert_equal(_summarize(compact.history.filter_actions(**kwargs)),
+                                _summarize(plain.history.filter_actions(**kwargs)))
+
+    # the log is copied along with the state
+    c = compact.copy()
+    c.memory.load(0x1000, 4)
+    nose.tools.assert_equal(len(c.history.recent_action_log), 6)
+    nose.tools.assert_equal(len(compact.history.recent_action_log), 5)
+
+def test_compact_action_history_limit():
+    s = SimState(arch='AMD64', add_options={o.AUTO_REFS, o.COMPACT_ACTION_HISTORY})
+    s.history.action_limit = 4
+
+    for i in range(10):
+        s.memory.load(0x1000 + i, 1)
+    # a single history node only keeps the most recent actions
+    nose.tools.assert_equal(len(s.history.recent_action_log), 4)
+    nose.tools.assert_equal([ a.addr.ast.args[0] for a in s.history.recent_actions ], list(range(0x1006, 0x100a)))
+
+    # older history nodes are dropped as new ones are logged
+    for i in range(3):
+        s.register_plugin('history', s.history.make_child())
+        for j in range(4):
+            s.memory.load(0x2000 + i * 4 + j, 1)
+    nose.tools.assert_equal(len(s.history.filter_actions(read_from='mem')), 8)
+
+def test_compact_action_history_keeps_constraints():
+    s = SimState(arch='AMD64', add_options={o.AUTO_REFS, o.COMPACT_ACTION_HISTORY, o.TRACK_CONSTRAINT_ACTIONS})
+    s.history.action_limit = 4
+    x = s.solver.BVS('x', 32)
+    s.add_constraints(x > 5)
+    root = s.history
+
+    # constraints are never evicted, neither from a history node nor along the lineage
+    for i in range(3):
+        s.register_plugin('history', s.history.make_child())
+        s.add_constraints(x != i + 10)
+        for j in range(10):
+            s.memory.load(0x1000 + j, 1)
+        nose.tools.assert_equal(len(s.history.recent_action_log), 4)
+        nose.tools.assert_equal(len(s.history.recent_constraints), 1)
+    nose.tools.assert_equal(len(root.recent_constraints), 1)
+    nose.tools.assert_equal(len(s.history.constraints_since(None)), 4)
+
 if __name__ == '__main__':
     test_procedure_actions()
+    test_compact_action_history()
+    test_compact_action_history_limit()
+    test_compact_action_history_keeps_constraints()
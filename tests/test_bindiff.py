@@ -1,5 +1,10 @@
 import nose
+import pickle
+import random
+import sqlite3
+import tempfile
 import angr
+from angr.analyses import bindiff
 
 import logging
 l = logging.getLogger("angr.tests.test_bindiff")
@@ -36,6 +41,80 @@ def test_bindiff_x86_64():
     nose.tools.assert_in((0x400616, 0x400616), block_matches)
     nose.tools.assert_in((0x40061e, 0x40061e), block_matches)
 
+def test_bindiff_workers_and_cache():
+    b = angr.Project(test_location + "/x86_64/bindiff_a", load_options={"auto_load_libs": False})
+    b2 = angr.Project(test_location + "/x86_64/bindiff_b", load_options={"auto_load_libs": False})
+    cfg_a = b.analyses.CFGFast()
+    cfg_b = b2.analyses.CFGFast()
+
+    def summarize(diff):
+        return (sorted(diff.identical_functions), sorted(diff.differing_functions),
+                sorted((a.addr, b.addr) for a, b in diff.differing_blocks))
+
+    # count the function diffs that are computed in this process while functions are matched
+    computed = [ 0 ]
+    compute_diff = bindiff.FunctionDiff._compute_diff
+    def counting_compute_diff(self):
+        computed[0] += 1
+        return compute_diff(self)
+
+    fd, cache_path = tempfile.mkstemp(suffix='.sqlite')
+    os.close(fd)
+    bindiff.FunctionDiff._compute_diff = counting_compute_diff
+    try:
+        diff = b.analyses.BinDiff(b2, cfg_a=cfg_a, cfg_b=cfg_b)
+        nose.tools.assert_greater(computed[0], 0)
+        expected = summarize(diff)
+
+        # the first run fills the cache in worker processes, the second one takes all diffs from the cache
+        for _ in range(2):
+            computed[0] = 0
+            diff = b.analyses.BinDiff(b2, cfg_a=cfg_a, cfg_b=cfg_b, workers=2, diff_cache=cache_path)
+            nose.tools.assert_equal(computed[0], 0)
+            nose.tools.assert_equal(summarize(diff), expected)
+    finally:
+        bindiff.FunctionDiff._compute_diff = compute_diff
+        os.remove(cache_path)
+
+def test_diff_cache_entries():
+    fd, cache_path = tempfile.mkstemp(suffix='.sqlite')
+    os.close(fd)
+    try:
+        cache = bindiff.FunctionDiffCache(cache_path)
+        cache.put(b"diff", [ (0x400000, 0x500000), (0x400010, 0x500020) ])
+        nose.tools.assert_equal(cache.get(b"diff"), [ (0x400000, 0x500000), (0x400010, 0x500020) ])
+
+        # entries that are not lists of address pairs are treated as corrupted, and never executed
+        conn = sqlite3.connect(cache_path)
+        conn.execute("UPDATE diffs SET block_matches = ?", (pickle.dumps(os.getcwd),))
+        conn.commit()
+        conn.close()
+        nose.tools.assert_is_none(bindiff.FunctionDiffCache(cache_path).get(b"diff"))
+    finally:
+        os.remove(cache_path)
+
+def test_closest_matches_vectorized():
+    if bindiff.numpy is None:
+        raise nose.SkipTest("numpy is not installed")
+
+    random.seed(0)
+    for max_value in (3, 50, 10000):
+        attributes_a = { i: tuple(random.randint(0, max_value) for _ in range(3)) for i in range(300) }
+        attributes_b = { i: tuple(random.randint(0, max_value) for _ in range(3)) for i in range(200) }
+
+        vectorized = bindiff._get_closest_matches_vectorized(attributes_a, attributes_b)
+        numpy = bindiff.numpy
+        bindiff.numpy = None
+        try:
+            expected = bindiff._get_closest_matches(attributes_a, attributes_b)
+        finally:
+            bindiff.numpy = numpy
+        # the same matches, in the same order
+        nose.tools.assert_equal(vectorized, expected)
+
+    # attributes that cannot be compared exactly are left to the python implementation
+    nose.tools.assert_is_none(bindiff._get_closest_matches_vectorized({0: (0.5, 1)}, {0: (1, 1)}))
+
 def run_all():
     functions = globals()
     all_functions = dict(filter((lambda kv: kv[0].startswith('test_')), functions.items()))
@@ -1,9 +1,14 @@
 import angr
+from angr.engines import SimEngineVEX
 
 import logging
 l = logging.getLogger("angr.tests")
 
 import os
+import pickle
+import shutil
+import sqlite3
+import tempfile
 test_location = str(os.path.join(os.path.dirname(os.path.realpath(__file__)), '../../binaries/tests'))
 
 def test_block_cache():
@@ -15,5 +20,54 @@ def test_block_cache():
     b = p.factory.block(p.entry)
     assert p.factory.block(p.entry).vex is not b.vex
 
+def test_persistent_block_cache():
+    cache_dir = tempfile.mkdtemp()
+    try:
+        cache_path = os.path.join(cache_dir, "lift_cache.sqlite")
+        p = angr.Project(os.path.join(test_location, "x86_64", "fauxware"), translation_cache=False)
+
+        engine = SimEngineVEX(p, persistent_cache=cache_path)
+        b0 = engine.lift(clemory=p.loader.memory, addr=p.entry)
+        assert engine._persistent_cache_hits == 0
+        assert engine._persistent_cache_misses == 1
+
+        # a different engine, e.g. in another process, picks up the lifted block
+        engine = SimEngineVEX(p, persistent_cache=pickle.loads(pickle.dumps(engine.persistent_cache)))
+        b1 = engine.lift(clemory=p.loader.memory, addr=p.entry)
+        assert engine._persistent_cache_hits == 1
+        assert engine._persistent_cache_misses == 0
+        assert b1 is not b0
+        assert b1.arch is p.arch
+        assert b1.size == b0.size
+        assert b1.instruction_addresses == b0.instruction_addresses
+        assert str(b1) == str(b0)
+
+        # the lifting parameters are part of the key
+        engine.lift(clemory=p.loader.memory, addr=p.entry, opt_level=0)
+        engine.lift(clemory=p.loader.memory, addr=p.entry, num_inst=1)
+        assert engine._persistent_cache_misses == 2
+        assert len(engine.persistent_cache) == 3
+
+        # and so are the bytes
+        b2 = engine.lift(insn_bytes=b"\x90\xc3", arch=p.arch, addr=p.entry)
+        assert b2.size == 2
+        assert engine._persistent_cache_misses == 3
+
+        # the architecture is not stored with the blocks
+        conn = sqlite3.connect(cache_path)
+        assert all(b"archinfo" not in data for data, in conn.execute("SELECT irsb FROM irsbs"))
+
+        # entries that contain anything but pyvex objects are never loaded
+        conn.execute("UPDATE irsbs SET irsb = ?", (pickle.dumps(os.getcwd),))
+        conn.commit()
+        conn.close()
+        engine = SimEngineVEX(p, persistent_cache=cache_path)
+        engine.lift(clemory=p.loader.memory, addr=p.entry)
+        assert engine._persistent_cache_hits == 0
+        assert engine._persistent_cache_misses == 1
+    finally:
+        shutil.rmtree(cache_dir)
+
 if __name__ == "__main__":
     test_block_cache()
+    test_persistent_block_cache()
@@ -119,6 +119,32 @@ def run_manyfloatsum_symbolic(arch):
         nose.tools.assert_greater(arg_conc, 1.0)
     nose.tools.assert_equal(sum(args_conc), 27.7)
 
+def test_callable_map():
+    p = angr.Project(os.path.join(location, 'x86_64', 'manysum'))
+    cc = p.factory.cc(func_ty="int f(int, int, int, int, int, int, int, int, int, int, int)")
+    sumlots = p.factory.callable(addresses_manysum['x86_64'], cc=cc)
+    arg_tuples = [ tuple(range(i, i + 11)) for i in range(20) ]
+
+    for workers in (None, 2):
+        results = list(sumlots.map(arg_tuples, workers=workers, chunk_size=3))
+        nose.tools.assert_equal(len(results), len(arg_tuples))
+        for args, result in zip(arg_tuples, results):
+            nose.tools.assert_false(result.symbolic)
+            nose.tools.assert_equal(result._model_concrete.value, sum(args))
+
+    # symbolic arguments are not run through unicorn
+    x = claripy.BVS('x', 32)
+    result = next(sumlots.map([ (x,) + tuple(range(10)) ]))
+    nose.tools.assert_true(result.symbolic)
+
+    # the prepared states are dropped with the base state they were copied from
+    state = p.factory.blank_state(addr=addresses_manysum['x86_64'],
+                                  add_options={angr.options.SYMBOL_FILL_UNCONSTRAINED_MEMORY})
+    sumlots.set_base_state(state)
+    results = list(sumlots.map(arg_tuples[:2]))
+    nose.tools.assert_equal([ r._model_concrete.value for r in results ], [ sum(args) for args in arg_tuples[:2] ])
+    nose.tools.assert_in(angr.options.SYMBOL_FILL_UNCONSTRAINED_MEMORY, sumlots._batch_state(True).options)
+
 
 def test_fauxware():
     for arch in addresses_fauxware:
@@ -171,3 +197,5 @@ if __name__ == "__main__":
     for func, march in test_callable_c_manyfloatsum():
         print('* testing ' + march)
         func(march)
+    print('testing callable map')
+    test_callable_map()
@@ -1,12 +1,15 @@
 import os
 import logging
 import sys
+import multiprocessing
 
 import nose.tools
 
 import angr
 
-from angr.analyses.cfg.cfg_fast import SegmentList
+from angr.analyses.cfg.cfg_fast import CFGFast, SegmentList
+from angr.analyses.cfg.indirect_jump_resolvers import JumpTableResolver
+from angr.analyses.cfg.indirect_jump_resolvers.jumptable_fast import resolve_jump_table
 
 l = logging.getLogger("angr.tests.test_cfgfast")
 
@@ -317,6 +320,75 @@ def test_cfg_switches():
     for arch in arches:
         yield cfg_fast_edges_check, arch, filename, edges[arch]
 
+def check_jumptable_fast_path(arch):
+
+    path = os.path.join(test_location, arch, 'cfg_switches')
+
+    results = [ ]
+    for use_fast_path in (True, False):
+        proj = angr.Project(path, load_options={'auto_load_libs': False})
+        resolver = JumpTableResolver(proj, use_fast_path=use_fast_path)
+        cfg = proj.analyses.CFGFast(indirect_jump_resolvers=[ resolver ])
+        jumps = dict((addr, sorted(ij.resolved_targets)) for addr, ij in cfg.indirect_jumps.items()
+                     if ij.jumptable)
+        results.append((jumps, resolver.stats))
+
+    (fast_jumps, fast_stats), (slicing_jumps, slicing_stats) = results
+
+    # both paths must resolve the same jump tables
+    nose.tools.assert_equal(fast_jumps, slicing_jumps)
+    nose.tools.assert_equal(slicing_stats['fast'], 0)
+    nose.tools.assert_greater(fast_stats['fast'], 0)
+
+def test_jumptable_fast_path():
+    for arch in ('x86_64', 'armel'):
+        yield check_jumptable_fast_path, arch
+
+def test_jumptable_fast_path_predecessors():
+    path = os.path.join(test_location, 'x86_64', 'cfg_switches')
+    proj = angr.Project(path, load_options={'auto_load_libs': False})
+    cfg = proj.analyses.CFGFast()
+
+    class _CFGWithPredecessor(object):
+        # the CFG, with an extra predecessor for one block
+        def __init__(self, block_addr, pred_addr):
+            self.graph = cfg.graph.copy()
+            self.graph.add_edge(cfg.get_any_node(pred_addr), cfg.get_any_node(block_addr))
+            self.get_any_node = cfg.get_any_node
+            self._lift = cfg._lift
+
+    jumps = [ addr for addr, ij in cfg.indirect_jumps.items() if ij.jumptable and
+              resolve_jump_table(proj, cfg, addr, proj.factory.block(addr).vex, 2000) is not None ]
+    nose.tools.assert_greater(len(jumps), 0)
+    for addr in jumps:
+        # the bounds check of the table does not hold when the block is reached from the entry point
+        nose.tools.assert_is_none(resolve_jump_table(proj, _CFGWithPredecessor(addr, proj.entry), addr,
+                                                     proj.factory.block(addr).vex, 2000))
+
+def test_batch_indirect_jumps():
+
+    path = os.path.join(test_location, 'x86_64', 'cfg_switches')
+    proj = angr.Project(path, load_options={'auto_load_libs': False})
+
+    def functions(cfg):
+        return dict((func.addr, sorted(func.block_addrs)) for func in cfg.kb.functions.values())
+
+    resolver = JumpTableResolver(proj)
+    cfg = proj.analyses.CFGFast(indirect_jump_resolvers=[ resolver ])
+    edges = sorted((src.addr, dst.addr) for src, dst in cfg.graph.edges())
+    jump_tables = dict((addr, sorted(ij.jumptable_entries)) for addr, ij in cfg.jump_tables.items())
+
+    for workers in (None, 2):
+        resolver_batch = JumpTableResolver(proj)
+        cfg_batch = proj.analyses.CFGFast(indirect_jump_resolvers=[ resolver_batch ], batch_indirect_jumps=True,
+                                          workers=workers)
+        nose.tools.assert_equal(sorted((src.addr, dst.addr) for src, dst in cfg_batch.graph.edges()), edges)
+        nose.tools.assert_equal(dict((addr, sorted(ij.jumptable_entries)) for addr, ij in cfg_batch.jump_tables.items()),
+                                jump_tables)
+        nose.tools.assert_equal(functions(cfg_batch), functions(cfg))
+        # bookkeeping of the resolver must come back from worker processes, for unresolved jumps as well
+        nose.tools.assert_equal(resolver_batch.stats, resolver.stats)
+
 def test_segment_list_0():
     seg_list = SegmentList()
     seg_list.occupy(0, 1, "code")
@@ -417,6 +489,29 @@ def test_segment_list_6():
     nose.tools.assert_equal(seg_list._list[1].end, 30)
     nose.tools.assert_equal(seg_list._list[1].sort, 'code')
 
+def test_segment_list_7():
+    seg_list = SegmentList()
+
+    seg_list.occupy(0, 10, "code")
+    seg_list.occupy(10, 5, "nodecode")
+    seg_list.occupy(20, 10, "code")
+
+    # Split a segment, and release another one partially
+    seg_list.release(4, 8)
+
+    nose.tools.assert_equal(len(seg_list), 3)
+    nose.tools.assert_equal((seg_list._list[0].start, seg_list._list[0].end), (0, 4))
+    nose.tools.assert_equal((seg_list._list[1].start, seg_list._list[1].end), (12, 15))
+    nose.tools.assert_equal(seg_list._list[1].sort, "nodecode")
+    nose.tools.assert_equal(seg_list.is_occupied(11), False)
+    nose.tools.assert_equal(seg_list.occupied_size, 17)
+
+    # Release everything in between
+    seg_list.release(0, 25)
+    nose.tools.assert_equal(len(seg_list), 1)
+    nose.tools.assert_equal((seg_list._list[0].start, seg_list._list[0].end), (25, 30))
+    nose.tools.assert_equal(seg_list.occupied_size, 5)
+
 #
 # Indirect jump resolvers
 #
@@ -442,6 +537,37 @@ def test_resolve_x86_elf_pic_plt():
     return_targets = set(a.addr for a in simputs_successor)
     nose.tools.assert_equal(return_targets, { 0x400800, 0x40087e, 0x4008b6 })
 
+#
+# Incremental updates
+#
+
+def test_update_after_hooking():
+
+    path = os.path.join(test_location, 'x86_64', 'fauxware')
+    proj = angr.Project(path, auto_load_libs=False)
+
+    cfg = proj.analyses.CFGFast()
+    removed_block_addrs = set(cfg.kb.functions[0x4006ed].block_addrs_set)
+
+    # hook accepted()
+    proj.hook(0x4006ed, angr.SIM_PROCEDURES['stubs']['ReturnUnconstrained']())
+    cfg.update([ 0x4006ed ])
+
+    node = cfg.get_any_node(0x4006ed)
+    nose.tools.assert_equal(node.size, 0)
+    nose.tools.assert_equal(node.simprocedure_name, 'ReturnUnconstrained')
+
+    # the result should be the same as a CFG recovered from scratch
+    cfg_fresh = proj.analyses.CFGFast()
+    nose.tools.assert_equal(sorted(cfg.kb.functions), sorted(cfg_fresh.kb.functions))
+    nose.tools.assert_equal(sorted((n.addr, n.size) for n in cfg.graph.nodes()),
+                            sorted((n.addr, n.size) for n in cfg_fresh.graph.nodes()))
+
+    # data that was referenced by the removed blocks only is gone
+    nose.tools.assert_equal(sorted(cfg.memory_data), sorted(cfg_fresh.memory_data))
+    for data in cfg.memory_data.values():
+        nose.tools.assert_false(any(ref[0] in removed_block_addrs for ref in data.refs))
+
 #
 # Function names
 #
@@ -533,6 +659,46 @@ def test_collect_data_references():
     nose.tools.assert_equal(sneaky_str.sort, "string")
     nose.tools.assert_equal(sneaky_str.content, b"SOSNEAKY")
 
+#
+# Parallel lifting
+#
+
+def test_workers():
+
+    path = os.path.join(test_location, 'x86_64', 'fauxware')
+    proj = angr.Project(path, auto_load_libs=False)
+
+    cfg = proj.analyses.CFGFast(collect_data_references=True)
+    nodes = sorted((n.addr, n.size) for n in cfg.graph.nodes())
+    edges = sorted((src.addr, dst.addr) for src, dst in cfg.graph.edges())
+    functions = sorted(cfg.kb.functions)
+    memory_data = sorted(cfg.memory_data)
+
+    # lifting blocks in worker processes must not change the result
+    cfg = proj.analyses.CFGFast(collect_data_references=True, workers=2)
+    nose.tools.assert_equal(sorted((n.addr, n.size) for n in cfg.graph.nodes()), nodes)
+    nose.tools.assert_equal(sorted((src.addr, dst.addr) for src, dst in cfg.graph.edges()), edges)
+    nose.tools.assert_equal(sorted(cfg.kb.functions), functions)
+    nose.tools.assert_equal(sorted(cfg.memory_data), memory_data)
+
+def test_workers_stopped_on_error():
+
+    path = os.path.join(test_location, 'x86_64', 'fauxware')
+    proj = angr.Project(path, auto_load_libs=False)
+
+    def _scan_block(self, cfg_job):
+        raise ValueError("scanning failed")
+
+    original = CFGFast._scan_block
+    CFGFast._scan_block = _scan_block
+    try:
+        nose.tools.assert_raises(ValueError, proj.analyses.CFGFast, workers=2)
+    finally:
+        CFGFast._scan_block = original
+
+    # the lifting workers must not outlive the analysis
+    nose.tools.assert_equal(multiprocessing.active_children(), [ ])
+
 
 def run_all():
 
@@ -562,11 +728,20 @@ def run_all():
     for args in test_cfg_switches():
         args[0](*args[1:])
 
+    for args in test_jumptable_fast_path():
+        args[0](*args[1:])
+
+    test_jumptable_fast_path_predecessors()
+
+    test_update_after_hooking()
     test_resolve_x86_elf_pic_plt()
     test_function_names_for_unloaded_libraries()
     test_block_instruction_addresses_armhf()
     test_blanket_fauxware()
     test_collect_data_references()
+    test_workers()
+    test_workers_stopped_on_error()
+    test_batch_indirect_jumps()
 
 
 def main():
@@ -73,6 +73,39 @@ def test_ddg_0():
     binary_path = os.path.join(test_location, 'x86_64', 'datadep_test')
     perform_one(binary_path)
 
+def test_live_definitions_branch():
+    from angr.analyses.ddg import LiveDefinitions
+    from angr.analyses.code_location import CodeLocation
+    from angr.sim_variable import SimRegisterVariable, SimMemoryVariable
+
+    rax = SimRegisterVariable(16, 8)
+    mem = SimMemoryVariable(0x1000, 4)
+    loc0, loc1, loc2 = CodeLocation(0x400000, 1), CodeLocation(0x400010, 2), CodeLocation(0x400020, 3)
+
+    ld = LiveDefinitions()
+    nose.tools.assert_true(ld.add_def(rax, loc0))
+    nose.tools.assert_false(ld.add_def(rax, loc0))
+    ld.add_def(mem, loc0)
+
+    # branches do not see each other's changes
+    branch = ld.branch()
+    branch.add_def(rax, loc1)
+    branch.kill_def(mem, loc2)
+    nose.tools.assert_equal(ld.lookup_defs(rax), { loc0 })
+    nose.tools.assert_equal(ld.lookup_defs(mem), { loc0 })
+    nose.tools.assert_equal(branch.lookup_defs(rax), { loc0, loc1 })
+    nose.tools.assert_equal(branch.lookup_defs(mem), { loc2 })
+
+    ld.kill_def(rax, loc2)
+    nose.tools.assert_equal(ld.lookup_defs(rax), { loc2 })
+    nose.tools.assert_equal(branch.lookup_defs(rax), { loc0, loc1 })
+    nose.tools.assert_equal(dict(branch.items()), { rax: { loc0, loc1 }, mem: { loc2 } })
+
+    # a partial overwrite only kills the overwritten bytes
+    branch.kill_def(SimRegisterVariable(16, 1), loc2)
+    nose.tools.assert_equal(branch.lookup_defs(rax), { loc0, loc1, loc2 })
+    nose.tools.assert_equal(branch.lookup_defs(SimRegisterVariable(16, 1)), { loc2 })
+
 def run_all():
     functions = globals()
     all_functions = dict(filter((lambda kv: kv[0].startswith('test_') and hasattr(v, '__call__')), functions.items()))
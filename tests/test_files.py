@@ -11,5 +11,33 @@ def test_files():
     s.posix.get_fd(1).write_data(b"A"*0x1000, 0x800)
     assert s.posix.dumps(1) == b"A"*0x800
 
+def test_concrete_backing():
+    content = b"".join(bytes([i % 256]) * 0x10 for i in range(0x300))
+    s = angr.SimState(arch='AMD64')
+    f = angr.SimFile('concrete', content=bytearray(content))
+    s.register_plugin('file', f)
+    assert f.concrete
+    assert f.size == len(content)
+
+    # reads are served straight from the buffer, which is shared with copies
+    assert s.solver.eval(f.load(0x1ff8, 0x10), cast_to=bytes) == content[0x1ff8:0x2008]
+    c = s.copy()
+    assert c.file._backing is f._backing
+
+    # writes only affect the state that makes them
+    c.file.store(0x1000, b"HELLO")
+    assert c.file._overlay
+    assert c.solver.eval(c.file.load(0xffe, 8), cast_to=bytes) == content[0xffe:0x1000] + b"HELLO" + content[0x1005:0x1006]
+    assert s.solver.eval(f.load(0xffe, 8), cast_to=bytes) == content[0xffe:0x1006]
+    assert not f._overlay
+
+    # symbolic data can be written over concrete content
+    x = c.solver.BVS('x', 16)
+    c.file.store(0x2800, x)
+    data = c.file.load(0x27ff, 4)
+    assert data.symbolic
+    assert c.solver.eval_upto(data, 2) != [ s.solver.eval(f.load(0x27ff, 4)) ]
+
 if __name__ == '__main__':
     test_files()
+    test_concrete_backing()
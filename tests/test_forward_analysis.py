@@ -0,0 +1,98 @@
+import random
+
+import nose
+
+from angr.analyses.forward_analysis import ForwardAnalysis, JobInfo, JobInfoQueue, JobInfoList
+
+
+def _list_insert(lst, job_info, order_jobs):
+    # the reference behavior: a sorted list
+    if order_jobs:
+        ForwardAnalysis._binary_insert(lst, job_info, lambda elem: elem.job)
+    else:
+        lst.append(job_info)
+
+
+def _check_job_info_queue(order_jobs):
+    random.seed(0)
+    reference = [ ]
+    queue = JobInfoQueue(sorting_key=(lambda job_info: job_info.job) if order_jobs else None)
+
+    for _ in range(3000):
+        op = random.random()
+        if op < 0.5:
+            # there may be multiple JobInfo instances with the same key in the queue
+            job_info = JobInfo(random.randint(0, 50), random.randint(0, 20))
+            _list_insert(reference, job_info, order_jobs)
+            queue.append(job_info)
+        elif op < 0.7 and reference:
+            job_info = JobInfo(random.randint(0, 50), None)
+            nose.tools.assert_equal(job_info in reference, job_info in queue)
+            if job_info in reference:
+                reference.remove(job_info)
+                queue.remove(job_info)
+        elif op < 0.72:
+            key = random.randint(0, 50)
+            removed = len(reference)
+            reference = [ job_info for job_info in reference if job_info.key != key ]
+            removed -= len(reference)
+            nose.tools.assert_equal(queue.remove_if(lambda job_info, k=key: job_info.key == k), removed)
+        elif reference:
+            nose.tools.assert_is(queue[0], reference[0])
+            if random.random() < 0.1:
+                pos = random.randint(0, len(reference) - 1)
+                nose.tools.assert_is(queue[pos], reference[pos])
+            nose.tools.assert_is(queue.pop(), reference.pop(0))
+
+        nose.tools.assert_equal(len(queue), len(reference))
+        nose.tools.assert_equal(bool(queue), bool(reference))
+
+    nose.tools.assert_equal(list(queue), reference)
+
+
+def test_job_info_queue():
+    for order_jobs in (True, False):
+        yield _check_job_info_queue, order_jobs
+
+
+def test_job_info_list():
+    # sorting keys that change while jobs are queued, like the ones of VFG
+    random.seed(0)
+    offset = [ 0 ]
+    sorting_key = lambda job_info: (job_info.job + offset[0]) % 16
+    reference = [ ]
+    queue = JobInfoList(sorting_key)
+
+    for _ in range(3000):
+        op = random.random()
+        if op < 0.1:
+            offset[0] = random.randint(0, 15)
+        elif op < 0.55:
+            job_info = JobInfo(random.randint(0, 50), random.randint(0, 20))
+            ForwardAnalysis._binary_insert(reference, job_info, sorting_key)
+            queue.append(job_info)
+        elif op < 0.7 and reference:
+            job_info = JobInfo(random.randint(0, 50), None)
+            nose.tools.assert_equal(job_info in reference, job_info in queue)
+            if job_info in reference:
+                reference.remove(job_info)
+                queue.remove(job_info)
+        elif op < 0.72:
+            key = random.randint(0, 50)
+            removed = len(reference)
+            reference = [ job_info for job_info in reference if job_info.key != key ]
+            removed -= len(reference)
+            nose.tools.assert_equal(queue.remove_if(lambda job_info, k=key: job_info.key == k), removed)
+        elif reference:
+            nose.tools.assert_is(queue[0], reference[0])
+            nose.tools.assert_is(queue.pop(), reference.pop(0))
+
+        nose.tools.assert_equal(len(queue), len(reference))
+
+    nose.tools.assert_equal(list(queue), reference)
+
+
+if __name__ == "__main__":
+    for func, arg in test_job_info_queue():
+        func(arg)
+    test_job_info_list()
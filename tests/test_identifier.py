@@ -2,6 +2,13 @@ import angr
 import nose
 
 import os
+import pickle
+import sqlite3
+import tempfile
+
+from angr.analyses.identifier.func import Func
+from angr.analyses.identifier.functions import Functions
+from angr.analyses.identifier.verdict_cache import VerdictCache
 bin_location = str(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', '..', 'binaries'))
 
 import logging
@@ -19,6 +26,73 @@ def test_comparison_identification():
     for addr, symbol in true_symbols.items():
         nose.tools.assert_equal(true_symbols[addr], seen[addr])
 
+def test_identification_workers_and_cache():
+    true_symbols = {0x804a3d0: 'strncmp', 0x804a0f0: 'strcmp', 0x8048e60: 'memcmp', 0x8049f40: 'strcasecmp'}
+
+    p = angr.Project(os.path.join(bin_location, "tests", "i386", "identifiable"))
+    cfg = p.analyses.CFGFast(resolve_indirect_jumps=True)
+    fd, cache_path = tempfile.mkstemp(suffix='.sqlite')
+    os.close(fd)
+    try:
+        for _ in range(2):
+            # the second run takes the clean verdicts from the cache
+            idfer = p.analyses.Identifier(cfg=cfg, require_predecessors=False, workers=2, verdict_cache=cache_path,
+                                          only_find=set(true_symbols.values()))
+            seen = dict(idfer.run())
+            for addr, symbol in true_symbols.items():
+                nose.tools.assert_equal(symbol, seen[addr])
+    finally:
+        os.remove(cache_path)
+
+class _ErroringFunc(Func):
+    def pre_test(self, func, runner):
+        raise angr.errors.AngrError("this test does not complete")
+
+class _RejectingFunc(Func):
+    def pre_test(self, func, runner):
+        return False
+
+def test_verdicts_of_failed_tests_are_not_clean():
+    p = angr.Project(os.path.join(bin_location, "tests", "i386", "identifiable"))
+    cfg = p.analyses.CFGFast(resolve_indirect_jumps=True)
+    idfer = p.analyses.Identifier(cfg=cfg, require_predecessors=False, only_find=set())
+    func = cfg.functions[0x804a0f0]
+
+    # a verdict that comes from an error must not be cached
+    nose.tools.assert_equal(idfer._check_tests(func, _ErroringFunc()), (False, False))
+    nose.tools.assert_equal(idfer._check_tests(func, _RejectingFunc()), (False, True))
+
+def test_verdict_cache_entries():
+    fd, cache_path = tempfile.mkstemp(suffix='.sqlite')
+    os.close(fd)
+    try:
+        cache = VerdictCache(cache_path)
+
+        # a verdict is stored as the name and the attributes of the matching function
+        f = Functions['atoi']()
+        f.skips_whitespace = True
+        cache.put(b"match", f)
+        cache.put(b"no match", None)
+        cached, verdict = cache.get(b"match")
+        nose.tools.assert_true(cached)
+        nose.tools.assert_is_instance(verdict, Functions['atoi'])
+        nose.tools.assert_true(verdict.skips_whitespace)
+        nose.tools.assert_equal(cache.get(b"no match"), (True, None))
+
+        # verdicts that are not plain data are not cached
+        f.skips_whitespace = _RejectingFunc()
+        cache.put(b"not plain", f)
+        nose.tools.assert_equal(cache.get(b"not plain"), (False, None))
+
+        # and entries that are not plain data are never loaded
+        conn = sqlite3.connect(cache_path)
+        conn.execute("UPDATE verdicts SET verdict = ?", (pickle.dumps(os.getcwd),))
+        conn.commit()
+        conn.close()
+        nose.tools.assert_equal(VerdictCache(cache_path).get(b"match"), (False, None))
+    finally:
+        os.remove(cache_path)
+
 def run_all():
     functions = globals()
     all_functions = dict(filter((lambda kv: kv[0].startswith('test_')), functions.items()))
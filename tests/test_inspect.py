@@ -295,9 +295,42 @@ def test_inspect_engine_process():
                     condition=second_symbolic_fork)
     pg.run()
 
+def test_inspect_armed():
+    s = SimState(arch="AMD64", mode="symbolic")
+    nose.tools.assert_false(s.inspect.is_armed('mem_read'))
+    nose.tools.assert_false(s._inspect_armed('mem_read'))
+
+    reads = [ ]
+    bp = s.inspect.b('mem_read', when=BP_AFTER, mem_read_address=0x1000,
+                     action=lambda st: reads.append(st.inspect.mem_read_expr))
+    nose.tools.assert_true(s.inspect.is_armed('mem_read'))
+    nose.tools.assert_false(s.inspect.is_armed('mem_write'))
+
+    # copies keep their breakpoints armed
+    s2 = s.copy()
+    nose.tools.assert_true(s2._inspect_armed('mem_read'))
+
+    # concrete filters match without the solver, and symbolic ones still go through it
+    s.memory.store(0x1000, s.solver.BVV(0x41, 8))
+    s.memory.load(0x1000, 1)
+    s.memory.load(0x2000, 1)
+    s.memory.load(s.solver.BVV(0x1000, 64), 1)
+    nose.tools.assert_equal(len(reads), 2)
+    x = s.solver.BVS('x', 64)
+    s.add_constraints(x == 0x1000)
+    s.memory.load(x, 1)
+    nose.tools.assert_equal(len(reads), 3)
+
+    s.inspect.remove_breakpoint('mem_read', bp)
+    nose.tools.assert_false(s.inspect.is_armed('mem_read'))
+    s.memory.load(0x1000, 1)
+    nose.tools.assert_equal(len(reads), 3)
+    nose.tools.assert_true(s2.inspect.is_armed('mem_read'))
+
 if __name__ == '__main__':
     test_inspect_concretization()
     test_inspect_exit()
     test_inspect_syscall()
     test_inspect()
     test_inspect_engine_process()
+    test_inspect_armed()
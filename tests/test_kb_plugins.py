@@ -3,6 +3,7 @@ import angr
 import networkx
 
 import os
+import tempfile
 location = str(os.path.join(os.path.dirname(os.path.realpath(__file__)), '../../binaries/tests'))
 
 
@@ -20,5 +21,57 @@ def test_kb_plugins():
     nose.tools.assert_is_instance(p.kb.unresolved_indirect_jumps, set)
 
 
+def test_kb_snapshot():
+    p = angr.Project(location + "/x86_64/fauxware", auto_load_libs=False)
+    cfg = p.analyses.CFGFast()
+    p.kb.comments[0x40071d] = "main"
+
+    fd, path = tempfile.mkstemp(suffix=".kb")
+    os.close(fd)
+    try:
+        p.kb.save_snapshot(path)
+        kb = angr.KnowledgeBase.load_snapshot(p, path)
+
+        # nothing is loaded before it is accessed
+        nose.tools.assert_true(kb.has_plugin('functions'))
+        nose.tools.assert_equal(len(kb._plugins), 0)
+        nose.tools.assert_equal(len(kb.functions), len(cfg.kb.functions))
+        nose.tools.assert_equal(len(kb.functions._function_map._functions), 0)
+
+        nose.tools.assert_equal(list(kb.functions), list(cfg.kb.functions))
+        for addr, func in cfg.kb.functions.items():
+            loaded = kb.functions[addr]
+            nose.tools.assert_equal(loaded.name, func.name)
+            nose.tools.assert_equal(loaded.returning, func.returning)
+            nose.tools.assert_equal(loaded.is_plt, func.is_plt)
+            nose.tools.assert_equal(set(loaded.block_addrs), set(func.block_addrs))
+            nose.tools.assert_equal(sorted((src.addr, dst.addr) for src, dst in loaded.graph.edges()),
+                                    sorted((src.addr, dst.addr) for src, dst in func.graph.edges()))
+            nose.tools.assert_equal(sorted(n.addr for n in loaded.endpoints), sorted(n.addr for n in func.endpoints))
+
+        nose.tools.assert_equal(sorted(kb.callgraph.edges()), sorted(cfg.kb.callgraph.edges()))
+        nose.tools.assert_equal(kb.labels.lookup('main'), p.kb.labels.lookup('main'))
+        nose.tools.assert_equal(kb.comments[0x40071d], "main")
+
+        # callees in transition graphs are the functions of the loaded knowledge base
+        main = kb.functions['main']
+        callees = [ dst for _, dst, data in main.transition_graph.edges(data=True) if data['type'] == 'call' ]
+        nose.tools.assert_true(callees)
+        for callee in callees:
+            nose.tools.assert_is(callee, kb.functions[callee.addr])
+
+        # callees that are reached through transition graphs load their bodies as well
+        kb = angr.KnowledgeBase.load_snapshot(p, path)
+        main = kb.functions['main']
+        callees = [ dst for _, dst, data in main.transition_graph.edges(data=True) if data['type'] == 'call' ]
+        for callee in callees:
+            func = cfg.kb.functions[callee.addr]
+            nose.tools.assert_equal(set(callee.block_addrs), set(func.block_addrs))
+            nose.tools.assert_equal(sorted(n.addr for n in callee.endpoints), sorted(n.addr for n in func.endpoints))
+    finally:
+        os.remove(path)
+
+
 if __name__ == '__main__':
     test_kb_plugins()
+    test_kb_snapshot()
@@ -1,5 +1,6 @@
 import time
 import os
+import pickle
 
 import claripy
 import nose
@@ -646,7 +647,171 @@ def test_crosspage_read():
     assert bytes.fromhex("77665544") in state.solver.eval(r, cast_to=bytes)
     #assert s.solver.eval(r, 2) == ( 0xffeeddccbbaa998877665544, )
 
+def test_copy_on_write_pages():
+    s = SimState(arch='AMD64')
+    s.memory.store(0x1000, b"ABCD")
+    s.memory.store(0x2000, b"EFGH")
+
+    # forking does not copy any page
+    s2 = s.copy()
+    nose.tools.assert_is(s.memory.mem._pages, s2.memory.mem._pages)
+    nose.tools.assert_equal(s2.memory.mem.shared_pages, len(s2.memory.mem._pages))
+
+    # the first write to a shared page clones it, the other pages stay shared
+    cloned = s2.memory.mem.cloned_pages
+    s2.memory.store(0x1000, b"abcd")
+    nose.tools.assert_equal(s2.memory.mem.cloned_pages, cloned + 1)
+    nose.tools.assert_is_not(s.memory.mem._pages[1], s2.memory.mem._pages[1])
+    nose.tools.assert_is(s.memory.mem._pages[2], s2.memory.mem._pages[2])
+    nose.tools.assert_equal(s.solver.eval(s.memory.load(0x1000, 4), cast_to=bytes), b"ABCD")
+    nose.tools.assert_equal(s2.solver.eval(s2.memory.load(0x1000, 4), cast_to=bytes), b"abcd")
+
+    # the page is no longer shared, so the original state writes to it in place
+    page = s.memory.mem._pages[1]
+    s.memory.store(0x1001, b"X")
+    nose.tools.assert_is(s.memory.mem._pages[1], page)
+    nose.tools.assert_equal(s2.solver.eval(s2.memory.load(0x1000, 4), cast_to=bytes), b"abcd")
+
+    # once a sibling is gone, its pages are not shared anymore
+    s3 = s2.copy()
+    nose.tools.assert_equal(s2.memory.mem.shared_pages, len(s2.memory.mem._pages))
+    del s3
+    page = s2.memory.mem._pages[1]
+    s2.memory.store(0x1000, b"efgh")
+    nose.tools.assert_is(s2.memory.mem._pages[1], page)
+    nose.tools.assert_equal(s.solver.eval(s.memory.load(0x1000, 4), cast_to=bytes), b"AXCD")
+
+def test_concrete_memory_find():
+    s = SimState(arch='AMD64')
+    # spans several memory objects and a page boundary
+    s.memory.store(0x1ff0, b"0123456789")
+    s.memory.store(0x1ffa, b"abcdefghij")
+    s.memory.store(0x2004, b"klmnop\0")
+
+    r, c, m = s.memory.find(0x1ff0, b"ghi", max_search=0x20)
+    nose.tools.assert_equal(s.solver.eval(r), 0x2000)
+    nose.tools.assert_equal(m, [ 0x10 ])
+    nose.tools.assert_true(all(s.solver.is_true(x) for x in c))
+
+    r, _, m = s.memory.find(0x1ff0, b"\0", max_search=0x20)
+    nose.tools.assert_equal(s.solver.eval(r), 0x200a)
+    nose.tools.assert_equal(m, [ 0x1a ])
+
+    # not found within max_search
+    r, _, m = s.memory.find(0x1ff0, b"p", max_search=0x10, default=0)
+    nose.tools.assert_equal(s.solver.eval(r), 0)
+    nose.tools.assert_equal(m, [ ])
+
+    # the search continues symbolically from the first symbolic byte
+    s.memory.store(0x3000, b"AB")
+    s.memory.store(0x3002, s.solver.BVS('sym', 8))
+    s.memory.store(0x3003, b"C\0")
+    r, c, m = s.memory.find(0x3000, b"C", max_search=0x10)
+    nose.tools.assert_equal(m, [ 2, 3 ])
+    s.add_constraints(*c)
+    nose.tools.assert_equal(sorted(s.solver.eval_upto(r, 3)), [ 0x3002, 0x3003 ])
+
+    # breakpoints on reads still see the search
+    reads = [ ]
+    s.inspect.b('mem_read', when='after', action=lambda st: reads.append(st.inspect.mem_read_address))
+    r, _, _ = s.memory.find(0x1ff0, b"ghi", max_search=0x20)
+    nose.tools.assert_equal(s.solver.eval(r), 0x2000)
+    nose.tools.assert_not_equal(reads, [ ])
+
+def test_changed_ranges():
+    s = SimState(arch='AMD64')
+    s.memory.store(0x1000, b"ABCDEFGH")
+    s.memory.store(0x1ffc, b"IJKLMNOP")
+    s.memory.store(0x3000, s.solver.BVS('sym', 64))
+
+    s2 = s.copy()
+    nose.tools.assert_equal(s.memory.changed_ranges(s2.memory), [ ])
+
+    # same bytes in a different memory object are not a change
+    s2.memory.store(0x1002, b"CD")
+    nose.tools.assert_equal(s.memory.changed_ranges(s2.memory), [ ])
+
+    s2.memory.store(0x1001, b"bcX")
+    s2.memory.store(0x1ffe, b"klmn")
+    s2.memory.store(0x3002, s2.memory.load(0x3004, 2))
+    s2.memory.store(0x4000, b"QRST")
+    nose.tools.assert_equal(s.memory.changed_ranges(s2.memory),
+                            [ (0x1001, 0x1004), (0x1ffe, 0x2002), (0x3002, 0x3004), (0x4000, 0x4004) ])
+    nose.tools.assert_equal(s2.memory.changed_ranges(s.memory), s.memory.changed_ranges(s2.memory))
+    nose.tools.assert_equal(s.memory.changed_bytes(s2.memory),
+                            { 0x1001, 0x1002, 0x1003, 0x1ffe, 0x1fff, 0x2000, 0x2001, 0x3002, 0x3003,
+                              0x4000, 0x4001, 0x4002, 0x4003 })
+
+    # pages that are only in the memory backer are compared without adding them to the page table
+    s = SimState(arch='AMD64', memory_backer={ 0x5000: b'A', 0x5001: b'A', 0x5002: b'A', 0x5003: b'A' })
+    s2 = s.copy()
+    s2.memory.store(0x5001, b"B")
+    nose.tools.assert_not_in(5, s.memory.mem._pages)
+    nose.tools.assert_equal(s.memory.changed_ranges(s2.memory), [ (0x5001, 0x5002) ])
+    nose.tools.assert_equal(s2.memory.changed_ranges(s.memory), [ (0x5001, 0x5002) ])
+    nose.tools.assert_not_in(5, s.memory.mem._pages)
+    nose.tools.assert_is_none(s.memory.mem.page_versions(0x5000, 0x6000))
+    nose.tools.assert_not_in(5, s.memory.mem._pages)
+
+def test_page_versions():
+    s = SimState(arch='AMD64')
+    s.memory.store(0x1000, b"ABCD")
+    s.memory.store(0x2000, b"EFGH")
+    versions = s.memory.mem.page_versions(0x1000, 0x3000)
+    nose.tools.assert_equal(len(versions), 2)
+
+    # copies share their pages until one of them writes
+    s2 = s.copy()
+    nose.tools.assert_equal(s2.memory.mem.page_versions(0x1000, 0x3000), versions)
+    s2.memory.store(0x2002, b"gh")
+    nose.tools.assert_equal(s2.memory.mem.page_versions(0x1000, 0x2000), versions[:1])
+    nose.tools.assert_not_equal(s2.memory.mem.page_versions(0x2000, 0x3000), versions[1:])
+    nose.tools.assert_equal(s.memory.mem.page_versions(0x1000, 0x3000), versions)
+
+    # permissions are part of the version
+    s2.memory.permissions(0x1000, 1)
+    nose.tools.assert_not_equal(s2.memory.mem.page_versions(0x1000, 0x2000), versions[:1])
+
+def test_page_generations_across_processes():
+    if not hasattr(os, 'fork'):
+        raise nose.SkipTest("fork() is not available")
+
+    s = SimState(arch='AMD64')
+    s.memory.store(0x1000, b"ABCD")
+
+    # the child and the parent both modify the same page right after the fork, so a per-process generation counter
+    # would hand out the same generation to both
+    r, w = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            os.close(r)
+            s.memory.store(0x1000, b"EFGH")
+            with os.fdopen(w, 'wb') as f:
+                pickle.dump(s, f)
+        finally:
+            os._exit(0)
+    os.close(w)
+    s.memory.store(0x1000, b"IJKL")
+    with os.fdopen(r, 'rb') as f:
+        child = pickle.load(f)
+    os.waitpid(pid, 0)
+
+    nose.tools.assert_equal(s.memory.changed_ranges(child.memory), [ (0x1000, 0x1004) ])
+    nose.tools.assert_not_equal(s.memory.mem.page_versions(0x1000, 0x2000),
+                                child.memory.mem.page_versions(0x1000, 0x2000))
+
+    merged, _, merging_occurred = s.merge(child)
+    nose.tools.assert_true(merging_occurred)
+    nose.tools.assert_equal(set(merged.solver.eval_upto(merged.memory.load(0x1000, 4), 3, cast_to=bytes)),
+                            { b"EFGH", b"IJKL" })
+
 if __name__ == '__main__':
+    test_page_generations_across_processes()
+    test_concrete_memory_find()
+    test_changed_ranges()
+    test_page_versions()
+    test_copy_on_write_pages()
     test_crosspage_read()
     test_fast_memory()
     test_load_bytes()
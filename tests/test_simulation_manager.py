@@ -121,12 +121,56 @@ def test_explore_with_cfg():
     nose.tools.assert_equal(pg.found[1].addr, 0x4006ED)
     nose.tools.assert_equal(pg.avoid[0].addr, 0x4007C9)
 
+def test_process_pool():
+    p = angr.Project(os.path.join(location, 'x86_64', 'fauxware'), load_options={'auto_load_libs': False})
+
+    serial = p.factory.simulation_manager()
+    serial.run()
+
+    pg = p.factory.simulation_manager()
+    cache = pg.use_solver_query_cache()
+    with pg.use_technique(angr.exploration_techniques.ProcessPool(workers=2)):
+        pg.run()
+
+    nose.tools.assert_equal(len(pg.active), 0)
+    nose.tools.assert_equal(len(pg.deadended), len(serial.deadended))
+    nose.tools.assert_equal(sorted(tuple(s.history.bbl_addrs) for s in pg.deadended),
+                            sorted(tuple(s.history.bbl_addrs) for s in serial.deadended))
+    nose.tools.assert_true(any(b"SOSNEAKY" in s.posix.dumps(0) for s in pg.deadended))
+    # states stepped in the workers share the cache of the simulation manager again
+    nose.tools.assert_true(all(s.solver.query_cache is cache for s in pg.deadended))
+
+    # filters and selectors, of the caller and of other techniques, are applied before the states are stepped
+    stepped = [ ]
+    def filter_func(state):
+        return 'stopped' if state.addr == 0x4007C9 else None
+    def selector_func(state):
+        stepped.append(state.addr)
+        return state.addr != 0x400692
+
+    serial = p.factory.simulation_manager()
+    serial.use_technique(angr.exploration_techniques.Explorer(find=0x4006ED))
+    serial.run(n=20, filter_func=filter_func, selector_func=selector_func)
+    serial_stepped, stepped[:] = stepped[:], [ ]
+
+    pg = p.factory.simulation_manager()
+    pg.use_technique(angr.exploration_techniques.Explorer(find=0x4006ED))
+    with pg.use_technique(angr.exploration_techniques.ProcessPool(workers=2, min_states=1)):
+        pg.run(n=20, filter_func=filter_func, selector_func=selector_func)
+
+    nose.tools.assert_equal(stepped, serial_stepped)
+    for stash in ('active', 'found', 'stopped', 'deadended'):
+        nose.tools.assert_equal(sorted(s.addr for s in pg.stashes[stash]),
+                                sorted(s.addr for s in serial.stashes[stash]), stash)
+
 if __name__ == "__main__":
     logging.getLogger('angr.sim_manager').setLevel('DEBUG')
     print('explore_with_cfg')
     test_explore_with_cfg()
     print('find_to_middle')
     test_find_to_middle()
+    print('process_pool')
+    test_process_pool()
 
     for func, march, threads in test_fauxware():
         print('testing ' + march)
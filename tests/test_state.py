@@ -222,6 +222,36 @@ def test_state_pickle():
     s = pickle.loads(sp)
     nose.tools.assert_equal(s.solver.eval(s.memory.load(100, 10), cast_to=bytes), b"AAABAABABC")
 
+def test_history_index():
+    s = SimState(arch="AMD64")
+    hist = s.history
+    for i in range(1000):
+        hist = hist.make_child()
+        hist.recent_bbl_addrs = [ 0x1000 + j for j in range(i % 4) ]
+        hist.jumpkind = 'Ijk_Call' if i % 3 == 0 else None
+
+    for it in (hist.bbl_addrs, hist.jumpkinds, hist.lineage):
+        items = it.hardcopy
+        for k in (1, 2, 3, 17, 255, len(items) // 2, len(items)):
+            nose.tools.assert_is(it[-k], items[-k])
+        nose.tools.assert_raises(IndexError, it.__getitem__, -len(items) - 1)
+    nose.tools.assert_equal(hist.bbl_addrs.count(0x1002), 250)
+
+    # the index follows changes of the parent
+    child = hist.make_child()
+    child.recent_bbl_addrs = [ 0x2000 ]
+    nose.tools.assert_equal(child.bbl_addrs[-2], 0x1002)
+    child.parent = s.history
+    nose.tools.assert_equal(child.bbl_addrs.hardcopy, [ 0x2000 ])
+    nose.tools.assert_raises(IndexError, child.bbl_addrs.__getitem__, -2)
+    nose.tools.assert_is(child.lineage[-2], s.history)
+
+    # pickling keeps the lineage
+    addrs = hist.bbl_addrs.hardcopy
+    hist = pickle.loads(pickle.dumps(hist))
+    nose.tools.assert_equal(hist.bbl_addrs.hardcopy, addrs)
+    nose.tools.assert_equal(hist.bbl_addrs[-100], addrs[-100])
+
 def test_global_condition():
     s = SimState(arch="AMD64")
 
@@ -256,6 +286,51 @@ def test_global_condition():
         nose.tools.assert_equal(s.solver.eval_upto(s.regs.rbx, 10), [ 1 ])
         nose.tools.assert_sequence_equal(s.solver.eval_upto(s.regs.rax, 10), [ 25 ])
 
+def test_solver_query_cache():
+    s = SimState(arch="AMD64")
+    cache = angr.state_plugins.SolverQueryCache(max_entries=4)
+    s.solver.query_cache = cache
+
+    x = s.solver.BVS('x', 32)
+    s.add_constraints(x > 10, x < 20)
+    nose.tools.assert_equal(s.solver.min(x), 11)
+    nose.tools.assert_equal(cache.misses, 1)
+
+    # copies share the cache, and siblings with the same constraints reuse each other's answers
+    a = s.copy()
+    b = s.copy()
+    nose.tools.assert_is(a.solver.query_cache, cache)
+    nose.tools.assert_equal(a.solver.max(x), 19)
+    nose.tools.assert_equal(b.solver.max(x), 19)
+    nose.tools.assert_equal(b.solver.min(x), 11)
+    nose.tools.assert_equal(cache.hits, 2)
+
+    # the cache is not pickled with the states, since it is shared and only valid in this process
+    nose.tools.assert_is_none(pickle.loads(pickle.dumps(a, -1)).solver.query_cache)
+    nose.tools.assert_is(a.solver.query_cache, cache)
+
+    # different constraints make a different query
+    b.add_constraints(x != 19)
+    nose.tools.assert_equal(b.solver.max(x), 18)
+    nose.tools.assert_true(b.solver.satisfiable())
+    nose.tools.assert_false(b.solver.satisfiable(extra_constraints=(x == 19,)))
+    nose.tools.assert_equal(cache.hits, 2)
+
+    # the least recently used answers are evicted
+    nose.tools.assert_equal(len(cache), 4)
+
+    # approximate answers are never cached
+    h = SimState(arch="AMD64", add_options={angr.options.APPROXIMATE_SATISFIABILITY})
+    h.solver.query_cache = cache
+    h.add_constraints(x > 10, x < 20)
+    misses = cache.misses
+    h.solver.max(x)
+    h.solver.max(x)
+    nose.tools.assert_equal((cache.hits, cache.misses), (2, misses))
+    nose.tools.assert_equal(h.solver.max(x, exact=True), 19)
+    nose.tools.assert_equal(h.solver.max(x, exact=True), 19)
+    nose.tools.assert_equal((cache.hits, cache.misses), (3, misses + 1))
+
 
 if __name__ == '__main__':
     test_state()
@@ -266,3 +341,5 @@ if __name__ == '__main__':
     test_state_merge_static()
     test_state_pickle()
     test_global_condition()
+    test_history_index()
+    test_solver_query_cache()
@@ -2,13 +2,15 @@ from __future__ import print_function
 import os
 import sys
 import logging
+import tempfile
 
 import nose
 import angr
+from angr.exploration_techniques.compact_trace import CompactTrace
 
 from common import bin_location, do_trace, slow_test
 
-def tracer_cgc(filename, test_name, stdin):
+def tracer_cgc(filename, test_name, stdin, **kwargs):
     p = angr.Project(filename)
     p.simos.syscall_library.update(angr.SIM_LIBRARIES['cgcabi_tracer'])
 
@@ -17,7 +19,7 @@ def tracer_cgc(filename, test_name, stdin):
     s.preconstrainer.preconstrain_file(stdin, s.posix.stdin, True)
 
     simgr = p.factory.simulation_manager(s, hierarchy=False, save_unconstrained=crash_mode)
-    t = angr.exploration_techniques.Tracer(trace, crash_addr=crash_addr, keep_predecessors=1)
+    t = angr.exploration_techniques.Tracer(trace, crash_addr=crash_addr, keep_predecessors=1, **kwargs)
     simgr.use_technique(t)
     simgr.use_technique(angr.exploration_techniques.Oppologist())
 
@@ -122,6 +124,20 @@ def test_cgc_se1_palindrome_raw():
     nose.tools.assert_true(simgr.crashed)
 
 
+def test_unicorn_trace_slice():
+    b = os.path.join(bin_location, "tests/cgc/sc1_0b32aa01_01")
+
+    simgr, _ = tracer_cgc(b, 'tracer_cgc_se1_palindrome_raw_nocrash', b'racecar\n')
+    simgr.run()
+    simgr_sliced, _ = tracer_cgc(b, 'tracer_cgc_se1_palindrome_raw_nocrash', b'racecar\n', unicorn_trace_slice=4096)
+    simgr_sliced.run()
+
+    # following the trace in unicorn does not change the result
+    nose.tools.assert_true(simgr_sliced.traced)
+    nose.tools.assert_equal(simgr_sliced.traced[0].globals['trace_idx'], simgr.traced[0].globals['trace_idx'])
+    nose.tools.assert_equal(simgr_sliced.traced[0].posix.dumps(1), simgr.traced[0].posix.dumps(1))
+
+
 def test_symbolic_sized_receives():
     b = os.path.join(bin_location, "tests/cgc/CROMU_00070")
 
@@ -170,6 +186,29 @@ def test_fauxware():
     nose.tools.assert_true('traced' in simgr.stashes)
 
 
+def test_compact_trace():
+    trace = [ 0x400000 + (i * 0x1234) % 0x10000 for i in range(3000) ] + [ 0x7fff00001000, 0x400100 ]
+
+    fd, path = tempfile.mkstemp(suffix='.trace')
+    os.close(fd)
+    try:
+        CompactTrace.write(path, trace, interval=100)
+        # most deltas fit in two or three bytes
+        nose.tools.assert_less(os.path.getsize(path), len(trace) * 4)
+
+        t = CompactTrace(path)
+        nose.tools.assert_equal(len(t), len(trace))
+        nose.tools.assert_equal(list(t), trace)
+        nose.tools.assert_equal(t[-1], trace[-1])
+        nose.tools.assert_equal(t[1234], trace[1234])
+        nose.tools.assert_equal(t[95:105], trace[95:105])
+        nose.tools.assert_equal(t.index(trace[2500], 2000), trace.index(trace[2500], 2000))
+        nose.tools.assert_raises(ValueError, t.index, 0x1337)
+        t.close()
+    finally:
+        os.remove(path)
+
+
 def run_all():
     def print_test_name(name):
         print('#' * (len(name) + 8))
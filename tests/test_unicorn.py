@@ -310,6 +310,23 @@ def test_single_step():
     nose.tools.assert_equal(len(successors2), 1)
     nose.tools.assert_equal(successors2[0].addr, step5)
 
+def test_register_sync():
+    s = angr.SimState(arch='AMD64', add_options={so.UNICORN, so.ZERO_FILL_UNCONSTRAINED_REGISTERS})
+    values = { 'rax': 0x1122334455667788, 'rbx': 0x41, 'r15': 0xffffffffffffffff, 'rip': 0x400000 }
+    for reg, val in values.items():
+        s.registers.store(reg, val)
+
+    # the general purpose registers are copied in bulk
+    reg_map = s.unicorn._reg_map
+    nose.tools.assert_true(any(size >= 0x80 for _, size, _ in reg_map.runs))
+    s.unicorn.set_regs()
+
+    for reg in values:
+        s.registers.store(reg, 0)
+    s.unicorn.get_regs()
+    for reg, val in values.items():
+        nose.tools.assert_equal(s.solver.eval(s.registers.load(reg)), val)
+
 if __name__ == '__main__':
     #import logging
     #logging.getLogger('angr.state_plugins.unicorn_engine').setLevel('DEBUG')
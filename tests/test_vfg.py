@@ -159,6 +159,55 @@ def test_vfg_1():
     for arch in vfg_1_addresses:
         yield run_vfg_1, arch
 
+#
+# Job ordering
+#
+
+class SortedListJobQueue(list):
+    """
+    The job queue ForwardAnalysis used to have: a list, where each job is inserted by its current sorting key.
+    """
+    def __init__(self, sorting_key):
+        super(SortedListJobQueue, self).__init__()
+        self._sorting_key = sorting_key
+
+    def append(self, job_info):
+        angr.analyses.forward_analysis.ForwardAnalysis._binary_insert(self, job_info, self._sorting_key)
+
+    def pop(self):  # pylint:disable=arguments-differ
+        return super(SortedListJobQueue, self).pop(0)
+
+    def remove_if(self, predicate):
+        removed = [ job_info for job_info in self if predicate(job_info) ]
+        self[:] = [ job_info for job_info in self if not predicate(job_info) ]
+        return len(removed)
+
+def run_vfg_job_order(arch):
+    # the sorting keys of VFG jobs depend on the task stack, so VFG must process its jobs in the same order as it did
+    # with a sorted list
+    proj = angr.Project(os.path.join(test_location, arch, "fauxware"), use_sim_procedures=True)
+    cfg = proj.analyses.CFGEmulated()
+
+    def run():
+        vfg = proj.analyses.VFG(cfg, start=0x40071d, context_sensitivity_level=10, interfunction_level=10,
+                                record_function_final_states=True
+                                )
+        return dict(vfg._execution_counter), sorted(n.addr for n in vfg.graph.nodes())
+
+    expected = run()
+    job_info_list = angr.analyses.forward_analysis.JobInfoList
+    angr.analyses.forward_analysis.JobInfoList = SortedListJobQueue
+    try:
+        reference = run()
+    finally:
+        angr.analyses.forward_analysis.JobInfoList = job_info_list
+
+    nose.tools.assert_equal(expected, reference)
+
+def test_vfg_job_order():
+    for arch in vfg_1_addresses:
+        yield run_vfg_job_order, arch
+
 if __name__ == "__main__":
     # logging.getLogger("angr.state_plugins.abstract_memory").setLevel(logging.DEBUG)
     # logging.getLogger("angr.state_plugins.symbolic_memory").setLevel(logging.DEBUG)